@@ -0,0 +1,161 @@
+"""Deterministic synthetic source corpora for the benchmark harness.
+
+Every generator builds a file out of small function-sized units until the
+requested size is reached. Comment density is the probability that a
+statement is preceded by a comment, and the same seed always yields the same
+text, so timings taken on different commits measure the same input.
+"""
+
+import random
+
+LANGUAGES = ('c', 'go', 'js', 'shell', 'python', 'java')
+
+EXTENSIONS = {
+    '.c': 'c', '.h': 'c', '.cc': 'c', '.cpp': 'c', '.hpp': 'c',
+    '.go': 'go',
+    '.js': 'js',
+    '.sh': 'shell', '.bash': 'shell',
+    '.py': 'python',
+    '.java': 'java',
+}
+
+_WORDS = ('parse', 'buffer', 'value', 'index', 'token', 'state', 'result',
+          'count', 'offset', 'length', 'cache', 'node', 'error', 'field',
+          'handle', 'stream', 'update', 'return', 'check', 'when', 'the',
+          'this', 'for', 'all', 'of', 'and', 'not', 'if')
+
+
+def _sentence(rng):
+    return ' '.join(rng.choice(_WORDS) for _ in range(rng.randint(3, 10)))
+
+
+class _Writer(object):
+
+    def __init__(self, rng, density, line, block):
+        self.rng = rng
+        self.density = density
+        self.lines = []
+        self._line = line
+        self._block = block
+
+    def emit(self, indent, text):
+        self.lines.append(' ' * indent + text)
+
+    def statement(self, indent, text):
+        if self.rng.random() < self.density:
+            self.emit(indent, self._line % _sentence(self.rng))
+        self.emit(indent, text)
+
+    def block_comment(self, indent):
+        if self._block and self.rng.random() < self.density:
+            opening, middle, closing = self._block
+            self.emit(indent, opening)
+            for _ in range(self.rng.randint(1, 4)):
+                self.emit(indent, middle % _sentence(self.rng))
+            self.emit(indent, closing)
+
+
+def _c_unit(out, n):
+    out.block_comment(0)
+    out.emit(0, 'int func_%d(int a, int b) {' % n)
+    out.statement(4, 'int x = a + b * %d;' % n)
+    out.statement(4, 'char *s = "not // a comment %d";' % n)
+    out.statement(4, 'if (x > %d) { x = x / 2; }' % n)
+    out.statement(4, 'return x;')
+    out.emit(0, '}')
+    out.emit(0, '')
+
+
+def _go_unit(out, n):
+    out.block_comment(0)
+    out.emit(0, 'func f%d(a int, b int) int {' % n)
+    out.statement(4, 'x := a + b*%d' % n)
+    out.statement(4, 's := `not /* a comment */ %d`' % n)
+    out.statement(4, '_ = s')
+    out.statement(4, 'return x')
+    out.emit(0, '}')
+    out.emit(0, '')
+
+
+def _js_unit(out, n):
+    out.block_comment(0)
+    out.emit(0, 'function f%d(a, b) {' % n)
+    out.statement(4, 'var x = a + b * %d;' % n)
+    out.statement(4, "var s = 'not // a comment %d';" % n)
+    out.statement(4, 'return x + s.length;')
+    out.emit(0, '}')
+    out.emit(0, '')
+
+
+def _shell_unit(out, n):
+    out.emit(0, 'f%d() {' % n)
+    out.statement(4, 'local x=$(( $1 + %d ))' % n)
+    out.statement(4, 'echo "not # a comment %d"' % n)
+    out.statement(4, 'return 0')
+    out.emit(0, '}')
+    out.emit(0, '')
+
+
+def _python_unit(out, n):
+    out.emit(0, 'def func_%d(a, b):' % n)
+    if out.rng.random() < out.density:
+        out.emit(4, '"""%s' % _sentence(out.rng))
+        out.emit(4, '%s' % _sentence(out.rng))
+        out.emit(4, '"""')
+    out.statement(4, 'x = a + b * %d' % n)
+    out.statement(4, "s = 'not # a comment %d'" % n)
+    out.statement(4, 'return x, s')
+    out.emit(0, '')
+    out.emit(0, '')
+
+
+def _java_unit(out, n):
+    out.block_comment(4)
+    out.emit(4, 'public int method%d(int a, int b) {' % n)
+    out.statement(8, 'int x = a + b * %d;' % n)
+    out.statement(8, 'String s = "not // a comment %d";' % n)
+    out.statement(8, 'if (x > %d) { x = x / 2; }' % n)
+    out.statement(8, 'return x + s.length();')
+    out.emit(4, '}')
+    out.emit(0, '')
+
+
+_GENERATORS = {
+    'c': ('// %s', ('/*', ' * %s', ' */'), _c_unit),
+    'go': ('// %s', ('/*', ' * %s', ' */'), _go_unit),
+    'js': ('// %s', ('/*', ' * %s', ' */'), _js_unit),
+    'shell': ('# %s', None, _shell_unit),
+    'python': ('# %s', None, _python_unit),
+    'java': ('// %s', ('/**', ' * %s', ' */'), _java_unit),
+}
+
+
+def generate(language, size, density=0.3, seed=0):
+    """Returns synthetic source text of at least size characters.
+
+    Args:
+        language: One of LANGUAGES.
+        size: Minimum length (int) of the returned text.
+        density: Probability (float) that a statement carries a comment.
+        seed: Seed (int) for the random number generator.
+    Returns:
+        String source text.
+    """
+    line, block, unit = _GENERATORS[language]
+    out = _Writer(random.Random(seed), density, line, block)
+    total = 0
+    n = 0
+    if language == 'shell':
+        out.emit(0, '#!/bin/sh')
+    elif language == 'java':
+        out.emit(0, 'package bench;')
+        out.emit(0, '')
+        out.emit(0, 'public class Synthetic {')
+    while total < size:
+        start = len(out.lines)
+        unit(out, n)
+        total += sum(len(line) + 1 for line in out.lines[start:])
+        n += 1
+    if language == 'java':
+        out.emit(0, '}')
+    return '\n'.join(out.lines) + '\n'
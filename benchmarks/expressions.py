@@ -0,0 +1,92 @@
+#!/usr/bin/python
+"""Benchmark for javalang binary expressions on long operator chains.
+
+Generated Java often contains very long chains such as string concatenations
+a + b + c + ... . This times both the full expression parse and the
+BinaryOperation tree building alone, for chains of a single operator and for
+chains mixing every precedence level:
+
+    python -m benchmarks.expressions --lengths 100 1000 10000
+"""
+
+import argparse
+import sys
+import time
+
+from javalang_dev.javalang import parser as javalang_parser
+from javalang_dev.javalang import tokenizer as javalang_tokenizer
+from javalang_dev.javalang import tree as javalang_tree
+
+_MIXED_OPERATORS = ('+', '*', '<<', '<', '==', '&', '^', '|', '&&', '||',
+                    '-', '/', '>>', '>=', '!=', '%')
+
+
+def chain(length, mixed=False):
+    """Returns the parts of a chain of length operands.
+
+    Args:
+        length: Number (int) of operands.
+        mixed: If True, cycle through operators of every precedence level
+            instead of only using '+'.
+    Returns:
+        (source, parts) where source is the Java expression text and parts the
+            alternating operand nodes and operators it parses to.
+    """
+    operands = ['a%d' % i for i in range(length)]
+    operators = [_MIXED_OPERATORS[i % len(_MIXED_OPERATORS)] if mixed else '+'
+                 for i in range(length - 1)]
+    source = operands[0]
+    parts = [javalang_tree.MemberReference(member=operands[0])]
+    for operator, operand in zip(operators, operands[1:]):
+        source += ' %s %s' % (operator, operand)
+        parts.extend((operator, javalang_tree.MemberReference(member=operand)))
+    return source + ';', parts
+
+
+def best_of(repeat, function):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main(argv):
+    arg_parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.expressions',
+        description=__doc__.split('\n')[0])
+    arg_parser.add_argument('--lengths', nargs='+', type=int,
+                            default=[100, 1000, 10000],
+                            help='number of operands per chain')
+    arg_parser.add_argument('--repeat', type=int, default=5)
+    args = arg_parser.parse_args(argv)
+
+    for mixed in (False, True):
+        for length in args.lengths:
+            source, parts = chain(length, mixed)
+            tokens = list(javalang_tokenizer.tokenize(source))
+
+            def parse():
+                javalang_parser.Parser(tokens).parse_expression()
+
+            def build():
+                javalang_parser.Parser([]).build_binary_operation(parts)
+
+            name = '%s/%d' % ('mixed' if mixed else 'plus', length)
+            try:
+                parse_seconds = best_of(args.repeat, parse)
+                build_seconds = best_of(args.repeat, build)
+            except RecursionError as exception:
+                print('%-14s  ERROR RecursionError: %s' % (name, exception))
+                continue
+            print('%-14s parse %9.2f ms %7.0f ns/operand   '
+                  'build %8.2f ms %6.0f ns/operand' % (
+                      name, parse_seconds * 1e3, parse_seconds / length * 1e9,
+                      build_seconds * 1e3, build_seconds / length * 1e9))
+            sys.stdout.flush()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,273 @@
+#!/usr/bin/python
+"""Benchmark harness for the comment parsers and javalang.
+
+Times every target on synthetic corpora (see corpus.py) or on a directory of
+real source files, and reports throughput in MB/s and comments/s together with
+peak memory. Results can be saved as a JSON baseline and later runs compared
+against it:
+
+    python -m benchmarks.run --sizes 8 32 --save baseline.json
+    python -m benchmarks.run --sizes 8 32 --compare baseline.json
+
+Peak memory is measured with tracemalloc in a separate, untimed run so that
+tracing overhead does not skew the timings.
+"""
+
+import argparse
+import collections
+import functools
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks import corpus
+from comment_parser.parsers import c_parser
+from comment_parser.parsers import go_parser
+from comment_parser.parsers import java_parser
+from comment_parser.parsers import js_parser
+from comment_parser.parsers import python_parser
+from comment_parser.parsers import shell_parser
+from javalang_dev.javalang import parser as javalang_parser
+from javalang_dev.javalang import tokenizer as javalang_tokenizer
+
+SourceFile = collections.namedtuple('SourceFile', ['path', 'source'])
+
+
+def _extract(parser, **options):
+    def prepare(files):
+        paths = [source_file.path for source_file in files]
+
+        def run():
+            return sum(len(parser.extract_comments(path, **options))
+                       for path in paths)
+        return run
+    return prepare
+
+
+def _javalang_tokenize(files):
+    sources = [source_file.source for source_file in files]
+
+    def run():
+        count = 0
+        for source in sources:
+            for token in javalang_tokenizer.tokenize(source):
+                if isinstance(token, javalang_tokenizer.Comment):
+                    count += 1
+        return count
+    return run
+
+
+def _javalang_parse(files, **options):
+    # Comments are attached to the tokens as trivia, and only the parse itself
+    # is timed.
+    token_lists = []
+    count = 0
+    for source_file in files:
+        tokenizer = javalang_tokenizer.JavaTokenizer(source_file.source,
+                                                     trivia=True)
+        token_lists.append(list(tokenizer.tokenize()))
+        count += len(tokenizer.comments)
+
+    def run():
+        for tokens in token_lists:
+            javalang_parser.Parser(tokens, **options).parse()
+        return count
+    return run
+
+
+# Maps target name to (language, prepare). prepare(files) does any untimed
+# setup and returns the callable to time, which returns the number of comments
+# it handled.
+TARGETS = collections.OrderedDict([
+    ('c_parser', ('c', _extract(c_parser))),
+    ('go_parser', ('go', _extract(go_parser))),
+    ('js_parser', ('js', _extract(js_parser))),
+    ('shell_parser', ('shell', _extract(shell_parser))),
+    ('python_parser', ('python', _extract(python_parser))),
+    ('python_parser_untagged',
+     ('python', _extract(python_parser, tag=False))),
+    ('java_parser', ('java', _extract(java_parser))),
+    ('java_parser_untagged', ('java', _extract(java_parser, tag=False))),
+    ('javalang_tokenizer', ('java', _javalang_tokenize)),
+    ('javalang_parser', ('java', _javalang_parse)),
+    ('javalang_parser_outline',
+     ('java', functools.partial(_javalang_parse, outline=True))),
+])
+
+
+def synthetic_workloads(directory, languages, sizes, density, seed):
+    """Writes synthetic corpora and returns them keyed by (language, label)."""
+    workloads = collections.OrderedDict()
+    for language in languages:
+        for size in sizes:
+            source = corpus.generate(language, size * 1024, density, seed)
+            path = os.path.join(directory, '%s_%dk.txt' % (language, size))
+            with open(path, 'w') as source_file:
+                source_file.write(source)
+            workloads[language, '%dk' % size] = [SourceFile(path, source)]
+    return workloads
+
+
+def corpus_workloads(directory, languages):
+    """Returns the files below directory keyed by (language, 'corpus')."""
+    files = collections.defaultdict(list)
+    for root, _, names in os.walk(directory):
+        for name in sorted(names):
+            language = corpus.EXTENSIONS.get(os.path.splitext(name)[1])
+            if language not in languages:
+                continue
+            path = os.path.join(root, name)
+            try:
+                with open(path, 'r') as source_file:
+                    files[language].append(SourceFile(path, source_file.read()))
+            except (OSError, UnicodeDecodeError):
+                continue
+    return collections.OrderedDict(
+        ((language, 'corpus'), files[language])
+        for language in languages if files[language])
+
+
+def measure(prepare, files, repeat):
+    """Times prepare(files) and returns a result record."""
+    run = prepare(files)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        comments = run()
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    size = sum(len(source_file.source.encode('utf-8')) for source_file in files)
+    best = min(timings)
+    return {
+        'files': len(files),
+        'bytes': size,
+        'comments': comments,
+        'seconds': best,
+        'mb_per_s': size / best / 1e6 if best else None,
+        'comments_per_s': comments / best if best else None,
+        'peak_kb': peak / 1024.0,
+    }
+
+
+def run_benchmarks(workloads, targets, repeat, report=None):
+    """Runs targets over workloads and returns results keyed by name."""
+    results = collections.OrderedDict()
+    for name in targets:
+        language, prepare = TARGETS[name]
+        for (workload_language, label), files in workloads.items():
+            if workload_language != language:
+                continue
+            key = '%s/%s' % (name, label)
+            try:
+                results[key] = measure(prepare, files, repeat)
+            except Exception as exception:  # Keep benchmarking other targets.
+                results[key] = {'error': '%s: %s' % (
+                    type(exception).__name__, exception)}
+            if report:
+                report(key, results[key])
+    return results
+
+
+def format_result(key, result):
+    if 'error' in result:
+        return '%-34s  ERROR %s' % (key, result['error'])
+    return '%-34s %9.2f MB/s %12.0f comments/s %10.1f KiB peak' % (
+        key, result['mb_per_s'] or 0, result['comments_per_s'] or 0,
+        result['peak_kb'])
+
+
+def compare(results, baseline, threshold):
+    """Returns lines describing throughput changes against baseline.
+
+    Args:
+        results: Results of this run keyed by name.
+        baseline: Results of a previous run keyed by name.
+        threshold: Relative slowdown (float) reported as a regression.
+    Returns:
+        (lines, regressed) where regressed is True if any shared benchmark
+            slowed down by more than threshold.
+    """
+    lines = []
+    regressed = False
+    for key, result in results.items():
+        previous = baseline.get(key)
+        if not previous or 'error' in result or 'error' in previous:
+            continue
+        ratio = previous['seconds'] / result['seconds']
+        marker = ''
+        if ratio < 1 - threshold:
+            marker = '  REGRESSION'
+            regressed = True
+        lines.append('%-34s %6.2fx%s' % (key, ratio, marker))
+    return lines, regressed
+
+
+def main(argv):
+    arg_parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.run', description=__doc__.split('\n')[0])
+    arg_parser.add_argument('--targets', nargs='+', choices=list(TARGETS),
+                            default=list(TARGETS))
+    arg_parser.add_argument('--languages', nargs='+', choices=corpus.LANGUAGES,
+                            default=list(corpus.LANGUAGES))
+    arg_parser.add_argument('--sizes', nargs='+', type=int, default=[8, 32],
+                            help='synthetic file sizes in KiB')
+    arg_parser.add_argument('--density', type=float, default=0.3,
+                            help='probability that a statement is commented')
+    arg_parser.add_argument('--seed', type=int, default=0)
+    arg_parser.add_argument('--corpus', metavar='DIR',
+                            help='benchmark real files below DIR instead')
+    arg_parser.add_argument('--repeat', type=int, default=3)
+    arg_parser.add_argument('--save', metavar='FILE',
+                            help='write results as a JSON baseline')
+    arg_parser.add_argument('--compare', metavar='FILE',
+                            help='compare against a JSON baseline')
+    arg_parser.add_argument('--threshold', type=float, default=0.1,
+                            help='relative slowdown reported as regression')
+    args = arg_parser.parse_args(argv)
+
+    def report(key, result):
+        print(format_result(key, result))
+        sys.stdout.flush()
+
+    with tempfile.TemporaryDirectory() as directory:
+        if args.corpus:
+            workloads = corpus_workloads(args.corpus, args.languages)
+        else:
+            workloads = synthetic_workloads(directory, args.languages,
+                                            args.sizes, args.density,
+                                            args.seed)
+        results = run_benchmarks(workloads, args.targets, args.repeat, report)
+
+    if args.save:
+        with open(args.save, 'w') as baseline_file:
+            json.dump({
+                'python': platform.python_version(),
+                'config': {key: value for key, value in vars(args).items()
+                           if key not in ('save', 'compare')},
+                'results': results,
+            }, baseline_file, indent=2)
+
+    if args.compare:
+        with open(args.compare, 'r') as baseline_file:
+            baseline = json.load(baseline_file)['results']
+        lines, regressed = compare(results, baseline, args.threshold)
+        print('\nSpeedup against %s:' % args.compare)
+        for line in lines:
+            print(line)
+        return 1 if regressed else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
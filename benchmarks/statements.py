@@ -0,0 +1,127 @@
+#!/usr/bin/python
+"""Benchmark for javalang on statements, primaries and class members.
+
+Every statement, primary and member is parsed by first working out which
+production its first token starts. This times the parse of classes made of
+every kind of member, whose methods use every kind of statement:
+
+    python -m benchmarks.statements --members 100 1000
+
+With --workers, the class body is also parsed by javalang.parallel on a pool
+of that many processes.
+"""
+
+import argparse
+import sys
+
+import concurrent.futures
+
+from benchmarks.expressions import best_of
+from javalang_dev.javalang import parallel as javalang_parallel
+from javalang_dev.javalang import parser as javalang_parser
+from javalang_dev.javalang import tokenizer as javalang_tokenizer
+
+_METHOD = '''
+    public int method%(n)d(int a, java.util.List<String> items) {
+        int x = a + %(n)d;
+        String s = "text" + this.name;
+        label%(n)d: for (int i = 0; i < a; i++) {
+            if (i == x) { continue label%(n)d; } else if (i > x) break;
+        }
+        for (String item : items) { x += item.length(); }
+        while (x > 10) { x = x / 2; }
+        do { x++; } while (x < 5);
+        switch (x) {
+            case 1: x = -x; break;
+            default: x = super.hashCode();
+        }
+        try {
+            assert x >= 0 : "negative";
+            synchronized (this) { items.add(new String("s")); }
+        } catch (RuntimeException e) {
+            throw new IllegalStateException(e);
+        } finally {
+            ;
+        }
+        Object type = int[].class;
+        Runnable r = () -> { return; };
+        return x + s.length() + Math.max(a, (int) 1L) + items.size();
+    }
+'''
+
+_MEMBERS = '''
+    private static final int CONSTANT%(n)d = %(n)d;
+    java.util.Map<String, Integer> field%(n)d = new java.util.HashMap<>();
+
+    Synthetic(int a, String b) { this(a); }
+
+    static { CONSTANT_STATIC = 1; }
+
+    void run%(n)d() { method%(n)d(1, null); }
+
+    <T> T generic%(n)d(T value) { return value; }
+
+    class Inner%(n)d { }
+
+    enum Kind%(n)d { A, B }
+
+    interface Named%(n)d { String name(); }
+
+    @interface Marker%(n)d { }
+'''
+
+
+def source(members):
+    """Returns a compilation unit with members methods and members groups of
+    the other kinds of member"""
+
+    parts = ['package bench;\n\npublic class Synthetic {\n']
+    for n in range(members):
+        parts.append(_METHOD % {'n': n})
+        parts.append(_MEMBERS % {'n': n})
+    parts.append('}\n')
+    return ''.join(parts)
+
+
+def main(argv):
+    arg_parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.statements',
+        description=__doc__.split('\n')[0])
+    arg_parser.add_argument('--members', nargs='+', type=int,
+                            default=[100, 1000],
+                            help='number of methods and member groups')
+    arg_parser.add_argument('--repeat', type=int, default=5)
+    arg_parser.add_argument('--workers', type=int,
+                            help='also parse on this many processes')
+    args = arg_parser.parse_args(argv)
+
+    for members in args.members:
+        code = source(members)
+        tokens = list(javalang_tokenizer.tokenize(code))
+
+        def parse():
+            javalang_parser.Parser(tokens).parse()
+
+        seconds = best_of(args.repeat, parse)
+        print('%-14s parse %9.2f ms %7.0f ns/token' % (
+            'members/%d' % members, seconds * 1e3,
+            seconds / len(tokens) * 1e9))
+        sys.stdout.flush()
+
+        if args.workers:
+            trivia = list(javalang_tokenizer.tokenize(code, trivia=True))
+            with concurrent.futures.ProcessPoolExecutor(
+                    args.workers) as executor:
+                def parse_parallel():
+                    javalang_parallel.parse_tokens(trivia, executor)
+
+                seconds = best_of(args.repeat, parse_parallel)
+            print('%-14s parallel %6.2f ms %7.0f ns/token' % (
+                'members/%d' % members, seconds * 1e3,
+                seconds / len(tokens) * 1e9))
+            sys.stdout.flush()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
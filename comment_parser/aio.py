@@ -0,0 +1,97 @@
+#!/usr/bin/python
+"""This module provides an asyncio front-end to comment_parser.
+
+MIME detection, file reads and parsing all block, so they are handed to an
+executor instead of running on the event loop. Any concurrent.futures
+executor works: a ThreadPoolExecutor keeps the work in process, while a
+ProcessPoolExecutor spreads CPU-bound parsing across cores. When no executor
+is given the event loop's default executor is used.
+"""
+
+import asyncio
+import itertools
+
+from comment_parser import comment_parser
+
+
+async def aextract_comments(filename, mime=None, executor=None):
+    """Extracts and returns the comments from the given source file.
+
+    Cancelling the returned coroutine stops waiting for the result right away.
+    Extraction that has already started in the executor runs to completion in
+    the background.
+
+    Args:
+        filename: String name of the file to extract comments from.
+        mime: Optional MIME type for file (str). If not given, an attempt to
+            deduce the MIME type will occur.
+        executor: Optional concurrent.futures.Executor to run extraction in.
+    Returns:
+        Python list of parsers.common.Comment in the order that they appear in
+            the source file.
+    Raises:
+        comment_parser.UnsupportedError: If filename is of an unsupported MIME
+            type.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        executor, comment_parser.extract_comments, filename, mime)
+
+
+async def aextract_many(filenames, concurrency=4, mime=None, executor=None,
+                        return_exceptions=False):
+    """Extracts comments from many files with bounded concurrency.
+
+    At most concurrency files are in flight at once, and filenames is only
+    advanced when a slot frees up and its result has been consumed, so a slow
+    consumer applies backpressure all the way to the file list. Closing or
+    cancelling the iteration cancels every extraction that has not started.
+
+    Args:
+        filenames: Iterable of string names of the files to extract comments
+            from. It may be lazy or unbounded.
+        concurrency: Maximum number (int) of files extracted at once.
+        mime: Optional MIME type (str) shared by all files. If not given, the
+            MIME type of each file is deduced.
+        executor: Optional concurrent.futures.Executor to run extraction in.
+        return_exceptions: If True, a comment_parser.Error raised for a file is
+            yielded in place of its comments instead of being raised.
+    Yields:
+        (filename, comments) tuples in the order extraction completes, where
+            comments is a Python list of parsers.common.Comment.
+    Raises:
+        ValueError: concurrency is less than 1.
+        comment_parser.Error: Extraction failed for a file and
+            return_exceptions is False.
+    """
+    if concurrency < 1:
+        raise ValueError('concurrency must be at least 1, got %r' % concurrency)
+    filenames = iter(filenames)
+    pending = {}
+
+    def schedule():
+        for filename in itertools.islice(filenames,
+                                         concurrency - len(pending)):
+            task = asyncio.ensure_future(
+                aextract_comments(filename, mime, executor))
+            pending[task] = filename
+
+    try:
+        schedule()
+        while pending:
+            done, _ = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                filename = pending.pop(task)
+                try:
+                    comments = task.result()
+                except comment_parser.Error as exception:
+                    if not return_exceptions:
+                        raise
+                    comments = exception
+                yield filename, comments
+            schedule()
+    finally:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
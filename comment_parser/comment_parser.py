@@ -13,28 +13,85 @@ Dependencies:
     python-magic: pip install python-magic
 """
 
+import argparse
+import collections
+import collections.abc
+import concurrent.futures
+import contextlib
+import csv
+import fnmatch
+import importlib
+import json
+import os
 import sys
 
-import magic
-
 from comment_parser.parsers import common as common
-from comment_parser.parsers import c_parser
-from comment_parser.parsers import go_parser
-from comment_parser.parsers import js_parser
-from comment_parser.parsers import shell_parser
-from comment_parser.parsers import python_parser
-from comment_parser.parsers import java_parser
-
-MIME_MAP = {
-    'text/x-c': c_parser,               # C
-    'text/x-c++': c_parser,             # C++
-    'text/x-go': go_parser,             # Go
-    'text/x-java-source': java_parser,     # Java
-    'text/x-javascript': js_parser,     # Javascript
-    'text/x-shellscript': shell_parser, # Unix shell
-    'text/x-python': python_parser      # Python
+
+
+class _ParserRegistry(collections.abc.Mapping):
+    """Maps MIME types to parser modules.
+
+    Each parser module is only imported the first time it is looked up, so
+    that a run over shell scripts never loads e.g. the Java parser.
+    """
+
+    def __init__(self, module_names):
+        self._module_names = module_names
+        self._modules = {}
+
+    def __getitem__(self, mime):
+        module = self._modules.get(mime)
+        if module is None:
+            module = importlib.import_module(
+                'comment_parser.parsers.' + self._module_names[mime])
+            self._modules[mime] = module
+        return module
+
+    def __iter__(self):
+        return iter(self._module_names)
+
+    def module_name(self, mime):
+        """Returns the name of the parser module for mime, without importing it."""
+        return self._module_names[mime]
+
+    def __len__(self):
+        return len(self._module_names)
+
+
+MIME_MAP = _ParserRegistry({
+    'text/x-c': 'c_parser',               # C
+    'text/x-c++': 'c_parser',             # C++
+    'text/x-go': 'go_parser',             # Go
+    'text/x-java-source': 'java_parser',  # Java
+    'text/x-javascript': 'js_parser',     # Javascript
+    'text/x-shellscript': 'shell_parser', # Unix shell
+    'text/x-python': 'python_parser'      # Python
+})
+
+# File name extensions used to deduce the MIME type when libmagic reports one
+# that is not in MIME_MAP, e.g. text/plain.
+EXTENSION_MAP = {
+    '.c': 'text/x-c',
+    '.h': 'text/x-c',
+    '.cc': 'text/x-c++',
+    '.cpp': 'text/x-c++',
+    '.cxx': 'text/x-c++',
+    '.hpp': 'text/x-c++',
+    '.go': 'text/x-go',
+    '.java': 'text/x-java-source',
+    '.js': 'text/x-javascript',
+    '.sh': 'text/x-shellscript',
+    '.bash': 'text/x-shellscript',
+    '.py': 'text/x-python',
 }
 
+# Parsers whose extract_comments() can leave out tagging the comments with AST
+# nodes, which spares them parsing the file.
+_TAGGING_PARSERS = frozenset(['java_parser', 'python_parser'])
+
+
+_PROFILE_CALLBACKS = []
+
 
 class Error(Exception):
     """Base Error class in this module."""
@@ -51,41 +108,307 @@ class ParseError(Error):
     pass
 
 
-def extract_comments(filename, mime=None):
+def extract_comments(filename, mime=None, tag=True, group=None):
     """Extracts and returns the comments from the given source file.
 
     Args:
         filename: String name of the file to extract comments from.
         mime: Optional MIME type for file (str). Note some MIME types accepted
             don't comply with RFC2045. If not given, an attempt to deduce the
-            MIME type will occur.
+            MIME type will occur, first with libmagic and then from the file
+            name extension.
+        tag: Whether comments are tagged with the AST nodes they belong to,
+            see Comment.node_list(). Without tagging, parsers that tag skip
+            parsing the file and their comments have empty node lists.
+        group: Whether single-line comments on consecutive lines are grouped
+            into one comment. Defaults to the parser's own behavior, which is
+            to group for Python and Java only.
     Returns:
         Python list of parsers.common.Comment in the order that they appear in
             the source file.
     Raises:
         UnsupportedError: If filename is of an unsupported MIME type.
+        ParseError: If the parser failed to read or parse filename.
     """
+    if not _PROFILE_CALLBACKS:
+        return _extract_comments(filename, mime, tag, group)
+    profile = common.Profile(filename)
+    try:
+        with common.profiling(profile):
+            return _extract_comments(filename, mime, tag, group)
+    except Error as exception:
+        profile.error = str(exception)
+        raise
+    finally:
+        for callback in list(_PROFILE_CALLBACKS):
+            callback(profile)
+
+
+def _extract_comments(filename, mime, tag, group):
     if not mime:
-        mime = magic.from_file(filename, mime=True)
+        with common.phase('mime'):
+            # Imported here as libmagic is not needed when the MIME type is
+            # given
+            import magic
+            try:
+                mime = magic.from_file(filename, mime=True)
+            except (OSError, magic.MagicException) as exception:
+                raise ParseError(str(exception))
+            if mime not in MIME_MAP:
+                extension = os.path.splitext(filename)[1].lower()
+                mime = EXTENSION_MAP.get(extension, mime)
+    profile = common.current_profile()
+    if profile is not None:
+        profile.mime = mime
     if mime not in MIME_MAP:
         raise UnsupportedError(
             'Unsupported MIME type %s for file %s' % (mime, filename))
+    parser = MIME_MAP[mime]
+    options = {}
+    if not tag and MIME_MAP.module_name(mime) in _TAGGING_PARSERS:
+        options['tag'] = False
+    if group is not None:
+        options['group'] = group
     try:
-        parser = MIME_MAP[mime]
+        comments = parser.extract_comments(filename, **options)
     except common.Error as exception:
-        raise ParseError(str(exception))
-    return parser.extract_comments(filename)
+        raise ParseError(str(exception) or type(exception).__name__)
+    common.count('comments', len(comments))
+    return comments
+
 
+def add_profile_callback(callback):
+    """Registers callback to receive a profile of every extraction.
+
+    While at least one callback is registered, extract_comments records a
+    parsers.common.Profile per file with per-phase timings ('mime', 'io',
+    'lexing', 'merging', 'parsing', 'tagging') and counters ('chars',
+    'tokens', 'comments', 'ast_nodes'), and passes it to every callback once
+    the file is done, also when extraction failed. With no callbacks
+    registered profiling costs nothing. Extractions running in other
+    processes are not reported.
+
+    Args:
+        callback: Callable taking a parsers.common.Profile.
+    """
+    _PROFILE_CALLBACKS.append(callback)
+
+
+def remove_profile_callback(callback):
+    """Unregisters a callback added with add_profile_callback."""
+    _PROFILE_CALLBACKS.remove(callback)
+
+
+@contextlib.contextmanager
+def collect_profiles():
+    """Collects the profiles of all extractions run in the with block.
+
+    Yields:
+        Python list that parsers.common.Profile objects are appended to.
+    """
+    profiles = []
+    add_profile_callback(profiles.append)
+    try:
+        yield profiles
+    finally:
+        remove_profile_callback(profiles.append)
+
+
+def _find_files(paths, include, exclude):
+    """Yields (filename, explicit) for paths, recursing into directories.
+
+    Files found by recursion must match one of the include globs, if any, and
+    none of the exclude globs. Globs are matched against both the base name
+    and the path relative to the directory given on the command line.
+    """
+    def matches(filename, relative, patterns):
+        return any(fnmatch.fnmatch(filename, pattern) or
+                   fnmatch.fnmatch(relative, pattern) for pattern in patterns)
+
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path, True
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            dirs[:] = [name for name in dirs if not matches(
+                name, os.path.relpath(os.path.join(root, name), path),
+                exclude)]
+            for name in sorted(files):
+                filename = os.path.join(root, name)
+                relative = os.path.relpath(filename, path)
+                if include and not matches(name, relative, include):
+                    continue
+                if matches(name, relative, exclude):
+                    continue
+                yield filename, False
+
+
+def _extract_records(filename, explicit, mime, nodes, group=None):
+    """Returns (filename, records, error) for the CLI, picklable for workers.
+
+    records is a list of dicts describing the comments of filename. error is
+    None on success, or the message of the Error that was raised. Unsupported
+    files found by directory recursion are skipped without an error.
+    """
+    try:
+        comments = extract_comments(filename, mime, tag=nodes, group=group)
+    except UnsupportedError as exception:
+        return filename, [], str(exception) if explicit else None
+    except (Error, OSError, ValueError) as exception:
+        # Errors of one file are reported without stopping the run
+        return filename, [], str(exception) or type(exception).__name__
+    records = []
+    for comment in comments:
+        record = collections.OrderedDict([
+            ('path', filename),
+            ('start_line', comment.start_line()),
+            ('end_line', comment.end_line()),
+            ('multiline', comment.is_multiline()),
+            ('text', comment.text()),
+        ])
+        if nodes:
+            record['nodes'] = [text for _, text in comment.node_list()]
+        records.append(record)
+    return filename, records, None
+
+
+def _submit_bounded(executor, calls, window, unordered=False):
+    """Yields the results of calls run by executor, submitting them lazily.
+
+    At most window calls are pending at any time, so that the files of a
+    large tree are not all queued up front.
+
+    Args:
+        executor: concurrent.futures.Executor to run the calls.
+        calls: Iterable of (function, *args) tuples.
+        window: Maximum number of pending calls (int).
+        unordered: Whether results are yielded in completion order rather
+            than in the order of calls.
+    """
+    calls = iter(calls)
+    pending = collections.deque()
+    while True:
+        for call in calls:
+            pending.append(executor.submit(*call))
+            if len(pending) >= window:
+                break
+        if not pending:
+            return
+        if unordered:
+            done, _ = concurrent.futures.wait(
+                pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            future = next(future for future in pending if future in done)
+            pending.remove(future)
+        else:
+            future = pending.popleft()
+        yield future.result()
+
+
+class _Writer(object):
+    """Streams comment records to a file in one of the CLI output formats."""
+
+    FORMATS = ('text', 'ndjson', 'csv', 'json')
+
+    def __init__(self, output, output_format, nodes):
+        self._output = output
+        self._format = output_format
+        self._count = 0
+        if output_format == 'csv':
+            self._csv = csv.writer(output)
+            header = ['path', 'start_line', 'end_line', 'multiline', 'text']
+            if nodes:
+                header.append('nodes')
+            self._csv.writerow(header)
+        elif output_format == 'json':
+            output.write('[')
+
+    def write(self, record):
+        if self._format == 'text':
+            self._output.write(record['text'] + '\n')
+        elif self._format == 'csv':
+            row = list(record.values())
+            if 'nodes' in record:
+                row[-1] = json.dumps(row[-1])
+            self._csv.writerow(row)
+        else:
+            if self._format == 'json':
+                self._output.write(',\n' if self._count else '\n')
+            self._output.write(json.dumps(record))
+            if self._format == 'ndjson':
+                self._output.write('\n')
+        self._count += 1
+
+    def close(self):
+        if self._format == 'json':
+            self._output.write('\n]\n' if self._count else ']\n')
+        self._output.flush()
+
+
+def main(argv=None):
+    """Extracts comments from files and prints them to stdout.
+
+    Args:
+        argv: Command line arguments, defaults to sys.argv[1:].
+    Returns:
+        Exit status (int), 1 if any file failed and 0 otherwise.
+    """
+    arg_parser = argparse.ArgumentParser(
+        prog='comment_parser',
+        description='Extracts comments from source files.')
+    arg_parser.add_argument('paths', nargs='+', metavar='PATH',
+                            help='files, or directories to search recursively')
+    arg_parser.add_argument('-j', '--jobs', type=int, default=1,
+                            help='number of worker processes')
+    arg_parser.add_argument('-f', '--format', choices=_Writer.FORMATS,
+                            default='text', help='output format')
+    arg_parser.add_argument('-i', '--include', action='append', default=[],
+                            metavar='GLOB',
+                            help='only search files matching GLOB')
+    arg_parser.add_argument('-x', '--exclude', action='append', default=[],
+                            metavar='GLOB',
+                            help='skip files and directories matching GLOB')
+    arg_parser.add_argument('--mime', help='MIME type of all files')
+    arg_parser.add_argument('--nodes', action='store_true',
+                            help='include the text of tagged AST nodes')
+    arg_parser.add_argument('--group', action='store_const', const=True,
+                            help='group single-line comments on consecutive '
+                            'lines in every language')
+    arg_parser.add_argument('--unordered', action='store_true',
+                            help='write files in completion order')
+    args = arg_parser.parse_intermixed_args(
+        sys.argv[1:] if argv is None else argv)
+    if args.jobs < 1:
+        arg_parser.error('--jobs must be at least 1')
+
+    files = _find_files(args.paths, args.include, args.exclude)
+    writer = _Writer(sys.stdout, args.format, args.nodes)
+    failed = False
+    executor = None
+    if args.jobs == 1:
+        results = (_extract_records(filename, explicit, args.mime, args.nodes,
+                                    args.group)
+                   for filename, explicit in files)
+    else:
+        executor = concurrent.futures.ProcessPoolExecutor(args.jobs)
+        calls = ((_extract_records, filename, explicit, args.mime, args.nodes,
+                  args.group)
+                 for filename, explicit in files)
+        results = _submit_bounded(executor, calls, 2 * args.jobs,
+                                  args.unordered)
+    try:
+        for filename, records, error in results:
+            if error is not None:
+                failed = True
+                sys.stderr.write('%s: %s\n' % (filename, error))
+            for record in records:
+                writer.write(record)
+    finally:
+        writer.close()
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+    return 1 if failed else 0
 
-def main(argv):
-    """Extracts comments from files and prints them to stdout."""
-    for filename in argv:
-        try:
-            comments = extract_comments(filename)
-            for comment in comments:
-                print(comment.text())
-        except Error as exception:
-            sys.stderr.write(str(exception))
 
 if __name__ == '__main__':
-    main(sys.argv[1:])
+    sys.exit(main())
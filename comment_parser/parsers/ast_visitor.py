@@ -1,5 +1,26 @@
 import ast
-import asttokens
+
+
+def first_nodes_by_line(root):
+    """Maps line numbers to the node Visitor.get_node_at_line() finds there.
+
+    That is the first node starting at the line in a depth-first walk of the
+    fields of root, found here for every line in a single walk.
+    """
+    nodes = {}
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if hasattr(node, 'lineno') and node.lineno not in nodes:
+            nodes[node.lineno] = node
+        children = []
+        for field, value in ast.iter_fields(node):
+            if isinstance(value, list):
+                children.extend(item for item in value if isinstance(item, ast.AST))
+            elif isinstance(value, ast.AST):
+                children.append(value)
+        stack.extend(reversed(children))
+    return nodes
 
 
 class Visitor(ast.NodeVisitor):
@@ -1,6 +1,10 @@
 #!/usr/bin/python
 """This module provides constructs common to all comment parsers."""
 
+import contextlib
+import threading
+import time
+
 
 class Error(Exception):
     """Base Error class for all comment parsers."""
@@ -20,21 +24,22 @@ class UnterminatedCommentError(Error):
 class Comment(object):
     """Represents comments found in source files."""
 
-    def __init__(self, text, start_line, end_line, multiline=False):
+    def __init__(self, text, start_line, end_line=None, multiline=False):
         """Initializes Comment.
 
         Args:
             text: String text of comment.
             multiline: Boolean whether this comment was a multiline comment.
             start_line: Line number (int) comment was found on.
-            end_line: Line number (int) comment ends on.
+            end_line: Line number (int) comment ends on. Defaults to
+                start_line.
 
         Params:
             node_list: (list) list of AST nodes to retrieve the code context for which the comment is written
         """
         self._text = text
         self._start_line = start_line
-        self._end_line = end_line
+        self._end_line = start_line if end_line is None else end_line
         self._multiline = multiline
         self._node_list = []
 
@@ -86,3 +91,179 @@ class Comment(object):
             if self.__dict__ == other.__dict__:
                 return True
         return False
+
+
+def starts_line(source, offset):
+    """Returns whether only spaces and tabs precede offset on its line.
+
+    Args:
+        source: String source text.
+        offset: Index into source (int).
+    """
+    line_start = source.rfind('\n', 0, offset) + 1
+    return not source[line_start:offset].strip(' \t')
+
+
+def group_consecutive_comments(comments, alone):
+    """Groups runs of single-line comments on consecutive lines.
+
+    A single-line comment joins the run of the comment before it when both
+    stand alone on their lines and it starts on the line after the run ends.
+    Multi-line comments are never grouped. The texts of a run are joined with
+    spaces once the run ends, so grouping takes a single pass over comments.
+
+    Args:
+        comments: List of Comment in the order that they appear in the file.
+        alone: Sequence of booleans, one for each of comments, telling whether
+            the comment is the only thing on its line apart from spaces and
+            tabs.
+    Returns:
+        List of Comment in which each run is replaced by a single comment.
+    """
+    grouped = []
+    run = []
+    for comment, comment_alone in zip(comments, alone):
+        comment_alone = comment_alone and not comment.is_multiline()
+        if run and comment_alone and \
+                comment.start_line() == run[-1].end_line() + 1:
+            run.append(comment)
+            continue
+        _end_run(run, grouped)
+        if comment_alone:
+            run = [comment]
+        else:
+            run = []
+            grouped.append(comment)
+    _end_run(run, grouped)
+    return grouped
+
+
+def _end_run(run, grouped):
+    if len(run) == 1:
+        grouped.append(run[0])
+    elif run:
+        grouped.append(Comment(' '.join(comment.text() for comment in run),
+                               run[0].start_line(), run[-1].end_line()))
+
+
+def scanned_comments(source, scanned, group=False):
+    """Returns the comments reported by a parser's scan() of source.
+
+    Args:
+        source: String source text that was scanned.
+        scanned: (offset, line_number, comment) tuples from scan().
+        group: Whether to group consecutive single-line comments, see
+            group_consecutive_comments.
+    Returns:
+        List of Comment in the order that they appear in source.
+    """
+    found = [(offset, comment) for offset, _, comment in scanned
+             if comment is not None]
+    comments = [comment for _, comment in found]
+    if group:
+        with phase('merging'):
+            comments = group_consecutive_comments(
+                comments, [starts_line(source, offset) for offset, _ in found])
+    return comments
+
+
+class Profile(object):
+    """Per-phase timings and counters recorded while extracting one file.
+
+    Phases are timed exclusively: while a phase entered inside another one
+    runs, only the inner phase is charged.
+    """
+
+    def __init__(self, filename):
+        """Initializes Profile.
+
+        Args:
+            filename: String name of the file being extracted.
+        """
+        self.filename = filename
+        self.mime = None
+        self.error = None
+        self.seconds = 0.0
+        self.phases = {}
+        self.counters = {}
+        self._stack = []
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Charges the time spent in the with block to phase name."""
+        now = time.perf_counter()
+        if self._stack:
+            self._charge(now)
+        self._stack.append([name, now])
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            self._charge(now)
+            self._stack.pop()
+            if self._stack:
+                self._stack[-1][1] = now
+
+    def count(self, name, value=1):
+        """Adds value to counter name."""
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def as_dict(self):
+        """Returns the profile as a JSON serializable dict."""
+        return {
+            'filename': self.filename,
+            'mime': self.mime,
+            'error': self.error,
+            'seconds': self.seconds,
+            'phases': dict(self.phases),
+            'counters': dict(self.counters),
+        }
+
+    def _charge(self, now):
+        name, start = self._stack[-1]
+        self.phases[name] = self.phases.get(name, 0.0) + now - start
+
+
+class _ActiveProfile(threading.local):
+    profile = None
+
+
+_active = _ActiveProfile()
+_NO_PHASE = contextlib.nullcontext()
+
+
+@contextlib.contextmanager
+def profiling(profile):
+    """Records phases and counters of the with block into profile."""
+    previous = _active.profile
+    _active.profile = profile
+    start = time.perf_counter()
+    try:
+        yield profile
+    finally:
+        profile.seconds += time.perf_counter() - start
+        _active.profile = previous
+
+
+def current_profile():
+    """Returns the Profile being recorded by this thread, or None."""
+    return _active.profile
+
+
+def phase(name):
+    """Returns a context manager timing phase name of the current profile.
+
+    When no profile is being recorded a shared no-op context manager is
+    returned, so instrumented code pays only for this call.
+    """
+    profile = _active.profile
+    if profile is None:
+        return _NO_PHASE
+    return profile.phase(name)
+
+
+def count(name, value=1):
+    """Adds value to counter name of the current profile, if any."""
+    profile = _active.profile
+    if profile is not None:
+        profile.count(name, value)
@@ -4,7 +4,7 @@
 from comment_parser.parsers import common as common
 
 
-def extract_comments(filename):
+def extract_comments(filename, group=False):
     """Extracts a list of comments from the given Go source file.
 
     Comments are represented with the Comment class found in the common module.
@@ -20,6 +20,8 @@ def extract_comments(filename):
 
     Args:
         filename: String name of the file to extract comments from.
+        group: Whether to group single-line comments on consecutive lines
+            into one comment, see common.group_consecutive_comments.
     Returns:
         Python list of common.Comment in the order that they appear in the file.
     Raises:
@@ -28,83 +30,109 @@ def extract_comments(filename):
             comment.
     """
     try:
-        with open(filename, 'r') as source_file:
-            state = 0
-            current_comment = ''
-            comments = []
-            line_counter = 1
-            comment_start = 1
-            string_char = ''
-            while True:
-                char = source_file.read(1)
-                if not char:
-                    if state is 3 or state is 4:
-                        raise common.UnterminatedCommentError()
-                    if state is 2:
-                        # Was in single-line comment. Create comment.
-                        comment = common.Comment(current_comment, line_counter)
-                        comments.append(comment)
-                    return comments
-                if state is 0:
-                    # Waiting for comment start character or beginning of
-                    # string or rune literal.
-                    if char == '/':
-                        state = 1
-                    elif char == '"' or char == "'" or char == '`':
-                        string_char = char
-                        state = 5
-                elif state is 1:
-                    # Found comment start character, classify next character and
-                    # determine if single or multi-line comment.
-                    if char == '/':
-                        state = 2
-                    elif char == '*':
-                        comment_start = line_counter
-                        state = 3
-                    else:
-                        state = 0
-                elif state is 2:
-                    # In single-line comment, read characters util EOL.
-                    if char == '\n':
-                        comment = common.Comment(current_comment, line_counter)
-                        comments.append(comment)
-                        current_comment = ''
-                        state = 0
-                    else:
-                        current_comment += char
-                elif state is 3:
-                    # In multi-line comment, add characters until '*' is
-                    # encountered.
-                    if char == '*':
-                        state = 4
-                    else:
-                        current_comment += char
-                elif state is 4:
-                    # In multi-line comment with asterisk found. Determine if
-                    # comment is ending.
-                    if char == '/':
-                        comment = common.Comment(
-                            current_comment, comment_start, multiline=True)
-                        comments.append(comment)
-                        current_comment = ''
-                        state = 0
-                    else:
-                        current_comment += '*'
-                        # Care for multiple '*' in a row
-                        if char != '*':
-                            current_comment += char
-                            state = 3
-                elif state is 5:
-                    # In string literal, expect literal end or escape character.
-                    if char == string_char:
-                        state = 0
-                    elif char == '\\':
-                        state = 6
-                elif state is 6:
-                    # In string literal, escaping current char.
-                    state = 5
-                if char == '\n':
-                    line_counter += 1
-    except OSError as exception:
+        with common.phase('io'), open(filename, 'r') as source_file:
+            source = source_file.read()
+    except (OSError, UnicodeDecodeError) as exception:
         raise common.FileError(str(exception))
+    common.count('chars', len(source))
+    with common.phase('lexing'):
+        return common.scanned_comments(source, scan(source), group)
 
+
+def scan(source, offset=0, line_counter=1):
+    """Scans Go source text for comments.
+
+    Scanning must begin outside of any comment or string literal. Every line
+    start reached outside of a comment or string literal is reported as a safe
+    point that scanning can later be resumed from, see the incremental module.
+
+    Args:
+        source: String source text.
+        offset: Index into source (int) to begin scanning at.
+        line_counter: Line number (int) of the character at offset.
+    Yields:
+        (offset, line_number, comment) tuples in source order. For a comment,
+            offset and line_number locate its opening delimiter. A comment of
+            None marks a safe line start at offset.
+    Raises:
+        common.UnterminatedCommentError: Encountered an unterminated multi-line
+            comment.
+    """
+    state = 0
+    current_comment = ''
+    comment_start = 1
+    comment_offset = offset
+    string_char = ''
+    for index in range(offset, len(source)):
+        char = source[index]
+        if state == 0:
+            # Waiting for comment start character or beginning of
+            # string or rune literal.
+            if char == '/':
+                state = 1
+            elif char == '"' or char == "'" or char == '`':
+                string_char = char
+                state = 5
+        elif state == 1:
+            # Found comment start character, classify next character and
+            # determine if single or multi-line comment.
+            if char == '/':
+                comment_offset = index - 1
+                state = 2
+            elif char == '*':
+                comment_offset = index - 1
+                comment_start = line_counter
+                state = 3
+            else:
+                state = 0
+        elif state == 2:
+            # In single-line comment, read characters util EOL.
+            if char == '\n':
+                comment = common.Comment(current_comment, line_counter)
+                yield comment_offset, line_counter, comment
+                current_comment = ''
+                state = 0
+            else:
+                current_comment += char
+        elif state == 3:
+            # In multi-line comment, add characters until '*' is
+            # encountered.
+            if char == '*':
+                state = 4
+            else:
+                current_comment += char
+        elif state == 4:
+            # In multi-line comment with asterisk found. Determine if
+            # comment is ending.
+            if char == '/':
+                end_line = comment_start + current_comment.count('\n')
+                comment = common.Comment(
+                    current_comment, comment_start, end_line, multiline=True)
+                yield comment_offset, comment_start, comment
+                current_comment = ''
+                state = 0
+            else:
+                current_comment += '*'
+                # Care for multiple '*' in a row
+                if char != '*':
+                    current_comment += char
+                    state = 3
+        elif state == 5:
+            # In string literal, expect literal end or escape character.
+            if char == string_char:
+                state = 0
+            elif char == '\\':
+                state = 6
+        elif state == 6:
+            # In string literal, escaping current char.
+            state = 5
+        if char == '\n':
+            line_counter += 1
+            if state == 0:
+                yield index + 1, line_counter, None
+    if state == 3 or state == 4:
+        raise common.UnterminatedCommentError()
+    if state == 2:
+        # Was in single-line comment. Create comment.
+        comment = common.Comment(current_comment, line_counter)
+        yield comment_offset, line_counter, comment
@@ -0,0 +1,154 @@
+#!/usr/bin/python
+"""This module provides incremental comment extraction for edited sources.
+
+Editors and language servers re-extract comments every time a buffer changes.
+Rather than re-scanning the whole buffer, an IncrementalExtractor remembers the
+line starts at which its parser was outside of any comment or string literal.
+After an edit only the text between the closest such line start before the
+edit and the first one after it that is unaffected by the edit is re-scanned.
+Comments past that point are reused with their line numbers shifted.
+
+Works with the parsers that expose a scan() function:
+    c_parser
+    go_parser
+    js_parser
+    shell_parser
+"""
+
+import bisect
+
+from comment_parser.parsers import common as common
+
+
+class IncrementalExtractor(object):
+    """Keeps the comments of a source buffer up to date across edits."""
+
+    def __init__(self, parser, source):
+        """Initializes IncrementalExtractor with a full scan of source.
+
+        Args:
+            parser: Parser module providing scan(), e.g. parsers.c_parser.
+            source: String source text.
+        Raises:
+            common.UnterminatedCommentError: Encountered an unterminated
+                multi-line comment.
+        """
+        self._parser = parser
+        self._source = source
+        self._comments = []
+        self._comment_offsets = []
+        self._safe_offsets = [0]
+        self._safe_lines = [1]
+        for offset, line_number, comment in parser.scan(source):
+            _record(offset, line_number, comment, self._comments,
+                    self._comment_offsets, self._safe_offsets,
+                    self._safe_lines)
+
+    def source(self):
+        """Returns the current source text.
+
+        Returns:
+            String
+        """
+        return self._source
+
+    def comments(self):
+        """Returns the comments of the current source text.
+
+        Returns:
+            Python list of common.Comment in the order that they appear in the
+                source.
+        """
+        return list(self._comments)
+
+    def apply_edit(self, start, end, replacement):
+        """Replaces source[start:end] with replacement and updates comments.
+
+        Offsets index the decoded source text. If the edit leaves a multi-line
+        comment unterminated the error is raised and the extractor is left
+        unchanged.
+
+        Args:
+            start: Index (int) of the first replaced character.
+            end: Index (int) one past the last replaced character.
+            replacement: String text to insert in place of source[start:end].
+        Returns:
+            Python list of common.Comment for the edited source in the order
+                that they appear in it.
+        Raises:
+            ValueError: start and end do not describe a range of the source.
+            common.UnterminatedCommentError: Encountered an unterminated
+                multi-line comment.
+        """
+        if not 0 <= start <= end <= len(self._source):
+            raise ValueError('Invalid edit range [%d, %d) for source of '
+                             'length %d' % (start, end, len(self._source)))
+        source = self._source[:start] + replacement + self._source[end:]
+        delta = len(replacement) - (end - start)
+        line_delta = (replacement.count('\n') -
+                      self._source.count('\n', start, end))
+
+        # Resume from the closest safe line start at or before the edit. Its
+        # text and lexer state are unaffected by the edit.
+        restart = bisect.bisect_right(self._safe_offsets, start) - 1
+        resume_offset = self._safe_offsets[restart]
+        kept_comments = bisect.bisect_left(self._comment_offsets,
+                                           resume_offset)
+
+        comments = self._comments[:kept_comments]
+        comment_offsets = self._comment_offsets[:kept_comments]
+        safe_offsets = self._safe_offsets[:restart + 1]
+        safe_lines = self._safe_lines[:restart + 1]
+
+        edit_end = start + len(replacement)
+        resync = None
+        for offset, line_number, comment in self._parser.scan(
+                source, resume_offset, self._safe_lines[restart]):
+            if comment is None and offset >= edit_end:
+                old = bisect.bisect_left(self._safe_offsets, offset - delta)
+                if (old < len(self._safe_offsets) and
+                        self._safe_offsets[old] == offset - delta):
+                    # Lexer state matches the previous scan from here on.
+                    resync = old
+                    break
+            _record(offset, line_number, comment, comments, comment_offsets,
+                    safe_offsets, safe_lines)
+
+        if resync is not None:
+            reused = bisect.bisect_left(self._comment_offsets,
+                                        self._safe_offsets[resync])
+            for comment in self._comments[reused:]:
+                comments.append(_shift_comment(comment, line_delta))
+            comment_offsets.extend(
+                offset + delta for offset in self._comment_offsets[reused:])
+            safe_offsets.extend(
+                offset + delta for offset in self._safe_offsets[resync:])
+            safe_lines.extend(
+                line + line_delta for line in self._safe_lines[resync:])
+
+        self._source = source
+        self._comments = comments
+        self._comment_offsets = comment_offsets
+        self._safe_offsets = safe_offsets
+        self._safe_lines = safe_lines
+        return list(comments)
+
+
+def _record(offset, line_number, comment, comments, comment_offsets,
+            safe_offsets, safe_lines):
+    """Appends a scan() result to the matching comment or safe point lists."""
+    if comment is None:
+        safe_offsets.append(offset)
+        safe_lines.append(line_number)
+    else:
+        comments.append(comment)
+        comment_offsets.append(offset)
+
+
+def _shift_comment(comment, line_delta):
+    """Returns comment moved down by line_delta lines."""
+    if line_delta == 0:
+        return comment
+    return common.Comment(comment.text(), comment.start_line() + line_delta,
+                          comment.end_line() + line_delta,
+                          comment.is_multiline())
@@ -12,61 +12,224 @@ def has_annotations(node):
     return False
 
 
-def tag_comments(comments, file_content, eof_line_number):
-    tree = javalang.parse.parse(file_content)
+def lines_text(file_content, line_starts, first_line, last_line):
+    """Returns lines first_line to last_line (inclusive, from 1) of file_content.
+
+    The text is sliced straight out of file_content using its line start
+    offsets, with a newline ending every line.
+    """
+    line_count = len(line_starts)
+    if line_starts[-1] == len(file_content):
+        line_count -= 1
+    last_line = min(last_line, line_count)
+    if first_line > last_line:
+        return ''
+    if last_line < len(line_starts):
+        return file_content[line_starts[first_line - 1]:line_starts[last_line]]
+    return file_content[line_starts[first_line - 1]:] + '\n'
+
+
+def tag_comments(comments, file_content, eof_line_number, tokens=None):
+    """Tags comments with the javalang node they document.
+
+    A comment is tagged with the first node in preorder that starts on its
+    last line or the line after it, or an annotated node starting on the line
+    before it, together with the text of the node's lines.
+
+    Args:
+        comments: list of common.Comment to tag.
+        file_content: (str) source with the comments blanked out.
+        eof_line_number: last line of a node that ends at the end of the file.
+        tokens: javalang tokens of the source, which is tokenized again if not
+            given.
+    Raises:
+        javalang.parser.JavaParserBaseException: The source is not valid Java 8.
+        javalang.tokenizer.LexerError: The source could not be tokenized.
+    """
+    with common.phase('parsing'):
+        if tokens is None:
+            tree = javalang.parse.parse(file_content)
+        else:
+            tree = javalang.parser.Parser(tokens).parse()
+
+    line_starts = javalang.tokenizer.LineIndex(file_content).line_starts()
+    nodes = tree.index.nodes(javalang.tree.Node)
+
+    # Positions in nodes of the first node starting on each line, and of the
+    # first annotated one
+    first_nodes = {}
+    first_annotated = {}
+    for i, node in enumerate(nodes):
+        if node.position.start is not None and not isinstance(node, javalang.tree.CompilationUnit):
+            node_start = node.position.start[0]
+            first_nodes.setdefault(node_start, i)
+            if has_annotations(node):
+                first_annotated.setdefault(node_start, i)
+    common.count('ast_nodes', len(nodes))
 
     for comment in comments:
-        for path, node in tree:
-            if node.position.start is not None and type(node).__name__ not in ['CompilationUnit']:
-                node_start = node.position.start[0]
-                comment_line = comment.end_line()
-                after_comment = comment.end_line() + 1
-                before_comment = comment.start_line() - 1
-                if len(comment.node_list()) == 0 and (node_start == comment_line or node_start == after_comment or
-                                                      (node_start == before_comment and has_annotations(node))):
-                    if node.position.end is not None:
-                        node_end = node.position.end[0] - 1
-                        if type(node).__name__ == 'PackageDeclaration':
-                            node_end += 1
-                    else:
-                        node_end = eof_line_number
-
-                    node_text = ''
-                    line_counter = 0
-                    for line in file_content.splitlines():
-                        if node_start - 1 <= line_counter <= node_end - 1:
-                            node_text = node_text + line + '\n'
-                        elif line_counter > node_end - 1:
-                            break
-                        line_counter += 1
-                    comment.node_list().append((node, node_text))
-
-
-def remove_comment(file_content, comment_text, multiline):
-    replace_with = ' '
+        candidates = [i for i in (first_nodes.get(comment.end_line()),
+                                  first_nodes.get(comment.end_line() + 1),
+                                  first_annotated.get(comment.start_line() - 1)) if i is not None]
+        if not candidates:
+            continue
+        node = nodes[min(candidates)]
+        node_start = node.position.start[0]
+        if node.position.end is not None:
+            node_end = node.position.end[0] - 1
+            if isinstance(node, javalang.tree.PackageDeclaration):
+                node_end += 1
+        else:
+            node_end = eof_line_number
+
+        node_text = lines_text(file_content, line_starts, node_start, node_end)
+        comment.node_list().append((node, node_text))
+
+
+def comment_replacement(comment_text, multiline):
+    """Returns the blank text a comment is replaced with before parsing.
+
+    Multi-line comments keep their line breaks so that code after them stays
+    on the same line.
+    """
     if multiline:
-        comment_text = '/*' + comment_text + '*/'
-        for i in range(1, comment_text.count('\n') + 1):
-            replace_with = replace_with + ' \n'
-    else:
-        comment_text = '//' + comment_text
-    file_content = file_content.replace(comment_text, replace_with, 1)
-    return file_content
-
-
-def combine_consecutive_comments(comments, current_comment):
-    if len(comments) > 0:
-        previous_comment = comments[len(comments) - 1]
-        if not previous_comment.is_multiline() and current_comment.start_line() == previous_comment.end_line() + 1:
-            del comments[len(comments) - 1]
-            combined_text = previous_comment.text() + ' ' + current_comment.text()
-            new_comment = common.Comment(text=combined_text, start_line=previous_comment.start_line(),
-                                         end_line=current_comment.end_line())
-            return new_comment
-    return current_comment
-
-
-def extract_comments(filename):
+        return ' ' + ' \n' * comment_text.count('\n')
+    return ' '
+
+
+def line_tail(tail, text):
+    """Returns what follows the last line break once text is added after tail."""
+    line_break = text.rfind('\n')
+    if line_break == -1:
+        return tail + text
+    return text[line_break + 1:]
+
+
+# Starts of comments and of string, character and text block literals
+_CODE_EVENTS = re.compile(r'/[/*]|["\']')
+# Match the rest of a literal after its opening quotes. Strings and characters
+# end at a line break like in Java, unlike in the javalang tokenizer.
+_LITERAL_ENDS = {
+    '"': re.compile(r'[^"\\\n]*(?:\\.[^"\\\n]*)*"'),
+    "'": re.compile(r"[^'\\\n]*(?:\\.[^'\\\n]*)*'"),
+    '"""': re.compile(r'[^"\\]*(?:(?:\\.|"{1,2}(?!"))[^"\\]*)*"""', re.DOTALL),
+}
+
+
+def decode_unicode_escapes(file_content):
+    """Returns file_content with its unicode escapes decoded as the javalang tokenizer does."""
+    if '\\u' not in file_content:
+        return file_content
+    tokenizer = javalang.tokenizer.JavaTokenizer(file_content)
+    tokenizer.reset()
+    try:
+        tokenizer.pre_tokenize()
+    except javalang.tokenizer.LexerError:
+        return file_content
+    return tokenizer.data
+
+
+def scan_comments(source):
+    """Finds the comments of Java source without tokenizing it.
+
+    Only string, character and text block literals are told apart from the
+    rest of the code, which is all it takes to find comments. Unlike the
+    javalang tokenizer it accepts any Java version.
+
+    Args:
+        source: (str) Java source code with its unicode escapes decoded.
+    Returns:
+        list of (offset, text) of the comments in source, in order. The text of
+            a single-line comment includes its line break, as in javalang tokens.
+    Raises:
+        common.UnterminatedCommentError: Encountered an unterminated multi-line
+            comment.
+    """
+    comments = []
+    i = 0
+    while True:
+        match = _CODE_EVENTS.search(source, i)
+        if match is None:
+            return comments
+        i = match.start()
+        if source.startswith('//', i):
+            end = source.find('\n', i)
+            end = len(source) if end == -1 else end + 1
+        elif source.startswith('/*', i):
+            end = source.find('*/', i + 2)
+            if end == -1:
+                raise common.UnterminatedCommentError()
+            end += 2
+        else:
+            quote = '"""' if source.startswith('"""', i) else source[i]
+            literal = _LITERAL_ENDS[quote].match(source, i + len(quote))
+            # Go on after the quote of an unterminated literal
+            i = literal.end() if literal else i + 1
+            continue
+        comments.append((i, source[i:end]))
+        i = end
+
+
+def blank_comments(source, found, values=None):
+    """Turns comments found in source into Comment objects and blanks them out.
+
+    Args:
+        source: (str) in which the comments were found.
+        found: (offset, text) of every comment in order.
+        values: (list) optional text to give each Comment instead of its text
+            in source, e.g. with its unicode escapes decoded.
+    Returns:
+        (comments, alone, blanked) where comments is a list of common.Comment,
+            alone tells for each of them whether it is a single-line comment
+            with only spaces and tabs around it on its line, and blanked is
+            source with every comment replaced by blanks.
+    """
+    comments = []
+    alone = []
+
+    # Comments are blanked out of the source, which is rebuilt from the
+    # pieces in between them
+    pieces = []
+    copied = 0
+    tail = ''
+    line_number = 1
+    for index, (offset, value) in enumerate(found):
+        line_number += source.count('\n', copied, offset)
+        start_line = line_number
+        text = value if values is None else values[index]
+        if text.startswith('/*'):
+            is_multiline = True
+            comment_text = text.replace('/*', '', 1)
+            comment_text = comment_text.replace('*/', '', 1)
+            end_line = start_line + value.count('\n')
+            removed = value
+        else:
+            is_multiline = False
+            removed = value.rstrip()
+            comment_text = text.rstrip().replace('//', '', 1)
+            end_line = start_line
+
+        comments.append(common.Comment(comment_text, start_line, end_line, is_multiline))
+
+        before = source[copied:offset]
+        pieces.append(before)
+        tail = line_tail(tail, before)
+
+        # Only spaces and tabs may surround a comment alone on its line
+        alone.append(not is_multiline and not tail.strip(' \t') and
+                     not value.rstrip('\n')[len(removed):].strip(' \t'))
+
+        replacement = comment_replacement(removed, is_multiline)
+        pieces.append(replacement)
+        tail = line_tail(tail, replacement)
+        copied = offset + len(removed)
+        line_number += removed.count('\n')
+
+    pieces.append(source[copied:])
+    return comments, alone, ''.join(pieces)
+
+
+def extract_comments(filename, group=True, tag=True):
     """Extracts a list of comments from the given source file.
 
     Comments are represented with the Comment class found in the common module.
@@ -76,10 +239,20 @@ def extract_comments(filename):
             multiple lines of code. If a multi-line comment does not terminate
             before EOF is reached, then an exception is raised.
 
+    Comments are found with the javalang tokenizer and tagged with the nodes
+    of the javalang tree. A file javalang cannot tokenize or parse, e.g. one
+    using syntax newer than Java 8, falls back to scan_comments and untagged
+    comments.
+
     Note that this doesn't take language-specific preprocessor directives into consideration.
 
     Args:
         filename: String name of the file to extract comments from.
+        group: Whether to group single-line comments on consecutive lines into one comment,
+            see common.group_consecutive_comments.
+        tag: Whether to tag the comments with javalang nodes. Without tagging
+            the file is neither tokenized nor parsed, and the comments are
+            found by scan_comments instead.
     Returns:
         Python list of common.Comment in the order that they appear in the file.
     Raises:
@@ -89,44 +262,44 @@ def extract_comments(filename):
     """
     try:
         with open(filename, 'r') as source_file:
-            comments = []
-            file_content = source_file.read()
-            tokens = list(javalang.tokenizer.tokenize(file_content))
-
-            prev_line = ''
-            prev_comment_text = '-'
-            for token in tokens:
-                if token.__class__.__name__ == 'Comment':
-                    comment_text = token.value
-                    if comment_text.startswith('/*'):
-                        is_multiline = True
-                        comment_text = comment_text.replace('/*', '', 1)
-                        comment_text = comment_text.replace('*/', '', 1)
-                        end_line = token.position[0]
-                        start_line = end_line - comment_text.count('\n')
-                    else:
-                        is_multiline = False
-                        comment_text = token.value.rstrip().replace('//', '', 1)
-                        end_line = token.position[0] - 1
-                        start_line = token.position[0] - 1
-
-                    comment = common.Comment(comment_text, start_line, end_line, is_multiline)
-
-                    if not is_multiline:
-                        line_counter = 0
-                        for line in file_content.splitlines():
-                            if start_line - 1 == line_counter:
-                                if re.match(r"^[ \t]*//" + re.escape(comment_text) + r"[ \t]*$", line) and \
-                                        re.match(r"^[ \t]*//" + re.escape(prev_comment_text) + r"[ \t]*$", prev_line):
-                                    comment = combine_consecutive_comments(comments, comment)
-
-                                prev_comment_text = comment_text
-                                prev_line = line
-                                break
-                            line_counter += 1
-                    file_content = remove_comment(file_content, comment_text, is_multiline)
-                    comments.append(comment)
-            tag_comments(comments, file_content, eof_line_number=file_content.count('\n'))
-            return comments
-    except OSError as exception:
+            with common.phase('io'):
+                file_content = source_file.read()
+    except (OSError, UnicodeDecodeError) as exception:
         raise common.FileError(str(exception))
+    common.count('chars', len(file_content))
+
+    with common.phase('lexing'):
+        found = None
+        if tag:
+            # Comments come as trivia of the tokens, which are parsed as they are
+            tokenizer = javalang.tokenizer.JavaTokenizer(file_content, trivia=True)
+            try:
+                tokens = list(tokenizer.tokenize())
+            except javalang.tokenizer.LexerError:
+                common.count('lexer_errors')
+            else:
+                common.count('tokens', len(tokens) + len(tokenizer.comments))
+                # Comments are blanked out of the source as written, so that
+                # node text keeps its unicode escapes while comment text has
+                # them decoded
+                source = file_content
+                found = [(comment.source_offset, source[comment.source_offset:comment.source_end_offset])
+                         for comment in tokenizer.comments]
+                values = [comment.value for comment in tokenizer.comments]
+        if found is None:
+            tag = False
+            source = decode_unicode_escapes(file_content)
+            found = scan_comments(source)
+            values = None
+        comments, alone, file_content = blank_comments(source, found, values)
+
+    if group:
+        with common.phase('merging'):
+            comments = common.group_consecutive_comments(comments, alone)
+    if tag:
+        with common.phase('tagging'):
+            try:
+                tag_comments(comments, file_content, eof_line_number=file_content.count('\n'), tokens=tokens)
+            except (javalang.parser.JavaParserBaseException, javalang.tokenizer.LexerError):
+                common.count('syntax_errors')
+    return comments
@@ -5,50 +5,339 @@ for parsing comments from Python."""
 from comment_parser.parsers import common as common
 from comment_parser.parsers import ast_visitor
 import tokenize
-import asttokens
 import ast
+import bisect
 import io
 import re
+import sys
 
+SINGLE_QUOTE_DOCSTRING = re.compile("^[ \t]*'''[^'\\\\]*(?:(?:\\\\.|'{1,2}(?!'))[^'\\\\]*)*'''$",
+                                    re.MULTILINE | re.DOTALL)
+DOUBLE_QUOTE_DOCSTRING = re.compile('^[ \t]*"""[^"\\\\]*(?:(?:\\\\.|"{1,2}(?!"))[^"\\\\]*)*"""$',
+                                    re.MULTILINE | re.DOTALL)
 
-def combine_consecutive_comments(comments, current_comment):
-    if len(comments) > 0:
-        previous_comment = comments[len(comments) - 1]
-        if current_comment.start_line() == previous_comment.end_line() + 1:
-            del comments[len(comments) - 1]
-            combined_text = previous_comment.text() + ' ' + current_comment.text()
-            new_comment = common.Comment(text=combined_text, start_line=previous_comment.start_line(),
-                                         end_line=current_comment.end_line())
-            return new_comment
-    return current_comment
 
+class SourceText(object):
+    """Gets the source text of ast nodes from their start and end positions.
 
-def parse_single_line_comments(file_contents, comments):
+    This gives the same text as asttokens.ASTTokens.get_text(), but slices it
+    out of the source through a table of line start offsets instead of marking
+    every token with its nodes. As with asttokens, the text of a decorated
+    definition starts at its first decorator, and the text of a node spanning
+    several logical lines starts at the beginning of its first line.
+    """
+
+    def __init__(self, source, newlines=None):
+        """
+        Args:
+            source: (str) the nodes were parsed from.
+            newlines: (row, column) positions of the NEWLINE tokens of source,
+                in order. They are found with tokenize when first needed if
+                not given.
+        """
+        self._source = source
+        self._ascii = len(source.encode('utf-8')) == len(source)
+        self._line_starts = [0]
+        self._line_starts.extend(match.end() for match in re.finditer('\n', source))
+        self._newlines = newlines
+        self._newline_offsets = None
+
+    def _offset(self, lineno, col_offset):
+        # Column offsets of ast nodes count UTF-8 bytes
+        start = self._line_starts[lineno - 1]
+        if self._ascii:
+            return start + col_offset
+        prefix = self._source[start:start + col_offset].encode('utf-8')[:col_offset]
+        return start + len(prefix.decode('utf-8', 'ignore'))
+
+    def _spans_logical_lines(self, start, end):
+        if self._newline_offsets is None:
+            newlines = self._newlines
+            if newlines is None:
+                tokens = tokenize.generate_tokens(io.StringIO(self._source).readline)
+                newlines = [token[2] for token in tokens if token[0] == tokenize.NEWLINE]
+            # Each NEWLINE token is at the end of its row, also once comments
+            # have been blanked out of the source
+            ends = self._line_starts[1:]
+            ends.append(len(self._source) + 1)
+            self._newline_offsets = [ends[row - 1] - 1 for row, col in newlines]
+        i = bisect.bisect_left(self._newline_offsets, start)
+        return i < len(self._newline_offsets) and self._newline_offsets[i] < end
+
+    def get_text(self, node):
+        if getattr(node, 'end_lineno', None) is None:
+            return ''
+        start = self._offset(node.lineno, node.col_offset)
+        end = self._offset(node.end_lineno, node.end_col_offset)
+        decorators = getattr(node, 'decorator_list', None)
+        if decorators:
+            start = self._source.rfind('@', 0, self._offset(decorators[0].lineno, decorators[0].col_offset))
+        if self._spans_logical_lines(start, end):
+            start = self._source.rfind('\n', 0, start) + 1
+        return self._source[start:end]
+
+
+def parse_source(file_content, newlines=None):
+    """Parses file_content into an ast tree.
+
+    Args:
+        file_content: (str) to parse.
+        newlines: positions of the NEWLINE tokens of file_content, see
+            SourceText.
+    Returns:
+        (root, source) where source gives the text of the nodes of the tree
+            through get_text(node). Before Python 3.8 ast nodes have no end
+            positions, so the optional asttokens package is used.
+    """
+    if sys.version_info >= (3, 8):
+        return ast.parse(file_content), SourceText(file_content, newlines)
+    import asttokens
+    ast_tokens = asttokens.ASTTokens(file_content, parse=True)
+    return ast_tokens.tree, ast_tokens
+
+
+def node_text_without_docstrings(source, node):
+    node_text = source.get_text(node)
+    node_text = re.sub(SINGLE_QUOTE_DOCSTRING, " ", node_text)
+    return re.sub(DOUBLE_QUOTE_DOCSTRING, " ", node_text)
+
+
+def add_single_line_comments(file_contents, comments, found, group=True):
+    """ Adds single line comments to a list and blanks them out of the source.
+
+        Args:
+            file_contents: (str) in which the comments were found
+            comments: list of comments. Each entry is a Comment class object
+            found: (start, end, line_number, alone) of every comment in order, where start and end are
+                its offsets in file_contents and alone tells whether only spaces and tabs precede it
+                on its line
+            group: whether to group comments alone on consecutive lines into one
+        Returns:
+            file_contents with each comment replaced by a space
+    """
+    pieces = []
+    position = 0
+    single_line_comments = []
+    for start, end, line_number, alone in found:
+        pieces.append(file_contents[position:start])
+        pieces.append(' ')
+        position = end
+        comment_text = file_contents[start + 1:end]
+
+        # Create comment using token text and line number
+        single_line_comments.append(common.Comment(text=comment_text, start_line=line_number, end_line=line_number))
+    pieces.append(file_contents[position:])
+
+    if group:
+        with common.phase('merging'):
+            single_line_comments = common.group_consecutive_comments(
+                single_line_comments, [alone for _, _, _, alone in found])
+    comments.extend(single_line_comments)
+    return ''.join(pieces)
+
+
+def parse_single_line_comments(file_contents, comments, newlines=None, group=True):
     """ Extracts single line comments and adds them to a list.
 
         Args:
             file_contents: (str) from which comments are to be extracted
             comments: list of comments. Each entry is a Comment class object
+            newlines: optional list to add the positions of NEWLINE tokens to
+            group: whether to group comments alone on consecutive lines into one
+        Returns:
+            file_contents with each comment replaced by a space
     """
+    line_starts = [0]
+    line_starts.extend(match.end() for match in re.finditer('\n', file_contents))
     buf = io.StringIO(file_contents)
-    prev_line = ''
-    prev_token = '-'
+    found = []
+    token_count = 0
     for token_type, token, start, end, line in tokenize.generate_tokens(buf.readline):
-        if token_type == tokenize.COMMENT:
-            file_contents = file_contents.replace(token, ' ', 1)
-            comment_text = token.replace('#', '', 1)
-            line_number = start[0]
+        token_count += 1
+        if token_type == tokenize.NEWLINE and newlines is not None:
+            newlines.append(start)
+        elif token_type == tokenize.COMMENT:
+            row, column = start
+            offset = line_starts[row - 1] + column
+            alone = not line[:column].strip(' \t') and line[column + len(token):] in ('', '\n')
+            found.append((offset, offset + len(token), row, alone))
+    common.count('tokens', token_count)
+    return add_single_line_comments(file_contents, comments, found, group)
+
 
-            # Create comment using token text and line number
-            comment = common.Comment(text=comment_text, start_line=line_number, end_line=line_number)
-            if re.match(r"^[ \t]*" + re.escape(token) + r"[ \t]*$", line) and \
-                    re.match(r"^[ \t]*" + re.escape(prev_token) + r"[ \t]*$", prev_line):
-                comment = combine_consecutive_comments(comments, comment)
-            comments.append(comment)
+# Characters that start a comment or a string outside of strings
+_CODE_EVENTS = re.compile('[#\'"]')
+_COMMENT = re.compile('#[^\r\n]*')
+_STRING_PREFIXES = frozenset(['', 'r', 'u', 'b', 'f', 'br', 'rb', 'fr', 'rf'])
+# Match the rest of a string literal after its opening quotes
+_STRING_ENDS = {
+    "'": re.compile("[^'\\\\\n]*(?:\\\\.[^'\\\\\n]*)*'", re.DOTALL),
+    '"': re.compile('[^"\\\\\n]*(?:\\\\.[^"\\\\\n]*)*"', re.DOTALL),
+    "'''": re.compile("[^'\\\\]*(?:(?:\\\\.|'{1,2}(?!'))[^'\\\\]*)*'''", re.DOTALL),
+    '"""': re.compile('[^"\\\\]*(?:(?:\\\\.|"{1,2}(?!"))[^"\\\\]*)*"""', re.DOTALL),
+}
+# Characters that matter in the literal text of f-strings, by quote, and in
+# their replacement fields
+_FSTRING_EVENTS = {
+    "'": re.compile("['\\\\{}\n]"),
+    '"': re.compile('["\\\\{}\n]'),
+    "'''": re.compile("['\\\\{}]"),
+    '"""': re.compile('["\\\\{}]'),
+}
+_FIELD_EVENTS = re.compile('[#\'"\\\\()\\[\\]{}:]')
 
-            prev_line = line
-            prev_token = token
-    return file_contents
+
+def _is_name_char(char):
+    return char.isalnum() or char == '_'
+
+
+def _skip_string(source, i, comments):
+    """Returns the offset past the string literal whose opening quote is at i."""
+    start = i
+    while start > 0 and i - start < 3 and _is_name_char(source[start - 1]):
+        start -= 1
+    prefix = source[start:i].lower()
+    if prefix not in _STRING_PREFIXES or (start > 0 and _is_name_char(source[start - 1])):
+        # The quote follows a name rather than a string prefix
+        prefix = ''
+    quote = source[i] * 3 if source.startswith(source[i] * 3, i) else source[i]
+    if 'f' in prefix:
+        return _skip_fstring(source, i, quote, 'r' in prefix, comments)
+    match = _STRING_ENDS[quote].match(source, i + len(quote))
+    if match:
+        return match.end()
+    # Like tokenize, go on after the quote of an unterminated single-quoted string
+    return len(source) if len(quote) == 3 else i + 1
+
+
+def _skip_fstring(source, i, quote, raw, comments):
+    """Returns the offset past the f-string literal whose opening quote is at i.
+
+    Replacement fields are scanned as code, so that they may hold strings with
+    the same quotes and, in triple-quoted f-strings, comments.
+    """
+    opening = i
+    events = _FSTRING_EVENTS[quote]
+    # Bracket depth of each open replacement field, innermost last, or None
+    # while in its format spec
+    fields = []
+    i += len(quote)
+    while True:
+        if not fields or fields[-1] is None:
+            match = events.search(source, i)
+            if match is None:
+                break
+            i = match.start()
+            char = source[i]
+            if char == '\\':
+                if not raw and source.startswith('N{', i + 1):
+                    # A named unicode escape, not a replacement field
+                    i = source.find('}', i)
+                    if i == -1:
+                        break
+                    i += 1
+                else:
+                    i += 1 if source.startswith(('{', '}'), i + 1) else 2
+            elif char == '\n':
+                return opening + 1
+            elif char == quote[0]:
+                if source.startswith(quote, i):
+                    return i + len(quote)
+                i += 1
+            elif char == '{':
+                if not fields and source.startswith('{{', i):
+                    i += 2
+                else:
+                    fields.append(0)
+                    i += 1
+            elif fields:
+                fields.pop()
+                i += 1
+            else:
+                i += 2 if source.startswith('}}', i) else 1
+        else:
+            match = _FIELD_EVENTS.search(source, i)
+            if match is None:
+                break
+            i = match.start()
+            char = source[i]
+            if char == '#':
+                end = _COMMENT.match(source, i).end()
+                comments.append((i, end))
+                i = end
+            elif char in '\'"':
+                i = _skip_string(source, i, comments)
+            elif char == '\\':
+                i += 2
+            elif char in '([{':
+                fields[-1] += 1
+                i += 1
+            elif char in ')]':
+                fields[-1] = max(fields[-1] - 1, 0)
+                i += 1
+            elif char == '}' and fields[-1] == 0:
+                fields.pop()
+                i += 1
+            elif char == '}':
+                fields[-1] -= 1
+                i += 1
+            else:
+                if fields[-1] == 0:
+                    fields[-1] = None
+                i += 1
+    if len(quote) == 1:
+        return opening + 1
+    return len(source)
+
+
+def scan_comments(source):
+    """Finds the '#' comments of Python source without tokenizing it.
+
+    Only strings, including f-strings with their replacement fields, are told
+    apart from the rest of the code, which is all it takes to find comments.
+
+    Args:
+        source: (str) Python source code.
+    Returns:
+        list of the (start, end) offsets of the comments in source, in order.
+    """
+    comments = []
+    i = 0
+    while True:
+        match = _CODE_EVENTS.search(source, i)
+        if match is None:
+            return comments
+        i = match.start()
+        if source[i] == '#':
+            end = _COMMENT.match(source, i).end()
+            comments.append((i, end))
+            i = end
+        else:
+            i = _skip_string(source, i, comments)
+
+
+def scan_single_line_comments(file_contents, comments, group=True):
+    """ Extracts single line comments like parse_single_line_comments, but finds them with
+        scan_comments instead of tokenize.
+
+        Args:
+            file_contents: (str) from which comments are to be extracted
+            comments: list of comments. Each entry is a Comment class object
+            group: whether to group comments alone on consecutive lines into one
+        Returns:
+            file_contents with each comment replaced by a space
+    """
+    found = []
+    line_number = 1
+    position = 0
+    for start, end in scan_comments(file_contents):
+        line_number += file_contents.count('\n', position, start)
+        position = start
+        line_start = file_contents.rfind('\n', 0, start) + 1
+        alone = not file_contents[line_start:start].strip(' \t') and \
+            (end == len(file_contents) or file_contents[end] == '\n')
+        found.append((start, end, line_number, alone))
+    return add_single_line_comments(file_contents, comments, found, group)
 
 
 def parse_multi_line_comments(file_contents, comments):
@@ -66,10 +355,9 @@ def parse_multi_line_comments(file_contents, comments):
         line.append(match.end())
 
     # Match triple double quoted strings spanning multiple lines
-    pattern = re.compile('^[ \t]*"""[^"\\\\]*(?:(?:\\\\.|"{1,2}(?!"))[^"\\\\]*)*"""$', re.MULTILINE | re.DOTALL)
-    for match in re.finditer(pattern, file_contents):
+    for match in re.finditer(DOUBLE_QUOTE_DOCSTRING, file_contents):
         # Store text and start and end line numbers of match
-        start_line = next(i for i in range(len(line)) if line[i] > match.start(0)) + 1
+        start_line = bisect.bisect_right(line, match.start(0)) + 1
         match = match.group(0)
         end_line = start_line + match.count("\n")
         match = match.replace('"""', '').strip()
@@ -79,10 +367,9 @@ def parse_multi_line_comments(file_contents, comments):
         comments.append(comment)
 
     # Match triple single quoted strings spanning multiple lines
-    pattern = re.compile("^[ \t]*'''[^'\\\\]*(?:(?:\\\\.|'{1,2}(?!'))[^'\\\\]*)*'''$", re.MULTILINE | re.DOTALL)
-    for match in re.finditer(pattern, file_contents):
+    for match in re.finditer(SINGLE_QUOTE_DOCSTRING, file_contents):
         # Store text and start and end line numbers of match
-        start_line = next(i for i in range(len(line)) if line[i] > match.start(0)) + 1
+        start_line = bisect.bisect_right(line, match.start(0)) + 1
         match = match.group(0)
         end_line = start_line + match.count("\n")
         match = match.replace("'''", '').strip()
@@ -92,64 +379,46 @@ def parse_multi_line_comments(file_contents, comments):
         comments.append(comment)
 
 
-def tag_comments(file_content, comments):
+def tag_comments(file_content, comments, newlines=None):
     """
     Tag comment with node retrieved from AST. Adds node to a list of nodes used as tags for the comment.
 
     Args:
         file_content: source file
         comments: list of comments of Comment class to be tagged
+        newlines: optional positions of the NEWLINE tokens of file_content
     """
     # tag comments at the first line of a block
-    ast_tokens = asttokens.ASTTokens(file_content, parse=True)
-    root = ast_tokens.tree
+    with common.phase('parsing'):
+        root, source = parse_source(file_content, newlines)
+    node_count = 0
     for node in ast.walk(root):
+        node_count += 1
         if node is not None and hasattr(node, 'lineno') and hasattr(node, 'body')\
                 and node.body is not None and hasattr(type(node.body), '__getitem__'):
             for comment in comments:
                 if node.lineno < comment.start_line() <= node.body[0].lineno and comment.is_multiline() \
                         or node.lineno < comment.start_line() < node.body[0].lineno and not comment.is_multiline():
-                    node_text = ast_tokens.get_text(node)
-                    singe_quote_comments = re.compile("^[ \t]*'''[^'\\\\]*(?:(?:\\\\.|'{1,2}(?!'))[^'\\\\]*)*'''$",
-                                                      re.MULTILINE | re.DOTALL)
-                    double_quote_comments = re.compile('^[ \t]*"""[^"\\\\]*(?:(?:\\\\.|"{1,2}(?!"))[^"\\\\]*)*"""$',
-                                                       re.MULTILINE | re.DOTALL)
-                    node_text = re.sub(singe_quote_comments, " ", node_text)
-                    node_text = re.sub(double_quote_comments, " ", node_text)
-                    comment.node_list().append((node, node_text))
+                    comment.node_list().append((node, node_text_without_docstrings(source, node)))
 
     # tag comments with source code on the same line/next line
+    nodes_at_line = ast_visitor.first_nodes_by_line(root)
     for comment in comments:
         current_line = comment.end_line()
         next_line = comment.end_line() + 1
 
-        node = ast_visitor.Visitor(ast_tokens).get_node_at_line(root, current_line)
+        node = nodes_at_line.get(current_line)
         if (node is not None and not isinstance(node, ast.Expr)) \
                 or (node is not None and isinstance(node, ast.Expr) and not isinstance(node.value, ast.Str)):
-            node_text = ast_tokens.get_text(node)
-            singe_quote_comments = re.compile("^[ \t]*'''[^'\\\\]*(?:(?:\\\\.|'{1,2}(?!'))[^'\\\\]*)*'''$",
-                                              re.MULTILINE | re.DOTALL)
-            double_quote_comments = re.compile('^[ \t]*"""[^"\\\\]*(?:(?:\\\\.|"{1,2}(?!"))[^"\\\\]*)*"""$',
-                                               re.MULTILINE | re.DOTALL)
-            node_text = re.sub(singe_quote_comments, " ", node_text)
-            node_text = re.sub(double_quote_comments, " ", node_text)
-            comment.node_list().append((node, node_text))
-            # visitor.visit_subtree(node)
+            comment.node_list().append((node, node_text_without_docstrings(source, node)))
         else:
-            node = ast_visitor.Visitor(ast_tokens).get_node_at_line(root, next_line)
+            node = nodes_at_line.get(next_line)
             if node is not None:
-                node_text = ast_tokens.get_text(node)
-                singe_quote_comments = re.compile("^[ \t]*'''[^'\\\\]*(?:(?:\\\\.|'{1,2}(?!'))[^'\\\\]*)*'''$",
-                                                  re.MULTILINE | re.DOTALL)
-                double_quote_comments = re.compile('^[ \t]*"""[^"\\\\]*(?:(?:\\\\.|"{1,2}(?!"))[^"\\\\]*)*"""$',
-                                                   re.MULTILINE | re.DOTALL)
-                node_text = re.sub(singe_quote_comments, " ", node_text)
-                node_text = re.sub(double_quote_comments, " ", node_text)
-                comment.node_list().append((node, node_text))
-                # visitor.visit_subtree(node)
-
-
-def extract_comments(filename):
+                comment.node_list().append((node, node_text_without_docstrings(source, node)))
+    common.count('ast_nodes', node_count)
+
+
+def extract_comments(filename, tag=True, group=True):
     """Extracts a list of comments from the given Python source file.
         Tags comment with piece of source code it is associated with
 
@@ -161,6 +430,10 @@ def extract_comments(filename):
 
         Args:
             filename: String name of the file to extract comments from.
+            tag: Whether to tag the comments with ast nodes. Without tagging the file is neither
+                tokenized nor parsed, and the comments are found by scan_comments instead.
+            group: Whether to group single-line comments on consecutive lines into one comment,
+                see common.group_consecutive_comments.
         Returns:
             Python list of common.Comment in the order that they appear in the file.
         Raises:
@@ -169,16 +442,25 @@ def extract_comments(filename):
     comments = []
     try:
         with open(filename, 'r') as source_file:
-            file_contents = source_file.read()
+            with common.phase('io'):
+                file_contents = source_file.read()
+            common.count('chars', len(file_contents))
 
             # extract single and multiline comments from source code file
-            file_contents = parse_single_line_comments(file_contents, comments)
-            parse_multi_line_comments(file_contents, comments)
-            comments.sort(key=lambda x: x.start_line())
+            with common.phase('lexing'):
+                newlines = []
+                if tag:
+                    file_contents = parse_single_line_comments(file_contents, comments, newlines, group)
+                else:
+                    file_contents = scan_single_line_comments(file_contents, comments, group)
+                parse_multi_line_comments(file_contents, comments)
+                comments.sort(key=lambda x: x.start_line())
 
-            tag_comments(file_contents, comments)
+            if tag:
+                with common.phase('tagging'):
+                    tag_comments(file_contents, comments, newlines)
 
             source_file.close()
         return comments
-    except OSError as exception:
+    except (OSError, UnicodeDecodeError) as exception:
         raise common.FileError(str(exception))
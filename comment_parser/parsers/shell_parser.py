@@ -4,7 +4,7 @@
 from comment_parser.parsers import common as common
 
 
-def extract_comments(filename):
+def extract_comments(filename, group=False):
     """Extracts a list of comments from the given shell script.
 
     Comments are represented with the Comment class found in the common module.
@@ -16,60 +16,82 @@ def extract_comments(filename):
 
     Args:
         filename: String name of the file to extract comments from.
+        group: Whether to group single-line comments on consecutive lines
+            into one comment, see common.group_consecutive_comments.
     Returns:
         Python list of common.Comment in the order that they appear in the file.
     Raises:
         common.FileError: File was unable to be open or read.
     """
     try:
-        with open(filename, 'r') as source_file:
-            state = 0
-            string_char = ''
-            current_comment = ''
-            comments = []
-            line_counter = 1
-            while True:
-                char = source_file.read(1)
-                if not char:
-                    # EOF
-                    if state is 1:
-                        # Was in single line comment. Create comment.
-                        comment = common.Comment(current_comment, line_counter)
-                        comments.append(comment)
-                    return comments
-                if state is 0:
-                    # Waiting for comment start character, beginning of string,
-                    # or escape character.
-                    if char == '#':
-                        state = 1
-                    elif char == '"' or char == "'":
-                        string_char = char
-                        state = 2
-                    elif char == '\\':
-                        state = 4
-                elif state is 1:
-                    # Found comment start character. Read comment until EOL.
-                    if char == '\n':
-                        comment = common.Comment(current_comment, line_counter)
-                        comments.append(comment)
-                        current_comment = ''
-                        state = 0
-                    else:
-                        current_comment += char
-                elif state is 2:
-                    # In string literal, wait for string end or escape char.
-                    if char == string_char:
-                        state = 0
-                    elif char == '\\':
-                        state = 3
-                elif state is 3:
-                    # Escaping current char, inside of string.
-                    state = 2
-                elif state is 4:
-                    # Escaping current char, outside of string.
-                    state = 0
-                if char == '\n':
-                    line_counter += 1
-    except OSError as exception:
+        with common.phase('io'), open(filename, 'r') as source_file:
+            source = source_file.read()
+    except (OSError, UnicodeDecodeError) as exception:
         raise common.FileError(str(exception))
+    common.count('chars', len(source))
+    with common.phase('lexing'):
+        return common.scanned_comments(source, scan(source), group)
+
+
+def scan(source, offset=0, line_counter=1):
+    """Scans shell script source text for comments.
+
+    Scanning must begin outside of any comment or string literal. Every line
+    start reached outside of a comment or string literal is reported as a safe
+    point that scanning can later be resumed from, see the incremental module.
 
+    Args:
+        source: String source text.
+        offset: Index into source (int) to begin scanning at.
+        line_counter: Line number (int) of the character at offset.
+    Yields:
+        (offset, line_number, comment) tuples in source order. For a comment,
+            offset and line_number locate its opening delimiter. A comment of
+            None marks a safe line start at offset.
+    """
+    state = 0
+    string_char = ''
+    current_comment = ''
+    comment_offset = offset
+    for index in range(offset, len(source)):
+        char = source[index]
+        if state == 0:
+            # Waiting for comment start character, beginning of string,
+            # or escape character.
+            if char == '#':
+                comment_offset = index
+                state = 1
+            elif char == '"' or char == "'":
+                string_char = char
+                state = 2
+            elif char == '\\':
+                state = 4
+        elif state == 1:
+            # Found comment start character. Read comment until EOL.
+            if char == '\n':
+                comment = common.Comment(current_comment, line_counter)
+                yield comment_offset, line_counter, comment
+                current_comment = ''
+                state = 0
+            else:
+                current_comment += char
+        elif state == 2:
+            # In string literal, wait for string end or escape char.
+            if char == string_char:
+                state = 0
+            elif char == '\\':
+                state = 3
+        elif state == 3:
+            # Escaping current char, inside of string.
+            state = 2
+        elif state == 4:
+            # Escaping current char, outside of string.
+            state = 0
+        if char == '\n':
+            line_counter += 1
+            if state == 0:
+                yield index + 1, line_counter, None
+    if state == 1:
+        # Was in single line comment. Create comment.
+        comment = common.Comment(current_comment, line_counter)
+        yield comment_offset, line_counter, comment
@@ -12,10 +12,10 @@ from io import StringIO
 class CParserTest(unittest.TestCase):
 
     @mock.patch.object(builtins, 'open')
-    def ExtractComments(self, text, mock_open):
+    def ExtractComments(self, text, mock_open, group=False):
         mock_file = StringIO(text)
         mock_open.return_value = mock_file
-        return c_parser.extract_comments('filename')
+        return c_parser.extract_comments('filename', group=group)
 
     def testSingleLineComment(self):
         text = '// single line comment'
@@ -23,6 +23,15 @@ class CParserTest(unittest.TestCase):
         expected = [common.Comment(text[2:], 1, multiline=False)]
         self.assertEqual(comments, expected)
 
+    def testGroupedSingleLineComments(self):
+        text = '// one\n  // two\nint a; // three\n// four\n/* five */\n// six'
+        comments = self.ExtractComments(text, group=True)
+        self.assertEqual([(c.text(), c.start_line(), c.end_line())
+                          for c in comments],
+                         [(' one  two', 1, 2), (' three', 3, 3),
+                          (' four', 4, 4), (' five ', 5, 5), (' six', 6, 6)])
+        self.assertEqual(len(self.ExtractComments(text)), 6)
+
     def testSingleLineCommentInStringLiteral(self):
         text = 'char* msg = "// this is not a comment"'
         comments = self.ExtractComments(text)
@@ -31,9 +40,15 @@ class CParserTest(unittest.TestCase):
     def testMultiLineComment(self):
         text = '/* multiline\ncomment */'
         comments = self.ExtractComments(text)
-        expected = [common.Comment(text[2:-2], 1, multiline=True)]
+        expected = [common.Comment(text[2:-2], 1, 2, multiline=True)]
         self.assertEqual(comments, expected)
 
+    def testMultiLineCommentEndLine(self):
+        text = 'int a;\n/* x\n y\n z */\n// after'
+        comments = self.ExtractComments(text, group=True)
+        self.assertEqual([(c.start_line(), c.end_line()) for c in comments],
+                         [(2, 4), (5, 5)])
+
     def testMultiLineCommentWithStars(self):
         text = "/***************/"
         comments = self.ExtractComments(text)
@@ -0,0 +1,59 @@
+#!/usr/bin/python
+"""Tests for comment_parser.parsers.common.py"""
+
+from comment_parser.parsers import common as common
+
+import unittest
+
+
+class GroupConsecutiveCommentsTest(unittest.TestCase):
+
+    def Group(self, comments, alone=None):
+        if alone is None:
+            alone = [True] * len(comments)
+        return common.group_consecutive_comments(comments, alone)
+
+    def testRunIsJoinedOnce(self):
+        comments = [common.Comment(' line %d' % i, i) for i in range(1, 201)]
+        grouped, = self.Group(comments)
+        self.assertEqual(grouped.text(), ' '.join(c.text() for c in comments))
+        self.assertEqual((grouped.start_line(), grouped.end_line()), (1, 200))
+        self.assertFalse(grouped.is_multiline())
+
+    def testSingleCommentIsKept(self):
+        comment = common.Comment(' alone', 3)
+        comment.node_list().append('node')
+        grouped, = self.Group([comment])
+        self.assertIs(grouped, comment)
+
+    def testGapEndsRun(self):
+        comments = [common.Comment(' a', 1), common.Comment(' b', 2),
+                    common.Comment(' c', 4)]
+        self.assertEqual([c.text() for c in self.Group(comments)],
+                         [' a  b', ' c'])
+
+    def testCommentsAfterCodeAreNotGrouped(self):
+        comments = [common.Comment(' a', 1), common.Comment(' b', 2),
+                    common.Comment(' c', 3)]
+        grouped = self.Group(comments, alone=[True, False, True])
+        self.assertEqual([c.text() for c in grouped], [' a', ' b', ' c'])
+
+    def testMultiLineCommentsAreNotGrouped(self):
+        comments = [common.Comment(' a', 1),
+                    common.Comment(' b\n', 2, 3, multiline=True),
+                    common.Comment(' c', 4), common.Comment(' d', 5)]
+        grouped = self.Group(comments)
+        self.assertEqual([c.text() for c in grouped], [' a', ' b\n', ' c  d'])
+
+
+class ScannedCommentsTest(unittest.TestCase):
+
+    def testStartsLine(self):
+        source = 'a\n  \t// one\nb // two'
+        self.assertTrue(common.starts_line(source, 0))
+        self.assertTrue(common.starts_line(source, source.index('// one')))
+        self.assertFalse(common.starts_line(source, source.index('// two')))
+
+
+if __name__ == '__main__':
+    unittest.main()
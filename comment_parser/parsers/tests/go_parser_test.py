@@ -12,10 +12,10 @@ from io import StringIO
 class GoParserTest(unittest.TestCase):
 
     @mock.patch.object(builtins, 'open')
-    def ExtractComments(self, text, mock_open):
+    def ExtractComments(self, text, mock_open, group=False):
         mock_file = StringIO(text)
         mock_open.return_value = mock_file
-        return go_parser.extract_comments('filename')
+        return go_parser.extract_comments('filename', group=group)
 
     def testSingleLineComment(self):
         text = '// single line comment'
@@ -41,9 +41,15 @@ class GoParserTest(unittest.TestCase):
     def testMultiLineComment(self):
         text = '/* multiline\ncomment */'
         comments = self.ExtractComments(text)
-        expected = [common.Comment(text[2:-2], 1, multiline=True)]
+        expected = [common.Comment(text[2:-2], 1, 2, multiline=True)]
         self.assertEqual(comments, expected)
 
+    def testMultiLineCommentEndLine(self):
+        text = 'var a int\n/* x\n y\n z */\n// after'
+        comments = self.ExtractComments(text, group=True)
+        self.assertEqual([(c.start_line(), c.end_line()) for c in comments],
+                         [(2, 4), (5, 5)])
+
     def testMultiLineCommentWithStars(self):
         text = "/***************/"
         comments = self.ExtractComments(text)
@@ -0,0 +1,74 @@
+#!/usr/bin/python
+"""Tests for comment_parser.parsers.incremental.py"""
+
+from comment_parser.parsers import common as common
+from comment_parser.parsers import c_parser
+from comment_parser.parsers import go_parser
+from comment_parser.parsers import incremental
+from comment_parser.parsers import shell_parser
+
+import unittest
+
+
+def FullScan(parser, source):
+    return [comment for _, _, comment in parser.scan(source)
+            if comment is not None]
+
+
+class IncrementalExtractorTest(unittest.TestCase):
+
+    def AssertEditMatchesFullScan(self, parser, source, start, end,
+                                  replacement):
+        extractor = incremental.IncrementalExtractor(parser, source)
+        comments = extractor.apply_edit(start, end, replacement)
+        edited = source[:start] + replacement + source[end:]
+        self.assertEqual(extractor.source(), edited)
+        self.assertEqual(comments, FullScan(parser, edited))
+        self.assertEqual(extractor.comments(), comments)
+        return comments
+
+    def testInsertLinesShiftsLaterComments(self):
+        source = 'int a; // one\nint b;\n/* two\n */\nint c; // three\n'
+        comments = self.AssertEditMatchesFullScan(
+            c_parser, source, 7, 7, 'x();\ny();\n')
+        self.assertEqual(comments[-1].start_line(), 7)
+
+    def testDeleteLines(self):
+        source = '// one\nint a;\nint b;\n// two\n'
+        comments = self.AssertEditMatchesFullScan(c_parser, source, 7, 21, '')
+        self.assertEqual(comments, [common.Comment(' one', 1),
+                                    common.Comment(' two', 2)])
+
+    def testEditOpensMultiLineComment(self):
+        source = 'int a;\nint b; // one\nint c; */\n// two\n'
+        comments = self.AssertEditMatchesFullScan(c_parser, source, 0, 0, '/*')
+        self.assertEqual(len(comments), 2)
+        self.assertTrue(comments[0].is_multiline())
+
+    def testEditOpensRawString(self):
+        source = 'a := 1\n// one\nb := 2 `\n// two\n'
+        self.AssertEditMatchesFullScan(go_parser, source, 5, 6, '`')
+
+    def testEditInsideShellString(self):
+        source = 'echo "a # b"\n# one\necho c\n'
+        self.AssertEditMatchesFullScan(shell_parser, source, 5, 6, '')
+
+    def testSequentialEdits(self):
+        source = '// one\nint a;\n// two\n'
+        extractor = incremental.IncrementalExtractor(c_parser, source)
+        extractor.apply_edit(7, 7, '// new\n')
+        extractor.apply_edit(0, 7, '')
+        self.assertEqual(extractor.comments(),
+                         FullScan(c_parser, extractor.source()))
+
+    def testUnterminatedCommentLeavesExtractorUnchanged(self):
+        source = '// one\nint a;\n'
+        extractor = incremental.IncrementalExtractor(c_parser, source)
+        self.assertRaises(common.UnterminatedCommentError,
+                          extractor.apply_edit, 7, 7, '/*')
+        self.assertEqual(extractor.source(), source)
+        self.assertEqual(extractor.comments(), [common.Comment(' one', 1)])
+
+    def testInvalidEditRange(self):
+        extractor = incremental.IncrementalExtractor(c_parser, 'int a;')
+        self.assertRaises(ValueError, extractor.apply_edit, 4, 2, '')
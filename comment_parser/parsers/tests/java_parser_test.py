@@ -0,0 +1,91 @@
+#!/usr/bin/python
+"""Tests for comment_parser.parsers.java_parser.py"""
+
+from comment_parser.parsers import common as common
+from comment_parser.parsers import java_parser as java_parser
+
+import builtins
+import unittest
+from io import StringIO
+from unittest import mock
+
+
+SOURCE = '''package org.example; // package
+
+/**
+ * Javadoc.
+ */
+public class Example {
+    // first
+    // second
+    private String a = "not // a comment"; /* block */ // trailing
+    private char b = '"'; // after char
+
+    /* multi
+       line */
+    public int method() {
+        return 0; // return
+    }
+}
+'''
+
+NEWER_SOURCE = '''// header
+public record Point(int x, int y) {
+    String text() {
+        return """
+            // not a comment
+            """; // after text block
+    }
+}
+'''
+
+
+class JavaParserTest(unittest.TestCase):
+
+    @mock.patch.object(builtins, 'open')
+    def ExtractComments(self, text, mock_open, **options):
+        mock_open.return_value = StringIO(text)
+        return java_parser.extract_comments('filename', **options)
+
+    def Describe(self, comments):
+        return [(comment.text(), comment.start_line(), comment.end_line(), comment.is_multiline())
+                for comment in comments]
+
+    def testUntaggedMatchesTokenizer(self):
+        tagged = self.ExtractComments(SOURCE)
+        untagged = self.ExtractComments(SOURCE, tag=False)
+        self.assertEqual(self.Describe(untagged), self.Describe(tagged))
+        self.assertEqual([comment.text() for comment in untagged][:4],
+                         [' package', '*\n * Javadoc.\n ', ' first  second', ' block '])
+        self.assertTrue(any(comment.node_list() for comment in tagged))
+        self.assertFalse(any(comment.node_list() for comment in untagged))
+
+    def testFallbackOnSyntaxError(self):
+        comments = self.ExtractComments(NEWER_SOURCE)
+        self.assertEqual(self.Describe(comments),
+                         [(' header', 1, 1, False), (' after text block', 6, 6, False)])
+        self.assertFalse(any(comment.node_list() for comment in comments))
+
+    def testFallbackOnLexerError(self):
+        comments = self.ExtractComments('class A { char c = \'\\q\'; } // comment\n')
+        self.assertEqual(self.Describe(comments), [(' comment', 1, 1, False)])
+
+    def testUnicodeEscapes(self):
+        text = 'class A {}\n\\u002f\\u002f comment\n'
+        self.assertEqual(self.Describe(self.ExtractComments(text, tag=False)),
+                         self.Describe(self.ExtractComments(text)))
+
+    def testNodeTextKeepsUnicodeEscapes(self):
+        text = 'class A {\n    // letter\n    String s = "\\u0041";\n}\n'
+        comment, = self.ExtractComments(text)
+        self.assertEqual(comment.text(), ' letter')
+        self.assertEqual([node_text for _, node_text in comment.node_list()],
+                         ['    String s = "\\u0041";\n'])
+
+    def testUnterminatedComment(self):
+        self.assertRaises(common.UnterminatedCommentError,
+                          self.ExtractComments, 'class A {} /* open', tag=False)
+
+
+if __name__ == '__main__':
+    unittest.main()
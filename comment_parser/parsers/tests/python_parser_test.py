@@ -0,0 +1,140 @@
+#!/usr/bin/python
+"""Tests for comment_parser.parsers.python_parser.py"""
+
+from comment_parser.parsers import python_parser
+
+import ast
+import builtins
+import unittest
+from io import StringIO
+from unittest import mock
+
+
+SOURCE = '''import os
+
+@decorator
+@other(1)
+def function(a,
+             b):
+    value = (a +
+             b)
+    if value: return 'é'
+    return value  # trailing
+
+class Class(Base):
+    name = 'ü'; other = 2
+'''
+
+
+class SourceTextTest(unittest.TestCase):
+
+    def GetTexts(self, source, newlines=None):
+        root = ast.parse(source)
+        source_text = python_parser.SourceText(source, newlines)
+        texts = {}
+        for node in ast.walk(root):
+            if hasattr(node, 'lineno'):
+                texts.setdefault(type(node).__name__ + str(node.lineno), []).append(source_text.get_text(node))
+        return texts
+
+    def testSimpleStatements(self):
+        texts = self.GetTexts(SOURCE)
+        self.assertEqual(texts['Import1'], ['import os'])
+        self.assertEqual(texts['Assign7'], ['value = (a +\n             b)'])
+        self.assertEqual(texts['BinOp7'], ['a +\n             b'])
+        self.assertEqual(texts['If9'], ["if value: return 'é'"])
+        self.assertEqual(texts['Assign13'], ["name = 'ü'", 'other = 2'])
+
+    def testDecoratedDefinition(self):
+        texts = self.GetTexts(SOURCE)
+        function_text, = texts['FunctionDef5']
+        self.assertEqual(function_text.splitlines()[:3], ['@decorator', '@other(1)', 'def function(a,'])
+        self.assertTrue(function_text.endswith('return value'))
+
+    def testIndentedCompoundStatement(self):
+        source = 'class A:\n    def f(self):\n        pass\n'
+        texts = self.GetTexts(source)
+        # Statements spanning logical lines keep the indentation of their first line
+        self.assertEqual(texts['FunctionDef2'], ['    def f(self):\n        pass'])
+        self.assertEqual(texts['Pass3'], ['pass'])
+
+    def testGivenNewlines(self):
+        source = 'if a:\n    b = 1\n'
+        self.assertEqual(self.GetTexts(source, newlines=[(1, 5), (2, 9)]), self.GetTexts(source))
+
+    def testMissingEndPositions(self):
+        node = ast.Pass()
+        self.assertEqual(python_parser.SourceText('pass').get_text(node), '')
+
+
+COMMENTED_SOURCE = r'''# header
+# continued
+x = "a # b"  # one
+y = 'it\'s # no' # two
+z = """ # not
+ # still not """  # three
+w = rb'\' # no'; v = Rf"{a['#']}"  # four
+t = f"{x:{'#'}>10} {{ # no }}"  # five
+s = f"\N{NUMBER SIGN} {y}"
+q = 1 + \
+    2  # six
+
+
+def function():
+    """Docstring # not a comment"""
+    return x  # seven
+'''
+
+
+class ScanCommentsTest(unittest.TestCase):
+
+    def ScanComments(self, source):
+        return [source[start:end] for start, end in python_parser.scan_comments(source)]
+
+    def testStrings(self):
+        self.assertEqual(self.ScanComments(COMMENTED_SOURCE),
+                         ['# header', '# continued', '# one', '# two', '# three', '# four', '# five', '# six',
+                          '# seven'])
+
+    def testFStringReplacementFields(self):
+        # Same quotes and comments inside replacement fields, as allowed from Python 3.12
+        source = 'f"{d["#"]}"  # one\nf"""{\n    a  # two\n}"""\n'
+        self.assertEqual(self.ScanComments(source), ['# one', '# two'])
+
+    def testUnterminatedStrings(self):
+        self.assertEqual(self.ScanComments('x = "open # one\ny = 1  # two\n'), ['# one', '# two'])
+        self.assertEqual(self.ScanComments('x = """open # not\n# not'), [])
+
+    def testQuoteAfterName(self):
+        self.assertEqual(self.ScanComments('if"#":  # one\n    pass\n'), ['# one'])
+
+
+class ExtractCommentsTest(unittest.TestCase):
+
+    @mock.patch.object(builtins, 'open')
+    def ExtractComments(self, text, mock_open, tag=True):
+        mock_open.return_value = StringIO(text)
+        return python_parser.extract_comments('filename', tag=tag)
+
+    def Describe(self, comments):
+        return [(comment.text(), comment.start_line(), comment.end_line(), comment.is_multiline())
+                for comment in comments]
+
+    def testUntaggedMatchesTokenize(self):
+        tagged = self.ExtractComments(COMMENTED_SOURCE)
+        untagged = self.ExtractComments(COMMENTED_SOURCE, tag=False)
+        self.assertEqual(self.Describe(untagged), self.Describe(tagged))
+        self.assertEqual([comment.text() for comment in untagged][:2], [' header  continued', ' one'])
+        self.assertTrue(all(comment.node_list() for comment in tagged))
+        self.assertFalse(any(comment.node_list() for comment in untagged))
+
+    def testCommentTextInStringIsKept(self):
+        # The comment is blanked where it is, not where its text first occurs
+        text = 'x = """\n# same\n"""\n# same\n"""Doc # same"""\n'
+        comments = self.ExtractComments(text, tag=False)
+        self.assertEqual([(comment.text(), comment.start_line()) for comment in comments],
+                         [(' same', 4), ('Doc # same', 5)])
+
+
+if __name__ == '__main__':
+    unittest.main()
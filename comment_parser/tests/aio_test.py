@@ -0,0 +1,86 @@
+#!/usr/bin/python
+"""Tests for comment_parser.aio.py"""
+
+from comment_parser import aio
+from comment_parser import comment_parser
+from comment_parser.parsers import common as common
+
+import asyncio
+import os
+import tempfile
+import unittest
+from concurrent import futures
+
+
+class AioTest(unittest.TestCase):
+
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._dir.cleanup)
+
+    def WriteSource(self, name, text):
+        filename = os.path.join(self._dir.name, name)
+        with open(filename, 'w') as source_file:
+            source_file.write(text)
+        return filename
+
+    def ExtractMany(self, filenames, **kwargs):
+        async def collect():
+            return [result async for result in aio.aextract_many(
+                filenames, mime='text/x-c', **kwargs)]
+        return asyncio.run(collect())
+
+    def testExtractComments(self):
+        filename = self.WriteSource('a.c', '// comment\n')
+        comments = asyncio.run(aio.aextract_comments(filename, 'text/x-c'))
+        self.assertEqual(comments, [common.Comment(' comment', 1)])
+
+    def testExtractManyWithThreadPool(self):
+        filenames = [self.WriteSource('%d.c' % i, '// %d\n' % i)
+                     for i in range(10)]
+        with futures.ThreadPoolExecutor(2) as executor:
+            results = dict(self.ExtractMany(filenames, concurrency=3,
+                                            executor=executor))
+        self.assertEqual(sorted(results), sorted(filenames))
+        for i, filename in enumerate(filenames):
+            self.assertEqual(results[filename],
+                             [common.Comment(' %d' % i, 1)])
+
+    def testExtractManyWithProcessPool(self):
+        filename = self.WriteSource('a.c', '/* comment */')
+        with futures.ProcessPoolExecutor(1) as executor:
+            results = self.ExtractMany([filename], executor=executor)
+        self.assertEqual(
+            results, [(filename, [common.Comment(' comment ', 1,
+                                                 multiline=True)])])
+
+    def testExtractManyBoundsConcurrency(self):
+        requested = []
+
+        def filenames():
+            for i in range(6):
+                requested.append(i)
+                yield self.WriteSource('%d.c' % i, '')
+
+        async def consume_one():
+            results = aio.aextract_many(filenames(), concurrency=2,
+                                        mime='text/x-c')
+            await results.__anext__()
+            await results.aclose()
+
+        asyncio.run(consume_one())
+        self.assertLessEqual(len(requested), 3)
+
+    def testExtractManyRaises(self):
+        filename = self.WriteSource('a.c', '/* unterminated')
+        self.assertRaises(comment_parser.Error, self.ExtractMany, [filename])
+
+    def testExtractManyReturnExceptions(self):
+        filename = self.WriteSource('a.c', '/* unterminated')
+        [(name, result)] = self.ExtractMany([filename],
+                                            return_exceptions=True)
+        self.assertEqual(name, filename)
+        self.assertIsInstance(result, comment_parser.ParseError)
+
+    def testExtractManyInvalidConcurrency(self):
+        self.assertRaises(ValueError, self.ExtractMany, [], concurrency=0)
@@ -0,0 +1,265 @@
+#!/usr/bin/python
+"""Tests for comment_parser.comment_parser.py"""
+
+from comment_parser import comment_parser
+from comment_parser.parsers import common as common
+
+import concurrent.futures
+import csv
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from io import StringIO
+from unittest import mock
+
+
+class CommentParserTest(unittest.TestCase):
+
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._dir.cleanup)
+
+    def WriteSource(self, name, text):
+        filename = os.path.join(self._dir.name, name)
+        with open(filename, 'w') as source_file:
+            source_file.write(text)
+        return filename
+
+    def testExtractComments(self):
+        filename = self.WriteSource('a.c', '// comment\n')
+        comments = comment_parser.extract_comments(filename, 'text/x-c')
+        self.assertEqual(comments, [common.Comment(' comment', 1)])
+
+    def testExtractCommentsWithoutTagging(self):
+        filename = self.WriteSource('a.py', 'x = 1  # comment\n')
+        tagged, = comment_parser.extract_comments(filename, 'text/x-python')
+        untagged, = comment_parser.extract_comments(filename, 'text/x-python',
+                                                    tag=False)
+        self.assertEqual(len(tagged.node_list()), 1)
+        self.assertEqual(untagged.node_list(), [])
+        self.assertEqual(untagged.text(), tagged.text())
+
+        # Parsers that do not tag take no tag argument
+        filename = self.WriteSource('a.c', '// comment\n')
+        self.assertEqual(
+            comment_parser.extract_comments(filename, 'text/x-c', tag=False),
+            [common.Comment(' comment', 1)])
+
+    def testExtractCommentsUnsupported(self):
+        self.assertRaises(comment_parser.UnsupportedError,
+                          comment_parser.extract_comments, 'a', 'text/plain')
+
+    def testExtractCommentsParseError(self):
+        filename = self.WriteSource('a.c', '/* unterminated')
+        self.assertRaises(comment_parser.ParseError,
+                          comment_parser.extract_comments, filename,
+                          'text/x-c')
+
+    def testCollectProfiles(self):
+        filename = self.WriteSource('a.c', '// one\n/* two */\n')
+        with comment_parser.collect_profiles() as profiles:
+            comment_parser.extract_comments(filename, 'text/x-c')
+        [profile] = profiles
+        record = profile.as_dict()
+        self.assertEqual(record['filename'], filename)
+        self.assertEqual(record['mime'], 'text/x-c')
+        self.assertIsNone(record['error'])
+        self.assertEqual(record['counters'], {'chars': 17, 'comments': 2})
+        self.assertEqual(sorted(record['phases']), ['io', 'lexing'])
+        self.assertGreaterEqual(record['seconds'],
+                                sum(record['phases'].values()))
+
+    def testProfileCallbackReceivesFailures(self):
+        filename = self.WriteSource('a.c', '/* unterminated')
+        profiles = []
+        comment_parser.add_profile_callback(profiles.append)
+        try:
+            self.assertRaises(comment_parser.ParseError,
+                              comment_parser.extract_comments, filename,
+                              'text/x-c')
+        finally:
+            comment_parser.remove_profile_callback(profiles.append)
+        self.assertEqual(len(profiles), 1)
+        self.assertIsNotNone(profiles[0].error)
+
+    def testProfilingDisabledByDefault(self):
+        self.assertIsNone(common.current_profile())
+        with comment_parser.collect_profiles():
+            pass
+        filename = self.WriteSource('a.c', '// comment\n')
+        comment_parser.extract_comments(filename, 'text/x-c')
+        self.assertIsNone(common.current_profile())
+
+    def testNestedPhasesAreExclusive(self):
+        profile = common.Profile('a')
+        with common.profiling(profile):
+            with common.phase('outer'):
+                with common.phase('inner'):
+                    pass
+        self.assertEqual(sorted(profile.phases), ['inner', 'outer'])
+        self.assertGreaterEqual(profile.seconds,
+                                profile.phases['inner'] +
+                                profile.phases['outer'])
+
+
+class ImportTest(unittest.TestCase):
+
+    # Imported by parsers that a run may never need
+    _HEAVY_MODULES = ('magic', 'asttokens', 'javalang_dev.javalang.parser')
+
+    def LoadedModules(self, code):
+        # A fresh interpreter, as this one has imported everything already
+        root = os.path.dirname(os.path.dirname(comment_parser.__file__))
+        output = subprocess.check_output(
+            [sys.executable, '-c',
+             code + '\nimport json, sys\nprint(json.dumps(list(sys.modules)))'],
+            cwd=root)
+        return set(json.loads(output.decode()))
+
+    def testImportLoadsNoParsers(self):
+        modules = self.LoadedModules('import comment_parser.comment_parser')
+        self.assertIn('comment_parser.comment_parser', modules)
+        for module in self._HEAVY_MODULES:
+            self.assertNotIn(module, modules)
+        self.assertFalse([module for module in modules
+                          if module.startswith('comment_parser.parsers.') and
+                          module != 'comment_parser.parsers.common'])
+
+    def testParserLoadedOnFirstUse(self):
+        filename = os.path.join(tempfile.mkdtemp(), 'a.sh')
+        self.addCleanup(os.rmdir, os.path.dirname(filename))
+        self.addCleanup(os.remove, filename)
+        with open(filename, 'w') as source_file:
+            source_file.write('# comment\n')
+        modules = self.LoadedModules(
+            'from comment_parser import comment_parser\n'
+            'comment_parser.extract_comments(%r, "text/x-shellscript")' % filename)
+        self.assertIn('comment_parser.parsers.shell_parser', modules)
+        self.assertNotIn('comment_parser.parsers.java_parser', modules)
+        for module in self._HEAVY_MODULES:
+            self.assertNotIn(module, modules)
+
+    def testMimeMap(self):
+        self.assertIn('text/x-java-source', comment_parser.MIME_MAP)
+        self.assertNotIn('text/plain', comment_parser.MIME_MAP)
+        self.assertIs(comment_parser.MIME_MAP['text/x-c'],
+                      comment_parser.MIME_MAP['text/x-c++'])
+        self.assertEqual(comment_parser.MIME_MAP['text/x-go'].__name__,
+                         'comment_parser.parsers.go_parser')
+
+
+class MainTest(unittest.TestCase):
+
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._dir.cleanup)
+        self.WriteSource('a.c', '// one\n/* two\n */\n')
+        self.WriteSource(os.path.join('sub', 'b.go'), '// three\n')
+        self.WriteSource(os.path.join('sub', 'c.txt'), 'no comments\n')
+
+    def WriteSource(self, name, text):
+        filename = os.path.join(self._dir.name, name)
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        with open(filename, 'w') as source_file:
+            source_file.write(text)
+        return filename
+
+    def Main(self, *argv):
+        with mock.patch.object(sys, 'stdout', StringIO()) as stdout, \
+                mock.patch.object(sys, 'stderr', StringIO()) as stderr:
+            status = comment_parser.main(list(argv))
+        return status, stdout.getvalue(), stderr.getvalue()
+
+    def testText(self):
+        status, stdout, _ = self.Main(os.path.join(self._dir.name, 'a.c'))
+        self.assertEqual(status, 0)
+        self.assertEqual(stdout, ' one\n two\n \n')
+
+    def testRecursiveNdjson(self):
+        status, stdout, stderr = self.Main(self._dir.name, '-f', 'ndjson')
+        self.assertEqual((status, stderr), (0, ''))
+        records = [json.loads(line) for line in stdout.splitlines()]
+        self.assertEqual([(os.path.basename(record['path']),
+                           record['start_line'], record['multiline'])
+                          for record in records],
+                         [('a.c', 1, False), ('a.c', 2, True),
+                          ('b.go', 1, False)])
+
+    def testGroup(self):
+        filename = self.WriteSource('d.sh', '# one\n# two\n')
+        _, stdout, _ = self.Main(filename)
+        self.assertEqual(stdout, ' one\n two\n')
+        _, stdout, _ = self.Main(filename, '--group')
+        self.assertEqual(stdout, ' one  two\n')
+
+    def testIncludeAndExclude(self):
+        _, stdout, _ = self.Main(self._dir.name, '-f', 'ndjson',
+                                 '-i', '*.go')
+        self.assertEqual(len(stdout.splitlines()), 1)
+        _, stdout, _ = self.Main(self._dir.name, '-f', 'ndjson',
+                                 '-x', 'sub')
+        self.assertEqual(len(stdout.splitlines()), 2)
+
+    def testParallelJsonMatchesSequential(self):
+        _, sequential, _ = self.Main(self._dir.name, '-f', 'json')
+        _, parallel, _ = self.Main(self._dir.name, '-f', 'json', '-j', '2')
+        self.assertEqual(json.loads(parallel), json.loads(sequential))
+        self.assertEqual(len(json.loads(sequential)), 3)
+
+    def testCsv(self):
+        _, stdout, _ = self.Main(os.path.join(self._dir.name, 'a.c'),
+                                 '-f', 'csv')
+        rows = list(csv.reader(StringIO(stdout)))
+        self.assertEqual(rows[0], ['path', 'start_line', 'end_line',
+                                   'multiline', 'text'])
+        self.assertEqual(len(rows), 3)
+
+    def testErrorsEndWithNewline(self):
+        bad = self.WriteSource('bad.c', '/* unterminated')
+        status, _, stderr = self.Main(bad)
+        self.assertEqual(status, 1)
+        self.assertTrue(stderr.startswith(bad + ': '))
+        self.assertTrue(stderr.endswith('\n'))
+
+    def testMissingFile(self):
+        missing = os.path.join(self._dir.name, 'missing.c')
+        status, stdout, stderr = self.Main(missing)
+        self.assertEqual((status, stdout), (1, ''))
+        self.assertTrue(stderr.startswith(missing + ': '))
+
+    def testUndecodableFileDoesNotStopRun(self):
+        bad = os.path.join(self._dir.name, 'bad.c')
+        with open(bad, 'wb') as source_file:
+            source_file.write(b'// caf\xe9\n')
+        for jobs in ('1', '2'):
+            status, stdout, stderr = self.Main(self._dir.name, '-f', 'ndjson',
+                                               '-j', jobs)
+            self.assertEqual(status, 1)
+            self.assertTrue(stderr.startswith(bad + ': '))
+            self.assertEqual(len(stdout.splitlines()), 3)
+
+    def testSubmitBounded(self):
+        events = []
+
+        class Executor(object):
+            def submit(self, function, *args):
+                events.append(('submit',) + args)
+                future = concurrent.futures.Future()
+                future.set_result(function(*args))
+                return future
+
+        for unordered in (False, True):
+            del events[:]
+            calls = ((lambda i: i, i) for i in range(5))
+            for result in comment_parser._submit_bounded(Executor(), calls, 2,
+                                                         unordered):
+                events.append(('result', result))
+            self.assertEqual(events[:5], [('submit', 0), ('submit', 1),
+                                          ('result', 0), ('submit', 2),
+                                          ('result', 1)])
+            self.assertEqual([event for event in events
+                              if event[0] == 'result'],
+                             [('result', i) for i in range(5)])
@@ -17,22 +17,93 @@ class MetaNode(type):
         return type.__new__(mcs, name, bases, dict)
 
 
+class Deferred(object):
+    """ Placeholder for a node attribute whose value is loaded on first access.
+    See DeferredAttribute.
+
+    """
+
+    def __init__(self, load):
+        self.load = load
+
+    def __reduce__(self):
+        # Pickle the loaded value rather than the loader
+        return (_loaded, (self.load(),))
+
+
+def _loaded(value):
+    return value
+
+
+class DeferredAttribute(object):
+    """ Descriptor for a node attribute that may be assigned a Deferred, which
+    is replaced by its loaded value the first time the attribute is read.
+
+    """
+
+    def __init__(self, name):
+        self.key = '_' + name
+
+    def __get__(self, node, owner):
+        if node is None:
+            return self
+
+        value = node.__dict__.get(self.key)
+        if isinstance(value, Deferred):
+            value = value.load()
+            node.__dict__[self.key] = value
+
+        return value
+
+    def __set__(self, node, value):
+        node.__dict__[self.key] = value
+
+
+def is_deferred(node, attr_name):
+    """ Returns true if attribute attr_name of node has not been loaded yet """
+
+    return isinstance(node.__dict__.get('_' + attr_name), Deferred)
+
+
 class Position:
     def __init__(self):
         self.start = None
         self.end = None
+        self.start_offset = None
+        self.end_offset = None
 
     def __repr__(self):
         return '<Position start: '+str(self.start)+', end: '+str(self.end)+'>'
 
 
+class LazyPosition(object):
+    """ Gives a node an empty Position the first time its position is read.
+    Nodes whose position is never recorded or read do not allocate one.
+
+    """
+
+    def __get__(self, node, owner):
+        if node is None:
+            return self
+
+        # Stored in the instance dictionary, which takes precedence over this
+        # non-data descriptor from then on
+        position = node.__dict__['position'] = Position()
+        return position
+
+
 @six.add_metaclass(MetaNode)
 class Node(object):
     attrs = ()
 
+    position = LazyPosition()
+
+    # Comments the node was parsed with, when its tokens carry comments as
+    # trivia and positions are recorded, see Parser.attach_comments
+    comments = ()
+
     def __init__(self, **kwargs):
         values = kwargs.copy()
-        self.position = Position()
         for attr_name in self.attrs:
             value = values.pop(attr_name, None)
             setattr(self, attr_name, value)
@@ -69,6 +140,103 @@ class Node(object):
     def children(self):
         return [getattr(self, attr_name) for attr_name in self.attrs]
 
+    @property
+    def source_span(self):
+        """ The (start, end) character offsets of the node in the source, so
+        that its text is source[start:end] even where the source has unicode
+        escapes, or None unless it was parsed with span positions
+
+        """
+
+        position = self.__dict__.get('position')
+        if position is None or position.start_offset is None:
+            return None
+        return position.start_offset, position.end_offset
+
+
+class NodeIndex(object):
+    """ Index of the nodes under a root by node class, in the preorder of
+    walk_tree, with a link from every node and list to its parent. It is a
+    snapshot of the tree as it was when the index was built.
+
+    """
+
+    def __init__(self, root):
+        # Nodes and lists in preorder, and the position in items of the
+        # parent of each, -1 for the root
+        self.items = []
+        self.parents = []
+
+        self.by_type = {}
+        self.matches = {}
+        self.positions = {}
+
+        stack = [(root, -1)]
+        while stack:
+            item, parent = stack.pop()
+            i = len(self.items)
+            self.items.append(item)
+            self.parents.append(parent)
+
+            if isinstance(item, Node):
+                self.by_type.setdefault(type(item), []).append(i)
+                self.positions.setdefault(id(item), i)
+                children = item.children
+            else:
+                children = item
+
+            for child in reversed(children):
+                if isinstance(child, (Node, list, tuple)):
+                    stack.append((child, i))
+
+    def find(self, node_type):
+        """ Returns the positions in items of the instances of node_type """
+
+        found = self.matches.get(node_type)
+        if found is None:
+            found = []
+            for item_type, positions in self.by_type.items():
+                if issubclass(item_type, node_type):
+                    found.extend(positions)
+            found.sort()
+            self.matches[node_type] = found
+        return found
+
+    def nodes(self, node_type):
+        """ Returns the instances of node_type in preorder """
+
+        return [self.items[i] for i in self.find(node_type)]
+
+    def path(self, i):
+        """ Returns the walk_tree path of the item at position i """
+
+        path = []
+        i = self.parents[i]
+        while i != -1:
+            path.append(self.items[i])
+            i = self.parents[i]
+        path.reverse()
+        return tuple(path)
+
+    def parent(self, node):
+        """ Returns the closest node enclosing node, or None for the root """
+
+        i = self.parents[self.positions[id(node)]]
+        while i != -1 and not isinstance(self.items[i], Node):
+            i = self.parents[i]
+        return self.items[i] if i != -1 else None
+
+    def filter(self, pattern):
+        if isinstance(pattern, type):
+            found = self.find(pattern)
+        else:
+            found = [i for i, item in enumerate(self.items)
+                     if isinstance(item, Node) and item == pattern]
+
+        for i in found:
+            yield self.path(i), self.items[i]
+
+
 def walk_tree(root):
     children = None
 
@@ -83,6 +251,160 @@ def walk_tree(root):
             for path, node in walk_tree(child):
                 yield (root,) + path, node
 
+class NodeVisitor(object):
+    """ Walks a tree in the preorder of walk_tree, calling visit_<Class> for
+    every node, where Class is the node's class or the closest base class with
+    such a method, and generic_visit if there is none. The method for each node
+    class is looked up once per visitor class. A visit method may call prune
+    to leave out the children of its node.
+
+    """
+
+    def visit(self, root):
+        dispatch = type(self).dispatch
+        stack = [root]
+
+        while stack:
+            item = stack.pop()
+
+            if isinstance(item, Node):
+                self.pruned = False
+                dispatch(item.__class__)(self, item)
+                if self.pruned:
+                    continue
+                children = item.children
+            else:
+                children = item
+
+            for child in reversed(children):
+                if isinstance(child, (Node, list, tuple)):
+                    stack.append(child)
+
+    def generic_visit(self, node):
+        pass
+
+    def prune(self):
+        """ Skips the children of the node being visited """
+
+        self.pruned = True
+
+    @classmethod
+    def dispatch(cls, node_class):
+        """ Returns the visit function for instances of node_class """
+
+        table = cls.__dict__.get('_dispatch')
+        if table is None:
+            table = {}
+            setattr(cls, '_dispatch', table)
+
+        method = table.get(node_class)
+        if method is None:
+            for base in node_class.__mro__:
+                method = getattr(cls, 'visit_' + base.__name__, None)
+                if method is not None:
+                    break
+            else:
+                method = cls.generic_visit
+            table[node_class] = method
+
+        return method
+
+
+# Entries of the NodeTransformer stack
+_CHILDREN, _ATTRIBUTE, _ITEM, _REBUILD = range(4)
+
+
+class NodeTransformer(NodeVisitor):
+    """ A NodeVisitor whose visit methods return what to put in place of the
+    node visited. Returning None removes a node from a list or sets the
+    attribute holding it to None, and a list returned for a node in a list is
+    spliced into it. The traversal goes on into the children of the nodes
+    returned. generic_visit keeps the node unchanged.
+
+    """
+
+    def visit(self, root):
+        dispatch = type(self).dispatch
+
+        self.pruned = False
+        root = dispatch(root.__class__)(self, root)
+        if not isinstance(root, Node) or self.pruned:
+            return root
+
+        stack = [(_CHILDREN, root)]
+
+        while stack:
+            entry = stack.pop()
+            kind = entry[0]
+
+            if kind == _CHILDREN:
+                node = entry[1]
+                for attr_name in reversed(node.attrs):
+                    value = getattr(node, attr_name)
+                    if isinstance(value, Node):
+                        stack.append((_ATTRIBUTE, node, attr_name, value))
+                    elif isinstance(value, (list, tuple)):
+                        self.push_items(stack, value, (node, attr_name))
+
+            elif kind == _ATTRIBUTE:
+                _, node, attr_name, value = entry
+                self.pruned = False
+                value = dispatch(value.__class__)(self, value)
+                setattr(node, attr_name, value)
+                if isinstance(value, Node) and not self.pruned:
+                    stack.append((_CHILDREN, value))
+
+            elif kind == _ITEM:
+                _, child, items = entry
+                if isinstance(child, (list, tuple)):
+                    self.push_items(stack, child, items)
+                    continue
+
+                if not isinstance(child, Node):
+                    items.append(child)
+                    continue
+
+                self.pruned = False
+                result = dispatch(child.__class__)(self, child)
+                if result is None:
+                    continue
+
+                results = result if isinstance(result, list) else [result]
+                items.extend(results)
+                if not self.pruned:
+                    for node in reversed(results):
+                        if isinstance(node, Node):
+                            stack.append((_CHILDREN, node))
+
+            else:
+                _, items, value, target = entry
+                if isinstance(value, list):
+                    value[:] = items
+                else:
+                    value = tuple(items)
+
+                if isinstance(target, list):
+                    target.append(value)
+                else:
+                    setattr(target[0], target[1], value)
+
+        return root
+
+    def push_items(self, stack, value, target):
+        """ Schedules the items of value to be visited and value to be rebuilt
+        from the results into target, a list or a (node, attribute) pair
+
+        """
+
+        items = []
+        stack.append((_REBUILD, items, value, target))
+        for child in reversed(value):
+            stack.append((_ITEM, child, items))
+
+    def generic_visit(self, node):
+        return node
+
+
 def dump(ast, file):
     pickle.dump(ast, file)
 
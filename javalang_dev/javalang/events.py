@@ -0,0 +1,218 @@
+""" Event based parsing of compilation units.
+
+EventParser yields ('enter', node) and ('exit', node) events for the
+compilation unit and for the type, field, method, constructor and other
+declarations of the type bodies, in source order, as it parses them. The
+members of a type body are parsed one at a time and the type declarations are
+given without them, so only the declaration being parsed is held in memory,
+however large the unit is.
+
+"""
+
+import bisect
+
+from . import tree
+from .parser import Parser
+from .tokenizer import EndOfInput
+
+# Values of the tokens that start a type declaration after its modifiers
+TYPE_KEYWORDS = frozenset(['class', 'enum', 'interface'])
+
+
+class EventParser(Parser):
+    """ Parser yielding the events of a compilation unit from iter_events.
+    With skip_bodies, method, constructor and initializer bodies are skipped
+    and only parsed when accessed, as in an outline parse.
+
+    """
+
+    def __init__(self, tokens, skip_bodies=False, positions='span'):
+        super(EventParser, self).__init__(tokens, outline=skip_bodies,
+                                          positions=positions)
+
+        # The '{' token of the body of the type declaration being parsed,
+        # whose members are parsed by iter_body instead
+        self.type_body = None
+
+        # The first token of the unit, whose comments go to the unit at last
+        self.unit_start = None
+
+    def iter_events(self):
+        start = self.tokens.look()
+        self.unit_start = start
+
+        package = self.call(self.parse_package_declaration)
+
+        imports = list()
+        while self.would_accept('import'):
+            imports.append(self.call(self.parse_import_declaration))
+
+        unit = tree.CompilationUnit(package=package, imports=imports,
+                                    types=[])
+        yield 'enter', unit
+
+        while not isinstance(self.tokens.look(), EndOfInput):
+            if self.try_accept(';'):
+                continue
+
+            for event in self.iter_declaration(
+                    self.parse_class_or_interface_declaration):
+                yield event
+
+        self.set_position(unit, start)
+        yield 'exit', unit
+
+    def iter_declaration(self, parse_member):
+        """ Yields the events of the member parsed by parse_member, going
+        through the members of its body if it is a type declaration
+
+        """
+
+        start = self.tokens.look()
+        body = self.type_body = self.find_type_body()
+        member = self.call(parse_member)
+        self.type_body = None
+
+        if not isinstance(member, tree.Declaration):
+            # Empty declarations and initializers
+            self.release_comments(start)
+            return
+
+        yield 'enter', member
+
+        if body is not None and self.tokens.look() is body:
+            if isinstance(member, tree.EnumDeclaration):
+                events = self.iter_enum_body()
+            elif isinstance(member, tree.InterfaceDeclaration):
+                events = self.iter_body(self.parse_interface_body_declaration)
+            elif isinstance(member, tree.AnnotationDeclaration):
+                events = self.iter_body(
+                    self.parse_annotation_type_element_declaration)
+            else:
+                events = self.iter_body(self.parse_class_body_declaration)
+
+            for event in events:
+                yield event
+
+            # The type now ends after its body
+            self.set_position(member, start)
+
+        yield 'exit', member
+        self.release_comments(start)
+
+    def iter_body(self, parse_member):
+        self.call(self.accept, '{')
+
+        while not self.would_accept('}'):
+            for event in self.iter_declaration(parse_member):
+                yield event
+
+        self.call(self.accept, '}')
+
+    def iter_enum_body(self):
+        self.call(self.accept, '{')
+
+        if not self.try_accept(','):
+            while not (self.would_accept(';') or self.would_accept('}')):
+                for event in self.iter_declaration(self.parse_enum_constant):
+                    yield event
+
+                if not self.try_accept(','):
+                    break
+
+        if self.try_accept(';'):
+            while not self.would_accept('}'):
+                for event in self.iter_declaration(
+                        self.parse_class_body_declaration):
+                    yield event
+
+        self.call(self.accept, '}')
+
+        while self.try_accept(';'):
+            pass
+
+    def call(self, method, *args):
+        """ Calls method with args. The StopIteration raised when the tokens
+        end early is turned into a syntax error, as it can not be let through
+        the generators.
+
+        """
+
+        try:
+            return method(*args)
+        except StopIteration:
+            self.illegal("Unexpected end of input")
+
+    def find_type_body(self):
+        """ Returns the '{' token of the body if a type declaration starts at
+        the next token, or None
+
+        """
+
+        i = 0
+        depth = 0
+        is_type = False
+
+        while True:
+            token = self.tokens.look(i)
+            value = token.value
+            i += 1
+
+            if isinstance(token, EndOfInput):
+                return None
+            elif value == '(':
+                depth += 1
+            elif value == ')':
+                depth -= 1
+            elif depth:
+                continue
+            elif value == '{':
+                return token if is_type else None
+            elif value in (';', '='):
+                return None
+            elif value in TYPE_KEYWORDS:
+                is_type = True
+
+    def release_comments(self, start):
+        """ Forgets the tokens from start on whose comments were given to the
+        nodes parsed from them. Later nodes do not take those comments, but
+        the nodes would be kept alive by the tokens.
+
+        """
+
+        owners = self.comment_owners
+        first = bisect.bisect_left(self.commented_offsets, start.offset)
+        kept = []
+        for token in self.commented[first:]:
+            if id(token) not in owners or token is self.unit_start:
+                kept.append(token)
+            else:
+                del owners[id(token)]
+
+        del self.commented[first:]
+        del self.commented_offsets[first:]
+        self.commented.extend(kept)
+        self.commented_offsets.extend(token.offset for token in kept)
+
+    # ------------------------------------------------------------------------------
+    # -- Type bodies parsed by iter_body --
+
+    def parse_class_body(self):
+        if self.tokens.look() is self.type_body:
+            return list()
+        return super(EventParser, self).parse_class_body()
+
+    def parse_interface_body(self):
+        if self.tokens.look() is self.type_body:
+            return list()
+        return super(EventParser, self).parse_interface_body()
+
+    def parse_annotation_type_body(self):
+        if self.tokens.look() is self.type_body:
+            return list()
+        return super(EventParser, self).parse_annotation_type_body()
+
+    def parse_enum_body(self):
+        if self.tokens.look() is self.type_body:
+            return None
+        return super(EventParser, self).parse_enum_body()
@@ -92,13 +92,11 @@ def _left_justify(s):
 def _force_blocks_left(s):
     return blocks_justify_re.sub('@', s)
 
-def parse(raw):
-    sanitized = _sanitize(raw)
-    uncommented = _uncomment(sanitized)
-    justified = _left_justify(uncommented)
-    justified_fixed = _force_blocks_left(justified)
-    prepared = justified_fixed
+# Line breaks other than '\n' that str.splitlines() recognises. Comments that
+# contain any of them are prepared with the regular expressions above.
+other_line_breaks_re = re.compile(u'[\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029]')
 
+def _parse_prepared(prepared):
     blocks = blocks_re.split(prepared)
 
     doc = DocBlock()
@@ -110,11 +108,117 @@ def parse(raw):
         blocks = blocks[1::2]
 
     for block in blocks:
-        try:
-            tag, value = block.split(None, 1)
-        except ValueError:
-            tag, value = block, ''
+        _add_block(doc, block)
+
+    return doc
+
+def _add_block(doc, block):
+    try:
+        tag, value = block.split(None, 1)
+    except ValueError:
+        tag, value = block, ''
+
+    doc.add_block(tag, value)
+
+def _parse_multipass(raw):
+    sanitized = _sanitize(raw)
+    uncommented = _uncomment(sanitized)
+    justified = _left_justify(uncommented)
+    justified_fixed = _force_blocks_left(justified)
+
+    return _parse_prepared(justified_fixed)
+
+def parse(raw):
+    """ Parses a Javadoc comment into a DocBlock.
+
+    The comment is split into lines once. One pass over them removes the
+    leading '*' and measures the common indent, a second one justifies them
+    and groups them into the description and the tag blocks. The result is
+    the same as preparing the whole text with _uncomment, _left_justify and
+    _force_blocks_left, without the intermediate copies.
+
+    Both passes mirror the multiline '^\\s*' expressions used by those: a
+    line whose first non-whitespace character is the marker loses everything
+    up to it, and the blank lines right before such a line are dropped.
+
+    """
+
+    sanitized = _sanitize(raw)
+
+    if other_line_breaks_re.search(sanitized):
+        return _parse_multipass(raw)
+
+    # Remove the leading '*' and find the common indent
+    lines = []
+    blanks = []
+    indent = None
+    for line in sanitized[3:-2].strip().split('\n'):
+        content = line.lstrip()
+
+        if not content:
+            blanks.append(line)
+            continue
+
+        if content[0] == '*':
+            line = content[1:]
+            content = line.lstrip()
+            blanks = []
+        elif blanks:
+            lines.extend(blanks)
+            blanks = []
+
+        if content:
+            level = len(line) - len(content)
+            if indent is None or level < indent:
+                indent = level
+            last = len(lines)
+
+        lines.append(line)
+
+    doc = DocBlock()
+
+    if indent is None:
+        return doc
+
+    if indent:
+        lines[last] = lines[last].rstrip()
+        del lines[last + 1:]
+    else:
+        lines.extend(blanks)
+
+    # Justify and split into the description and one block per line starting
+    # with '@'
+    description = current = []
+    blocks = []
+    blanks = []
+    for line in lines:
+        line = line[indent:]
+        content = line.lstrip()
+
+        if not content:
+            blanks.append(line)
+            continue
+
+        if content[0] == '@':
+            current = [content[1:]]
+            blocks.append(current)
+            blanks = []
+            continue
+
+        if blanks:
+            current.extend(blanks)
+            blanks = []
+
+        current.append(line)
+
+    current.extend(blanks)
+
+    doc.description = '\n'.join(description).strip()
 
-        doc.add_block(tag, value)
+    for i, block in enumerate(blocks, 1):
+        block = '\n'.join(block)
+        if i < len(blocks):
+            block += '\n'
+        _add_block(doc, block)
 
     return doc
@@ -0,0 +1,317 @@
+""" Parsing of large compilation units on several processes.
+
+The source is tokenized once. The bodies of large top-level classes are split
+between members, where the brace depth is back to that of the body, and the
+chunks of members are parsed in a process pool while the rest of the unit is
+parsed in this process. The class declarations are then put together from the
+members parsed by the pool, with the same positions and comments as in a
+sequential parse.
+
+"""
+
+import bisect
+import concurrent.futures
+import contextlib
+import gc
+
+from .parser import Parser
+from .tokenizer import (
+    Annotation, BasicType, Comment, EndOfInput, Identifier, JavaTokenizer,
+    LineIndex, Modifier, Position,
+)
+
+
+# Chunks hold at least this many tokens, fewer are not worth sending to
+# another process
+MIN_CHUNK_TOKENS = 2000
+
+# Values of the tokens that start a member, besides modifiers, annotations,
+# basic types and identifiers
+MEMBER_STARTS = frozenset(['void', 'class', 'enum', 'interface', '{'])
+
+
+class SplitFailure(Exception):
+    """ Raised when the members of a chunk could not be parsed on their own,
+    in which case the unit is parsed sequentially instead
+
+    """
+
+
+def parse(s, workers=None, outline=False, positions='span', chunk_tokens=None):
+    """ Parses compilation unit s like javalang.parse.parse, with the bodies
+    of large top-level classes parsed by a pool of worker processes
+
+    """
+
+    tokens = list(JavaTokenizer(s, trivia=True).tokenize())
+    with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+        return parse_tokens(tokens, executor, outline, positions, chunk_tokens)
+
+
+def parse_tokens(tokens, executor, outline=False, positions='span',
+                 chunk_tokens=None):
+    """ Parses tokens, the list of tokens of a compilation unit tokenized with
+    trivia, with the chunks of large class bodies parsed by executor. Methods
+    in those chunks are always parsed, even in outline mode. The result is the
+    same as that of a sequential parse, which is also what happens if a chunk
+    fails to parse.
+
+    """
+
+    if chunk_tokens is None:
+        workers = getattr(executor, '_max_workers', 1)
+        chunk_tokens = max(MIN_CHUNK_TOKENS, len(tokens) // (4 * workers))
+
+    with gc_paused():
+        bodies = {}
+        if tokens and tokens[0].lines is not None:
+            data = tokens[0].lines.data
+            for start, end, chunks in split_class_bodies(tokens, chunk_tokens):
+                futures = [executor.submit(parse_members,
+                                           pack(tokens, first, last, data),
+                                           positions)
+                           for first, last in chunks]
+                bodies[tokens[start].offset] = (start, end, chunks, futures)
+
+        if bodies:
+            parser = StitchingParser(tokens, bodies, outline=outline,
+                                     positions=positions)
+            try:
+                return parser.parse()
+            except SplitFailure:
+                for future in (f for body in bodies.values() for f in body[3]):
+                    future.cancel()
+
+        return Parser(tokens, outline=outline, positions=positions).parse()
+
+
+@contextlib.contextmanager
+def gc_paused():
+    """ Holds off the garbage collector, which would otherwise go over the
+    whole heap again and again while a large tree is built or unpickled
+
+    """
+
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def split_class_bodies(tokens, chunk_tokens):
+    """ Returns (start, end, chunks) for each top-level class whose body has
+    more than chunk_tokens tokens, where tokens[start] and tokens[end] are the
+    braces of the body and chunks lists the (first, last) token ranges of its
+    groups of members
+
+    """
+
+    bodies = []
+    depth = 0
+    parens = 0
+    in_class = False
+    start = None
+
+    for i, token in enumerate(tokens):
+        value = token.value
+        if value == '(':
+            parens += 1
+        elif value == ')':
+            parens -= 1
+        elif value == '{':
+            if depth == 0 and parens == 0 and in_class:
+                start = i
+            in_class = False
+            depth += 1
+        elif value == '}':
+            depth -= 1
+            if depth == 0 and start is not None:
+                if i - start - 1 > chunk_tokens:
+                    chunks = split_members(tokens, start + 1, i, chunk_tokens)
+                    if len(chunks) > 1:
+                        bodies.append((start, i, chunks))
+                start = None
+        elif value == 'class' and depth == 0 and parens == 0:
+            in_class = True
+        elif value in ('enum', 'interface') and depth == 0:
+            in_class = False
+
+    return bodies
+
+
+def split_members(tokens, first, last, chunk_tokens):
+    """ Splits tokens[first:last], the members of a class body, into ranges
+    of at least chunk_tokens tokens that end after a member
+
+    """
+
+    chunks = []
+    depth = 0
+    chunk_start = first
+
+    for i in range(first, last):
+        value = tokens[i].value
+        if value == '{':
+            depth += 1
+            continue
+        elif value == '}':
+            depth -= 1
+            if depth or not is_member_start(tokens[i + 1]):
+                continue
+        elif value != ';' or depth:
+            continue
+
+        # A member ends with tokens[i]
+        if i + 1 - chunk_start >= chunk_tokens and i + 1 < last:
+            chunks.append((chunk_start, i + 1))
+            chunk_start = i + 1
+
+    chunks.append((chunk_start, last))
+    return chunks
+
+
+def is_member_start(token):
+    return (isinstance(token, (Modifier, Annotation, BasicType, Identifier))
+            or token.value in MEMBER_STARTS)
+
+
+def pack(tokens, first, last, data):
+    """ Returns what parse_members needs to rebuild tokens[first:last] in
+    another process: the lines of data they are on, where the first of these
+    starts, their (class, value, offset, javadoc, comments), the position
+    of the token after them and the unicode escapes of the lines
+
+    """
+
+    # The comments of the first token come before it
+    first_token = tokens[first]
+    first_offset = (first_token.comments[0].offset if first_token.comments
+                    else first_token.offset)
+    start = data.rfind('\n', 0, first_offset) + 1
+    end = tokens[last].offset
+    packed = []
+    for token in tokens[first:last]:
+        comments = None
+        if token.comments:
+            comments = [(comment.value, comment.offset, comment.javadoc)
+                        for comment in token.comments]
+        packed.append((token.__class__, token.value, token.offset,
+                       token.javadoc, comments))
+
+    lines = first_token.lines
+    escapes = lines.escapes
+    if escapes:
+        # Only the escapes of the chunk, after a first entry at offset -1
+        # that accounts for the escapes before it
+        decoded, extra = escapes
+        i = bisect.bisect_left(decoded, start)
+        j = bisect.bisect_left(decoded, end)
+        escapes = ([-1] + decoded[i:j],
+                   [extra[i - 1] if i else 0] + extra[i:j])
+
+    line = lines.position(start).line
+    return (data[start:end], start, line, packed, tokens[last].position,
+            escapes)
+
+
+class ChunkLines(LineIndex):
+    """ LineIndex of the part of a source that starts at offset, at the start
+    of line line
+
+    """
+
+    def __init__(self, data, offset, line, escapes=None):
+        super(ChunkLines, self).__init__(data, escapes)
+        self.offset = offset
+        self.line = line
+
+    def position(self, offset):
+        position = super(ChunkLines, self).position(offset - self.offset)
+        return Position(position.line + self.line - 1, position.column)
+
+
+def parse_members(packed, positions):
+    """ Parses a chunk of the members of a class body packed by pack. Returns
+    the declarations and the (index, owner) of the tokens whose comments were
+    given to them.
+
+    """
+
+    data, offset, line, packed_tokens, end, escapes = packed
+    lines = ChunkLines(data, offset, line, escapes)
+
+    with gc_paused():
+        tokens = []
+        comments = []
+        for token_type, value, token_offset, javadoc, token_comments in packed_tokens:
+            token = token_type(value, None, javadoc, token_offset, lines)
+            if token_comments:
+                token.comments = [
+                    Comment(comment_value, None, comment_javadoc,
+                            comment_offset, lines)
+                    for comment_value, comment_offset, comment_javadoc
+                    in token_comments]
+                comments.extend(token.comments)
+            tokens.append(token)
+
+        # Nodes that end with the chunk end at the token after it
+        parser = Parser(tokens, positions=positions)
+        parser.tokens.set_default(EndOfInput(None, end))
+        declarations = []
+        while not isinstance(parser.tokens.look(), EndOfInput):
+            declaration = parser.parse_class_body_declaration()
+            if declaration:
+                declarations.append(declaration)
+
+        # Comments are kept in the tree, they are sent back with their
+        # position and source offsets instead of the lines
+        for comment in comments:
+            comment.position = comment.position
+            comment.source_offset = comment.source_offset
+            comment.source_end_offset = comment.source_end_offset
+            comment.lines = None
+
+        owners = []
+        for i, token in enumerate(tokens):
+            owner = parser.comment_owners.get(id(token))
+            if owner is not None:
+                owners.append((i, owner))
+
+    return declarations, owners
+
+
+class StitchingParser(Parser):
+    """ Parser that takes the members of the class bodies split by
+    parse_tokens from the results of the pool instead of parsing them
+
+    """
+
+    def __init__(self, tokens, bodies, **kwargs):
+        super(StitchingParser, self).__init__(tokens, **kwargs)
+        self.all_tokens = tokens
+        self.bodies = bodies
+
+    def parse_class_body(self):
+        body = self.bodies.get(self.tokens.look().offset)
+        if body is None:
+            return super(StitchingParser, self).parse_class_body()
+
+        start, end, chunks, futures = body
+        declarations = []
+        for (first, _), future in zip(chunks, futures):
+            try:
+                members, owners = future.result()
+            except Exception:
+                raise SplitFailure()
+
+            declarations.extend(members)
+            for i, owner in owners:
+                self.comment_owners[id(self.all_tokens[first + i])] = owner
+
+        for _ in range(end + 1 - start):
+            next(self.tokens)
+
+        return declarations
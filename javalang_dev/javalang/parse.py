@@ -1,4 +1,5 @@
 
+from .events import EventParser
 from .parser import Parser
 from .tokenizer import tokenize
 
@@ -6,7 +7,7 @@ def parse_expression(exp):
     if not exp.endswith(';'):
         exp = exp + ';'
 
-    tokens = tokenize(exp)
+    tokens = tokenize(exp, trivia=True)
     parser = Parser(tokens)
 
     return parser.parse_expression()
@@ -15,7 +16,7 @@ def parse_member_signature(sig):
     if not sig.endswith(';'):
         sig = sig + ';'
 
-    tokens = tokenize(sig)
+    tokens = tokenize(sig, trivia=True)
     parser = Parser(tokens)
 
     return parser.parse_member_declaration()
@@ -26,13 +27,13 @@ def parse_constructor_signature(sig):
         sig = sig[:-1]
     sig = sig + '{ }'
 
-    tokens = tokenize(sig)
+    tokens = tokenize(sig, trivia=True)
     parser = Parser(tokens)
 
     return parser.parse_member_declaration()
 
 def parse_type(s):
-    tokens = tokenize(s)
+    tokens = tokenize(s, trivia=True)
     parser = Parser(tokens)
 
     return parser.parse_type()
@@ -42,12 +43,21 @@ def parse_type_signature(sig):
         sig = sig[:-1]
     sig = sig + '{ }'
 
-    tokens = tokenize(sig)
+    tokens = tokenize(sig, trivia=True)
     parser = Parser(tokens)
 
     return parser.parse_class_or_interface_declaration()
 
-def parse(s):
-    tokens = tokenize(s)
-    parser = Parser(tokens)
+def parse(s, outline=False, positions='span', workers=None):
+    if workers:
+        from . import parallel
+        return parallel.parse(s, workers, outline=outline, positions=positions)
+
+    tokens = tokenize(s, trivia=True)
+    parser = Parser(tokens, outline=outline, positions=positions)
     return parser.parse()
+
+def iter_events(s, skip_bodies=False, positions='span'):
+    tokens = tokenize(s, trivia=True)
+    parser = EventParser(tokens, skip_bodies=skip_bodies, positions=positions)
+    return parser.iter_events()
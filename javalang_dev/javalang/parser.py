@@ -1,14 +1,20 @@
+import bisect
+
 import six
 
+from . import ast
 from . import util
 from . import tree
 from .tokenizer import (
     EndOfInput, Keyword, Modifier, BasicType, Identifier,
-    Annotation, Literal, Operator, JavaToken,
+    Annotation, Literal, Operator, JavaToken, Separator,
 )
 
 ENABLE_DEBUG_SUPPORT = False
 
+# Position tracking levels accepted by Parser, see Parser.__init__
+POSITION_LEVELS = ('none', 'start', 'span')
+
 
 def parse_debug(method):
     global ENABLE_DEBUG_SUPPORT
@@ -63,11 +69,13 @@ def parse_debug(method):
 
 def add_position(method):
     def _method(self):
-        start = self.tokens.look().position
+        if not self.track_positions:
+            return method(self)
+
+        start = self.tokens.look()
         node = method(self)
         if node:
-            node.position.start = start
-            node.position.end = self.tokens.look().position
+            self.set_position(node, start)
 
         return node
 
@@ -94,6 +102,96 @@ class JavaParserError(JavaParserBaseException):
     pass
 
 
+class SpeculationFailure(JavaSyntaxError):
+    """ Raised in place of a full JavaSyntaxError while the parser is trying
+    an alternative that it can back out of. Failures there are caught and
+    discarded straight away, so a single preallocated instance is raised
+    instead of building a description and capturing the offending token.
+
+    """
+
+    def __init__(self):
+        super(SpeculationFailure, self).__init__("Speculative parse failed")
+
+
+SPECULATION_FAILURE = SpeculationFailure()
+
+
+# ------------------------------------------------------------------------------
+# ---- Comments ----
+
+def give_comments(owners, token, owner):
+    """ Moves the comments of token to owner, a (node, leading, length) tuple
+    or None, from the node that had them. owners maps the id of each token
+    to the owner of its comments.
+
+    """
+
+    previous = owners.get(id(token))
+    if previous is not None and isinstance(previous[0], ast.Node):
+        node = previous[0]
+        taken = set(map(id, token.comments))
+        comments = [c for c in node.comments if id(c) not in taken]
+        if comments:
+            node.comments = comments
+        else:
+            del node.comments
+
+    if owner is None:
+        owners.pop(id(token), None)
+    else:
+        owners[id(token)] = owner
+
+    if owner is not None and isinstance(owner[0], ast.Node):
+        node = owner[0]
+        node.comments = sorted(list(node.comments) + list(token.comments),
+                               key=lambda comment: comment.offset)
+
+
+# ------------------------------------------------------------------------------
+# ---- Deferred method bodies ----
+
+class DeferredBlock(ast.Deferred):
+    """ A block skipped by an outline parse. The tokens of the block, braces
+    included, are kept and parsed the first time the block is accessed.
+    Syntax errors inside the block are raised at that point.
+
+    """
+
+    def __init__(self, tokens, positions='span', comment_owners=None):
+        super(DeferredBlock, self).__init__(self.parse)
+        self.tokens = tokens
+        self.positions = positions
+
+        # Comments in the block are held back from the nodes around it, and
+        # those no node of the block takes go to the innermost of them. The
+        # owners of the comments are those of the parser of the tree
+        self.enclosing = None
+        self.comment_owners = {} if comment_owners is None else comment_owners
+        for token in tokens:
+            if token.comments:
+                self.comment_owners[id(token)] = (self, False, -1)
+
+    def parse(self):
+        owners = self.comment_owners
+        for token in self.tokens:
+            if token.comments:
+                owners.pop(id(token), None)
+
+        parser = Parser(self.tokens, positions=self.positions,
+                        comment_owners=owners)
+        block = parser.parse_block()
+
+        if not isinstance(parser.tokens.look(), EndOfInput):
+            parser.illegal("Unexpected token after block")
+
+        for token in self.tokens:
+            if token.comments and id(token) not in owners:
+                give_comments(owners, token, self.enclosing)
+
+        return block
+
+
 # ------------------------------------------------------------------------------
 # ---- Parser class ----
 
@@ -109,12 +207,101 @@ class Parser(object):
                            set(('+', '-')),
                            set(('*', '/', '%'))]
 
-    def __init__(self, tokens):
-        self.tokens = util.LookAheadListIterator(tokens)
+    # Maps each infix operator to its index in operator_precedence
+    operator_levels = dict((operator, level)
+                           for level, operators in enumerate(operator_precedence)
+                           for operator in operators)
+
+    # FIRST sets of the productions tried by parse_statement, parse_primary
+    # and parse_member_declaration. Each maps the value or the class of the
+    # first token of a production to the name of its parse method, see
+    # dispatch. Tokens matching no entry are left to the checks that follow.
+    statement_productions = {
+        '{': 'parse_block_as_statement',
+        ';': 'parse_empty_statement',
+        'if': 'parse_if_statement',
+        'assert': 'parse_assert_statement',
+        'switch': 'parse_switch_statement',
+        'while': 'parse_while_statement',
+        'do': 'parse_do_statement',
+        'for': 'parse_for_statement',
+        'break': 'parse_break_statement',
+        'continue': 'parse_continue_statement',
+        'return': 'parse_return_statement',
+        'throw': 'parse_throw_statement',
+        'synchronized': 'parse_synchronized_statement',
+        'try': 'parse_try_statement',
+    }
+
+    primary_productions = {
+        Literal: 'parse_literal',
+        '(': 'parse_par_expression',
+        'this': 'parse_this_primary',
+        'super': 'parse_super_primary',
+        'new': 'parse_new_primary',
+        '<': 'parse_generic_invocation_primary',
+        Identifier: 'parse_identifier_primary',
+        BasicType: 'parse_basic_type_class_reference',
+        'void': 'parse_void_class_reference',
+    }
+
+    member_productions = {
+        'void': 'parse_void_method_declaration',
+        '<': 'parse_generic_method_or_constructor_declaration',
+        'class': 'parse_normal_class_declaration',
+        'enum': 'parse_enum_declaration',
+        'interface': 'parse_normal_interface_declaration',
+    }
+
+    def __init__(self, tokens, outline=False, positions='span',
+                 comment_owners=None):
+        # The tokens carrying comments as trivia, in order, and their offsets
+        self.commented = []
+        self.commented_offsets = []
+
+        # The (node, leading, length) owner of the comments of each token by
+        # the id of the token, see attach_comments. Parsers of parts of the
+        # same tree share them, other parsers of the tokens have their own
+        self.comment_owners = {} if comment_owners is None else comment_owners
+        if positions != 'none':
+            tokens = self.collect_commented(tokens)
+
+        if isinstance(tokens, (list, tuple)):
+            self.tokens = util.LookAheadListIterator(tokens)
+        else:
+            # Any other iterable, such as the generator returned by
+            # tokenizer.tokenize(), is streamed. Tokens are only held from the
+            # outermost point the parser may backtrack to.
+            self.tokens = util.LookAheadIterator(tokens)
         self.tokens.set_default(EndOfInput(None))
 
         self.debug = False
 
+        # In outline mode method, constructor and static initializer bodies
+        # are skipped and only parsed when accessed, see DeferredBlock
+        self.outline = outline
+
+        # How much of the source position of each node to record:
+        #   'none'  nothing, node positions are left empty
+        #   'start' position.start, the (line, column) of the first token
+        #   'span'  also position.end, the (line, column) of the token after
+        #           the node, and the absolute character offsets
+        #           position.start_offset and position.end_offset in the
+        #           source, before unicode escapes are decoded
+        if positions not in POSITION_LEVELS:
+            raise ValueError("positions must be one of %s, got %r"
+                             % (', '.join(POSITION_LEVELS), positions))
+        self.positions = positions
+        self.track_positions = positions != 'none'
+        self.track_span = positions == 'span'
+
+        # (token, previous owner) of the comments given to nodes while
+        # speculating, to take them back if the speculation fails
+        self.comment_claims = []
+
+        # Number of nested speculative parses in progress, see speculate()
+        self.speculation_depth = 0
+
     # ------------------------------------------------------------------------------
     # ---- Debug control ----
 
@@ -130,12 +317,150 @@ class Parser(object):
     # ------------------------------------------------------------------------------
     # ---- Helper methods ----
 
+    def set_position(self, node, start):
+        """ Records the position of node, parsed from token start up to the
+        last token consumed, according to the configured position level
+
+        """
+
+        if not self.track_positions:
+            return
+
+        position = node.position
+        position.start = start.position
+
+        if self.commented:
+            self.attach_comments(node, start)
+
+        if self.track_span:
+            position.end = self.tokens.look().position
+            position.start_offset = start.offset
+
+            last = self.tokens.previous()
+            if (start.offset is not None and last is not None
+                    and last.offset is not None and last.offset >= start.offset):
+                position.end_offset = last.offset + len(last.value)
+            else:
+                # No tokens were consumed
+                position.end_offset = start.offset
+
+            # The offsets are those of the source, with its unicode escapes
+            lines = start.lines
+            if lines is not None and lines.escapes:
+                position.start_offset = lines.source_offset(position.start_offset)
+                position.end_offset = lines.source_offset(position.end_offset)
+
+    def collect_commented(self, tokens):
+        """ Keeps the tokens of tokens that carry comments in commented, as
+        they are read when tokens is streamed
+
+        """
+
+        if isinstance(tokens, (list, tuple)):
+            for token in tokens:
+                if token.comments:
+                    self.commented.append(token)
+                    self.commented_offsets.append(token.offset)
+            return tokens
+
+        return self.stream_commented(tokens)
+
+    def stream_commented(self, tokens):
+        for token in tokens:
+            if token.comments:
+                self.commented.append(token)
+                self.commented_offsets.append(token.offset)
+            yield token
+
+    def attach_comments(self, node, start):
+        """ Gives node the comments of the tokens it was parsed from. Those
+        before token start go to the outermost node starting there, and those
+        before any other token to the innermost node enclosing it. Nodes are
+        completed from the inside out, so each node takes comments from the
+        node that had them when it ranks higher. Comments inside a block
+        deferred by an outline parse are left to the nodes of the block.
+
+        """
+
+        last = self.tokens.previous()
+        if (start.offset is None or last is None or last.offset is None
+                or last.offset < start.offset):
+            return
+
+        first = bisect.bisect_left(self.commented_offsets, start.offset)
+        end = bisect.bisect_right(self.commented_offsets, last.offset)
+        length = last.offset - start.offset
+
+        for token in self.commented[first:end]:
+            leading = token is start
+            owner = self.comment_owners.get(id(token))
+
+            if owner is not None:
+                if isinstance(owner[0], DeferredBlock):
+                    if owner[0].enclosing is None:
+                        owner[0].enclosing = (node, leading, length)
+                    continue
+
+                _, owner_leading, owner_length = owner
+                if owner_leading and not leading:
+                    continue
+                if owner_leading == leading and (
+                        length < owner_length if leading else length > owner_length):
+                    continue
+
+            if self.speculation_depth:
+                self.comment_claims.append((token, owner))
+            give_comments(self.comment_owners, token, (node, leading, length))
+
     def illegal(self, description, at=None):
+        if self.speculation_depth:
+            raise SPECULATION_FAILURE
+
         if not at:
             at = self.tokens.look()
 
         raise JavaSyntaxError(description, at)
 
+    def expected(self, accept):
+        if self.speculation_depth:
+            raise SPECULATION_FAILURE
+
+        if isinstance(accept, type):
+            self.illegal("Expected %s" % (accept.__name__,))
+        else:
+            self.illegal("Expected '%s'" % (accept,))
+
+    def speculate(self, method):
+        """ Calls method and returns its result. If method fails with a syntax
+        error the tokens are rewound and None is returned instead.
+
+        While speculating, syntax errors are signalled with the preallocated
+        SPECULATION_FAILURE, so full diagnostics are only built for errors that
+        escape to the caller.
+
+        """
+
+        self.speculation_depth += 1
+        claims = len(self.comment_claims)
+
+        try:
+            with self.tokens:
+                return method()
+        except JavaSyntaxError as e:
+            # Drop the frames kept alive by the shared instance
+            e.__traceback__ = None
+            e.__context__ = None
+
+            # Comments go back to the nodes that had them
+            for token, owner in reversed(self.comment_claims[claims:]):
+                give_comments(self.comment_owners, token, owner)
+            del self.comment_claims[claims:]
+            return None
+        finally:
+            self.speculation_depth -= 1
+            if not self.speculation_depth:
+                del self.comment_claims[:]
+
     def accept(self, *accepts):
         last = None
 
@@ -146,14 +471,37 @@ class Parser(object):
             token = next(self.tokens)
             if isinstance(accept, six.string_types) and (
                     not token.value == accept):
-                self.illegal("Expected '%s'" % (accept,))
+                self.expected(accept)
             elif isinstance(accept, type) and not isinstance(token, accept):
-                self.illegal("Expected %s" % (accept.__name__,))
+                self.expected(accept)
 
             last = token
 
         return last.value
 
+    def dispatch(self, productions, token):
+        """ Returns the parse method that productions gives for token, by the
+        value of token or else by its class or closest base class with an
+        entry, or None. The entries found by class are cached in productions.
+
+        """
+
+        name = productions.get(token.value)
+        if name is None:
+            token_type = token.__class__
+            if token_type in productions:
+                name = productions[token_type]
+            else:
+                for base in token_type.__mro__:
+                    name = productions.get(base)
+                    if name is not None:
+                        break
+                productions[token_type] = name
+
+        if name is None:
+            return None
+        return getattr(self, name)
+
     def would_accept(self, *accepts):
         if len(accepts) == 0:
             raise JavaParserError("Missing acceptable values")
@@ -187,39 +535,42 @@ class Parser(object):
 
         return True
 
-    def build_binary_operation(self, parts, start_level=0):
-        if len(parts) == 1:
-            return parts[0]
+    def build_binary_operation(self, parts):
+        """ Builds the BinaryOperation tree for parts, a list of operands
+        separated by infix operators, in a single pass by precedence climbing.
+        Operators of equal precedence associate to the left.
 
-        operands = list()
+        """
+
+        levels = self.operator_levels
+        operands = [parts[0]]
         operators = list()
 
-        i = 0
+        for j in range(1, len(parts), 2):
+            operator = parts[j]
+            level = levels[operator]
 
-        for level in range(start_level, len(self.operator_precedence)):
-            for j in range(1, len(parts) - 1, 2):
-                if parts[j] in self.operator_precedence[level]:
-                    operand = self.build_binary_operation(parts[i:j], level + 1)
-                    operator = parts[j]
-                    i = j + 1
+            # Everything on the stack that binds at least as tightly as the
+            # new operator is complete and can be combined
+            while operators and levels[operators[-1]] >= level:
+                self.reduce_binary_operation(operands, operators)
 
-                    operands.append(operand)
-                    operators.append(operator)
+            operators.append(operator)
+            operands.append(parts[j + 1])
 
-            if operands:
-                break
+        while operators:
+            self.reduce_binary_operation(operands, operators)
 
-        operand = self.build_binary_operation(parts[i:], level + 1)
-        operands.append(operand)
+        return operands[0]
 
-        operation = operands[0]
+    def reduce_binary_operation(self, operands, operators):
+        operandr = operands.pop()
 
-        for operator, operandr in zip(operators, operands[1:]):
-            operation = tree.BinaryOperation(operandl=operation)
-            operation.operator = operator
-            operation.operandr = operandr
+        operation = tree.BinaryOperation(operandl=operands.pop())
+        operation.operator = operators.pop()
+        operation.operandr = operandr
 
-        return operation
+        operands.append(operation)
 
     def is_annotation(self, i=0):
         """ Returns true if the position is the start of an annotation application
@@ -239,6 +590,132 @@ class Parser(object):
         return (isinstance(self.tokens.look(i), Annotation)
                 and self.tokens.look(i + 1).value == 'interface')
 
+    # ------------------------------------------------------------------------------
+    # ---- Lookahead predicates ----
+
+    # The predicates below decide ahead of time whether a speculative parse can
+    # possibly succeed, so that a failed attempt (and the exception raised for
+    # it) is avoided on the common paths. A predicate only returns false when
+    # the guarded parse is certain to fail; a true result must still be
+    # confirmed by the parse itself.
+
+    # Maximum number of tokens scanned when matching parentheses. Past it a
+    # predicate gives up and lets the speculative parse decide.
+    lookahead_limit = 256
+
+    type_argument_values = set(('?', 'extends', 'super', ',', '.', '[', ']'))
+
+    expression_3_start_values = Operator.PREFIX | set(
+        ('(', '<', 'this', 'super', 'new', 'void'))
+
+    def scan_type(self, i=0):
+        """ Returns the position just past the type starting at position i, or
+        None if no type can start there
+
+        """
+
+        token = self.tokens.look(i)
+
+        if isinstance(token, BasicType):
+            i += 1
+
+        elif isinstance(token, Identifier):
+            while True:
+                i += 1
+
+                if self.tokens.look(i).value == '<':
+                    i = self.scan_type_arguments(i)
+                    if i is None:
+                        return None
+
+                if (self.tokens.look(i).value == '.'
+                        and isinstance(self.tokens.look(i + 1), Identifier)):
+                    i += 1
+                else:
+                    break
+
+        else:
+            return None
+
+        while (self.tokens.look(i).value == '['
+               and self.tokens.look(i + 1).value == ']'):
+            i += 2
+
+        return i
+
+    def scan_type_arguments(self, i=0):
+        """ Returns the position just past the type arguments opened by the '<'
+        at position i, or None if a token that cannot appear in type arguments
+        is found first
+
+        """
+
+        depth = 0
+
+        while True:
+            token = self.tokens.look(i)
+
+            if token.value == '<':
+                depth += 1
+            elif token.value == '>':
+                depth -= 1
+                if depth == 0:
+                    return i + 1
+            elif not (isinstance(token, (Identifier, BasicType))
+                      or token.value in self.type_argument_values):
+                return None
+
+            i += 1
+
+    def is_local_variable_declaration(self, i=0):
+        """ Returns true if the position may be the type of a local variable
+        declaration, that is a type followed by an identifier
+
+        """
+
+        i = self.scan_type(i)
+
+        return i is not None and isinstance(self.tokens.look(i), Identifier)
+
+    def is_lambda_expression(self, i=0):
+        """ Returns true if the parenthesis at the position may open the
+        parameters of a lambda expression, that is its matching parenthesis is
+        followed by '->'
+
+        """
+
+        depth = 0
+
+        for j in range(i, i + self.lookahead_limit):
+            token = self.tokens.look(j)
+
+            if token.value == '(':
+                depth += 1
+            elif token.value == ')':
+                depth -= 1
+                if depth == 0:
+                    return self.tokens.look(j + 1).value == '->'
+            elif isinstance(token, EndOfInput):
+                return False
+
+        return True
+
+    def is_cast(self, i=0):
+        """ Returns true if the parenthesis at the position may open a cast,
+        that is it encloses a type and is followed by the start of an operand
+
+        """
+
+        i = self.scan_type(i + 1)
+
+        if i is None or not self.tokens.look(i).value == ')':
+            return False
+
+        token = self.tokens.look(i + 1)
+
+        return (isinstance(token, (Literal, Identifier, BasicType))
+                or token.value in self.expression_3_start_values)
+
     # ------------------------------------------------------------------------------
     # ---- Parsing methods ----
 
@@ -281,11 +758,33 @@ class Parser(object):
     @parse_debug
     @add_position
     def parse_compilation_unit(self):
+        import_declarations = list()
+        type_declarations = list()
+
+        package = self.parse_package_declaration()
+
+        while self.would_accept('import'):
+            import_declaration = self.parse_import_declaration()
+            import_declarations.append(import_declaration)
+
+        while not isinstance(self.tokens.look(), EndOfInput):
+            try:
+                type_declaration = self.parse_type_declaration()
+            except StopIteration:
+                self.illegal("Unexpected end of input")
+
+            if type_declaration:
+                type_declarations.append(type_declaration)
+
+        return tree.CompilationUnit(package=package,
+                                    imports=import_declarations,
+                                    types=type_declarations)
+
+    @parse_debug
+    def parse_package_declaration(self):
         package = None
         package_annotations = None
         javadoc = None
-        import_declarations = list()
-        type_declarations = list()
 
         self.tokens.push_marker()
         next_token = self.tokens.look()
@@ -301,29 +800,16 @@ class Parser(object):
             package = tree.PackageDeclaration(annotations=package_annotations,
                                               name=package_name,
                                               documentation=javadoc)
-            package.position.start = next_token.position
-            package.position.end = next_token.position
             self.accept(';')
+
+            self.set_position(package, next_token)
+            if self.track_span:
+                # The line based end has always been the first token
+                package.position.end = next_token.position
         else:
             self.tokens.pop_marker(True)
-            package_annotations = None
 
-        while self.would_accept('import'):
-            import_declaration = self.parse_import_declaration()
-            import_declarations.append(import_declaration)
-
-        while not isinstance(self.tokens.look(), EndOfInput):
-            try:
-                type_declaration = self.parse_type_declaration()
-            except StopIteration:
-                self.illegal("Unexpected end of input")
-
-            if type_declaration:
-                type_declarations.append(type_declaration)
-
-        return tree.CompilationUnit(package=package,
-                                    imports=import_declarations,
-                                    types=type_declarations)
+        return package
 
     @parse_debug
     @add_position
@@ -535,16 +1021,14 @@ class Parser(object):
         pattern_type = None
         base_type = None
 
-        lineno = self.tokens.look().position
+        start = self.tokens.look()
 
         if self.try_accept('?'):
             if self.tokens.look().value in ('extends', 'super'):
                 pattern_type = self.tokens.next().value
             else:
                 type_argument = tree.TypeArgument(pattern_type='?')
-                type_argument.position.start = lineno
-                lineno = self.tokens.look().position
-                type_argument.position.end = lineno
+                self.set_position(type_argument, start)
                 return type_argument
 
         if self.would_accept(BasicType):
@@ -560,9 +1044,7 @@ class Parser(object):
         type_argument = tree.TypeArgument(type=base_type,
                                           pattern_type=pattern_type)
 
-        type_argument.position.start = lineno
-        lineno = self.tokens.look().position
-        type_argument.position.end = lineno
+        self.set_position(type_argument, start)
         return type_argument
 
     @parse_debug
@@ -573,7 +1055,8 @@ class Parser(object):
         new_list = []
         for t in type_arguments:
             type_arg = tree.TypeArgument(type=t)
-            type_arg.position = t.position
+            if self.track_positions:
+                type_arg.position = t.position
             new_list.append(type_arg)
         return new_list
 
@@ -805,15 +1288,16 @@ class Parser(object):
     def parse_class_body_declaration(self):
         token = self.tokens.look()
 
-        if self.try_accept(';'):
+        if token.value == ';':
+            self.accept(';')
             return None
 
-        elif self.would_accept('static', '{'):
+        elif token.value == 'static' and self.tokens.look(1).value == '{':
             self.accept('static')
-            block = self.parse_block()
+            block = self.parse_body()
             return tree.StaticBlock(statements=block)
 
-        elif self.would_accept('{'):
+        elif token.value == '{':
             return self.parse_block()
 
         else:
@@ -826,22 +1310,9 @@ class Parser(object):
         member = None
 
         token = self.tokens.look()
-        if self.try_accept('void'):
-            method_name = self.parse_identifier()
-            member = self.parse_void_method_declarator_rest()
-            member.name = method_name
-
-        elif token.value == '<':
-            member = self.parse_generic_method_or_constructor_declaration()
-
-        elif token.value == 'class':
-            member = self.parse_normal_class_declaration()
-
-        elif token.value == 'enum':
-            member = self.parse_enum_declaration()
-
-        elif token.value == 'interface':
-            member = self.parse_normal_interface_declaration()
+        production = self.dispatch(self.member_productions, token)
+        if production is not None:
+            member = production()
 
         elif self.is_annotation_declaration():
             member = self.parse_annotation_type_declaration()
@@ -861,6 +1332,15 @@ class Parser(object):
 
         return member
 
+    @parse_debug
+    def parse_void_method_declaration(self):
+        self.accept('void')
+        method_name = self.parse_identifier()
+        member = self.parse_void_method_declarator_rest()
+        member.name = method_name
+
+        return member
+
     @parse_debug
     def parse_method_or_field_declaraction(self):
         member_type = self.parse_type()
@@ -890,13 +1370,11 @@ class Parser(object):
 
     @parse_debug
     def parse_field_declarators_rest(self):
-        lineno = self.tokens.look().position
+        start = self.tokens.look()
         array_dimension, initializer = self.parse_variable_declarator_rest()
         declarator = tree.VariableDeclarator(dimensions=array_dimension,
                                              initializer=initializer)
-        declarator.position.start = lineno
-        lineno = self.tokens.look().position
-        declarator.position.end = lineno
+        self.set_position(declarator, start)
 
         declarators = [declarator]
 
@@ -917,7 +1395,7 @@ class Parser(object):
             throws = self.parse_qualified_identifier_list()
 
         if self.would_accept('{'):
-            body = self.parse_block()
+            body = self.parse_body()
         else:
             self.accept(';')
 
@@ -936,7 +1414,7 @@ class Parser(object):
             throws = self.parse_qualified_identifier_list()
 
         if self.would_accept('{'):
-            body = self.parse_block()
+            body = self.parse_body()
         else:
             self.accept(';')
 
@@ -953,7 +1431,7 @@ class Parser(object):
         if self.try_accept('throws'):
             throws = self.parse_qualified_identifier_list()
 
-        body = self.parse_block()
+        body = self.parse_body()
 
         return tree.ConstructorDeclaration(parameters=formal_parameters,
                                            throws=throws,
@@ -1087,13 +1565,11 @@ class Parser(object):
 
     @parse_debug
     def parse_constant_declarators_rest(self):
-        lineno = self.tokens.look().position
+        start = self.tokens.look()
         array_dimension, initializer = self.parse_constant_declarator_rest()
         declarator = tree.VariableDeclarator(dimensions=array_dimension,
                                              initializer=initializer)
-        declarator.position.start = lineno
-        lineno = self.tokens.look().position
-        declarator.position.end = lineno
+        self.set_position(declarator, start)
 
         declarators = [declarator]
 
@@ -1132,7 +1608,7 @@ class Parser(object):
             throws = self.parse_qualified_identifier_list()
 
         if 'default' in modifiers or 'static' in modifiers:
-            body = self.parse_block()
+            body = self.parse_body()
         else:
             self.accept(';')
 
@@ -1150,7 +1626,7 @@ class Parser(object):
             throws = self.parse_qualified_identifier_list()
 
         if 'default' in modifiers or 'static' in modifiers:
-            body = self.parse_block()
+            body = self.parse_body()
         else:
             self.accept(';')
 
@@ -1187,7 +1663,7 @@ class Parser(object):
             return formal_parameters
 
         while True:
-            lineno = self.tokens.look().position
+            start = self.tokens.look()
 
             modifiers, annotations = self.parse_variable_modifiers()
             parameter_type = self.parse_type()
@@ -1205,9 +1681,7 @@ class Parser(object):
                                              name=parameter_name,
                                              varargs=varargs)
 
-            parameter.position.start = lineno
-            lineno = self.tokens.look().position
-            parameter.position.end = lineno
+            self.set_position(parameter, start)
 
             formal_parameters.append(parameter)
 
@@ -1318,13 +1792,52 @@ class Parser(object):
 
         return statements
 
+    @parse_debug
+    def parse_body(self):
+        """ Parses a method, constructor or initializer body, deferring it in
+        outline mode.
+
+        """
+
+        if not self.outline:
+            return self.parse_block()
+
+        if not self.would_accept('{'):
+            self.illegal("Expected '{'")
+
+        tokens = list()
+        depth = 0
+
+        while True:
+            try:
+                token = next(self.tokens)
+            except StopIteration:
+                self.illegal("Unexpected end of input")
+
+            tokens.append(token)
+
+            if isinstance(token, Separator):
+                if token.value == '{':
+                    depth += 1
+                elif token.value == '}':
+                    depth -= 1
+
+                    if depth == 0:
+                        break
+
+        return DeferredBlock(tokens, self.positions, self.comment_owners)
+
     @parse_debug
     def parse_block_statement(self):
-        if self.would_accept(Identifier, ':'):
-            # Labeled statement
+        token = self.tokens.look()
+
+        if token.value in self.statement_productions:
+            # Statements starting with a keyword or separator, including
+            # synchronized which would otherwise be taken for a modifier
             return self.parse_statement()
 
-        if self.would_accept('synchronized'):
+        if isinstance(token, Identifier) and self.tokens.look(1).value == ':':
+            # Labeled statement
             return self.parse_statement()
 
         token = None
@@ -1374,16 +1887,17 @@ class Parser(object):
         # At this point, if the block statement is a variable definition the next
         # token MUST be an identifier, so if it isn't we can conclude the block
         # statement is a normal statement
-        if not isinstance(token, Identifier):
+        if not self.is_local_variable_declaration(i):
             return self.parse_statement()
 
-        # We can't easily determine the statement type. Try parsing as a variable
+        # We can't be certain of the statement type. Try parsing as a variable
         # declaration first and fall back to a statement
-        try:
-            with self.tokens:
-                return self.parse_local_variable_declaration_statement()
-        except JavaSyntaxError:
-            return self.parse_statement()
+        declaration = self.speculate(
+            self.parse_local_variable_declaration_statement)
+        if declaration is not None:
+            return declaration
+
+        return self.parse_statement()
 
     @parse_debug
     @add_position
@@ -1403,14 +1917,11 @@ class Parser(object):
     @add_position
     def parse_statement(self):
         token = self.tokens.look()
-        if self.would_accept('{'):
-            block = self.parse_block()
-            return tree.BlockStatement(statements=block)
+        production = self.dispatch(self.statement_productions, token)
+        if production is not None:
+            return production()
 
-        elif self.try_accept(';'):
-            return tree.Statement()
-
-        elif self.would_accept(Identifier, ':'):
+        elif isinstance(token, Identifier) and self.tokens.look(1).value == ':':
             identifer = self.parse_identifier()
             self.accept(':')
 
@@ -1419,145 +1930,178 @@ class Parser(object):
 
             return statement
 
-        elif self.try_accept('if'):
-            condition = self.parse_par_expression()
-            then = self.parse_statement()
-            else_statement = None
+        else:
+            expression = self.parse_expression()
+            self.accept(';')
 
-            if self.try_accept('else'):
-                else_statement = self.parse_statement()
+            return tree.StatementExpression(expression=expression)
 
-            return tree.IfStatement(condition=condition,
-                                    then_statement=then,
-                                    else_statement=else_statement)
+    @parse_debug
+    def parse_block_as_statement(self):
+        block = self.parse_block()
+        return tree.BlockStatement(statements=block)
 
-        elif self.try_accept('assert'):
-            condition = self.parse_expression()
-            value = None
+    @parse_debug
+    def parse_empty_statement(self):
+        self.accept(';')
+        return tree.Statement()
 
-            if self.try_accept(':'):
-                value = self.parse_expression()
+    @parse_debug
+    def parse_if_statement(self):
+        self.accept('if')
+        condition = self.parse_par_expression()
+        then = self.parse_statement()
+        else_statement = None
 
-            self.accept(';')
+        if self.try_accept('else'):
+            else_statement = self.parse_statement()
 
-            return tree.AssertStatement(condition=condition,
-                                        value=value)
+        return tree.IfStatement(condition=condition,
+                                then_statement=then,
+                                else_statement=else_statement)
 
-        elif self.try_accept('switch'):
-            switch_expression = self.parse_par_expression()
-            self.accept('{')
-            switch_block = self.parse_switch_block_statement_groups()
-            self.accept('}')
+    @parse_debug
+    def parse_assert_statement(self):
+        self.accept('assert')
+        condition = self.parse_expression()
+        value = None
 
-            return tree.SwitchStatement(expression=switch_expression,
-                                        cases=switch_block)
+        if self.try_accept(':'):
+            value = self.parse_expression()
 
-        elif self.try_accept('while'):
-            condition = self.parse_par_expression()
-            action = self.parse_statement()
+        self.accept(';')
 
-            return tree.WhileStatement(condition=condition,
-                                       body=action)
+        return tree.AssertStatement(condition=condition,
+                                    value=value)
 
-        elif self.try_accept('do'):
-            action = self.parse_statement()
-            self.accept('while')
-            condition = self.parse_par_expression()
-            self.accept(';')
+    @parse_debug
+    def parse_switch_statement(self):
+        self.accept('switch')
+        switch_expression = self.parse_par_expression()
+        self.accept('{')
+        switch_block = self.parse_switch_block_statement_groups()
+        self.accept('}')
 
-            return tree.DoStatement(condition=condition,
-                                    body=action)
+        return tree.SwitchStatement(expression=switch_expression,
+                                    cases=switch_block)
 
-        elif self.try_accept('for'):
-            self.accept('(')
-            for_control = self.parse_for_control()
-            self.accept(')')
-            for_statement = self.parse_statement()
+    @parse_debug
+    def parse_while_statement(self):
+        self.accept('while')
+        condition = self.parse_par_expression()
+        action = self.parse_statement()
 
-            return tree.ForStatement(control=for_control,
-                                     body=for_statement)
+        return tree.WhileStatement(condition=condition,
+                                   body=action)
 
-        elif self.try_accept('break'):
-            label = None
+    @parse_debug
+    def parse_do_statement(self):
+        self.accept('do')
+        action = self.parse_statement()
+        self.accept('while')
+        condition = self.parse_par_expression()
+        self.accept(';')
 
-            if self.would_accept(Identifier):
-                label = self.parse_identifier()
+        return tree.DoStatement(condition=condition,
+                                body=action)
 
-            self.accept(';')
+    @parse_debug
+    def parse_for_statement(self):
+        self.accept('for', '(')
+        for_control = self.parse_for_control()
+        self.accept(')')
+        for_statement = self.parse_statement()
 
-            return tree.BreakStatement(goto=label)
+        return tree.ForStatement(control=for_control,
+                                 body=for_statement)
 
-        elif self.try_accept('continue'):
-            label = None
+    @parse_debug
+    def parse_break_statement(self):
+        self.accept('break')
+        label = None
 
-            if self.would_accept(Identifier):
-                label = self.parse_identifier()
+        if self.would_accept(Identifier):
+            label = self.parse_identifier()
 
-            self.accept(';')
+        self.accept(';')
 
-            return tree.ContinueStatement(goto=label)
+        return tree.BreakStatement(goto=label)
 
-        elif self.try_accept('return'):
-            value = None
+    @parse_debug
+    def parse_continue_statement(self):
+        self.accept('continue')
+        label = None
 
-            if not self.would_accept(';'):
-                value = self.parse_expression()
+        if self.would_accept(Identifier):
+            label = self.parse_identifier()
 
-            self.accept(';')
+        self.accept(';')
 
-            return tree.ReturnStatement(expression=value)
+        return tree.ContinueStatement(goto=label)
 
-        elif self.try_accept('throw'):
-            value = self.parse_expression()
-            self.accept(';')
+    @parse_debug
+    def parse_return_statement(self):
+        self.accept('return')
+        value = None
 
-            return tree.ThrowStatement(expression=value)
+        if not self.would_accept(';'):
+            value = self.parse_expression()
 
-        elif self.try_accept('synchronized'):
-            lock = self.parse_par_expression()
-            block = self.parse_block()
+        self.accept(';')
 
-            return tree.SynchronizedStatement(lock=lock,
-                                              block=block)
+        return tree.ReturnStatement(expression=value)
 
-        elif self.try_accept('try'):
-            resource_specification = None
-            block = None
-            catches = None
-            finally_block = None
+    @parse_debug
+    def parse_throw_statement(self):
+        self.accept('throw')
+        value = self.parse_expression()
+        self.accept(';')
 
-            if self.would_accept('{'):
-                block = self.parse_block()
+        return tree.ThrowStatement(expression=value)
 
-                if self.would_accept('catch'):
-                    catches = self.parse_catches()
+    @parse_debug
+    def parse_synchronized_statement(self):
+        self.accept('synchronized')
+        lock = self.parse_par_expression()
+        block = self.parse_block()
 
-                if self.try_accept('finally'):
-                    finally_block = self.parse_block()
+        return tree.SynchronizedStatement(lock=lock,
+                                          block=block)
 
-                if catches == None and finally_block == None:
-                    self.illegal("Expected catch/finally block")
+    @parse_debug
+    def parse_try_statement(self):
+        self.accept('try')
+        resource_specification = None
+        block = None
+        catches = None
+        finally_block = None
 
-            else:
-                resource_specification = self.parse_resource_specification()
-                block = self.parse_block()
+        if self.would_accept('{'):
+            block = self.parse_block()
 
-                if self.would_accept('catch'):
-                    catches = self.parse_catches()
+            if self.would_accept('catch'):
+                catches = self.parse_catches()
 
-                if self.try_accept('finally'):
-                    finally_block = self.parse_block()
+            if self.try_accept('finally'):
+                finally_block = self.parse_block()
 
-            return tree.TryStatement(resources=resource_specification,
-                                     block=block,
-                                     catches=catches,
-                                     finally_block=finally_block)
+            if catches == None and finally_block == None:
+                self.illegal("Expected catch/finally block")
 
         else:
-            expression = self.parse_expression()
-            self.accept(';')
+            resource_specification = self.parse_resource_specification()
+            block = self.parse_block()
 
-            return tree.StatementExpression(expression=expression)
+            if self.would_accept('catch'):
+                catches = self.parse_catches()
+
+            if self.try_accept('finally'):
+                finally_block = self.parse_block()
+
+        return tree.TryStatement(resources=resource_specification,
+                                 block=block,
+                                 catches=catches,
+                                 finally_block=finally_block)
 
     # ------------------------------------------------------------------------------
     # -- Try / catch --
@@ -1580,7 +2124,7 @@ class Parser(object):
     def parse_catch_clause(self):
         self.accept('catch', '(')
 
-        lineno = self.tokens.look().position
+        start = self.tokens.look()
         modifiers, annotations = self.parse_variable_modifiers()
         catch_parameter = tree.CatchClauseParameter(types=list())
 
@@ -1592,9 +2136,7 @@ class Parser(object):
                 break
         catch_parameter.name = self.parse_identifier()
 
-        catch_parameter.position.start = lineno
-        lineno = self.tokens.look().position
-        catch_parameter.position.end = lineno
+        self.set_position(catch_parameter, start)
 
         self.accept(')')
         block = self.parse_block()
@@ -1690,11 +2232,12 @@ class Parser(object):
     def parse_for_control(self):
         # Try for_var_control and fall back to normal three part for control
 
-        try:
-            with self.tokens:
-                return self.parse_for_var_control()
-        except JavaSyntaxError:
-            pass
+        token = self.tokens.look()
+        if (not isinstance(token, (Identifier, BasicType))
+                or self.is_local_variable_declaration()):
+            var_control = self.speculate(self.parse_for_var_control)
+            if var_control is not None:
+                return var_control
 
         init = None
         if not self.would_accept(';'):
@@ -1877,32 +2420,15 @@ class Parser(object):
         while self.tokens.look().value in Operator.PREFIX:
             prefix_operators.append(self.tokens.next().value)
 
-        if self.would_accept('('):
-            try:
-                with self.tokens:
-                    lambda_exp = self.parse_lambda_expression()
-                    if lambda_exp:
-                        return lambda_exp
-            except JavaSyntaxError:
-                pass
-            try:
-                with self.tokens:
-                    self.accept('(')
-                    lineno = self.tokens.look().position
-                    cast_target = self.parse_type()
-                    self.accept(')')
-                    expression = self.parse_expression_3()
-
-                    cast_expression = tree.Cast(type=cast_target,
-                                                expression=expression)
-                    cast_expression.position.start = lineno
-                    lineno = self.tokens.look().position
-                    cast_expression.position.end = lineno
-
-                    return cast_expression
+        if self.would_accept('(') and self.is_lambda_expression():
+            lambda_exp = self.speculate(self.parse_lambda_expression)
+            if lambda_exp:
+                return lambda_exp
 
-            except JavaSyntaxError:
-                pass
+        if self.would_accept('(') and self.is_cast():
+            cast_expression = self.speculate(self.parse_cast)
+            if cast_expression is not None:
+                return cast_expression
 
         primary = self.parse_primary()
         primary.prefix_operators = prefix_operators
@@ -1922,6 +2448,20 @@ class Parser(object):
 
         return primary
 
+    @parse_debug
+    def parse_cast(self):
+        self.accept('(')
+        start = self.tokens.look()
+        cast_target = self.parse_type()
+        self.accept(')')
+        expression = self.parse_expression_3()
+
+        cast_expression = tree.Cast(type=cast_target,
+                                    expression=expression)
+        self.set_position(cast_expression, start)
+
+        return cast_expression
+
     @parse_debug
     def parse_method_reference(self):
         type_arguments = list()
@@ -1982,78 +2522,87 @@ class Parser(object):
     @parse_debug
     @add_position
     def parse_primary(self):
-        token = self.tokens.look()
+        production = self.dispatch(self.primary_productions, self.tokens.look())
+        if production is not None:
+            return production()
 
-        if isinstance(token, Literal):
-            return self.parse_literal()
+        self.illegal("Expected expression")
 
-        elif token.value == '(':
-            return self.parse_par_expression()
+    @parse_debug
+    def parse_this_primary(self):
+        self.accept('this')
+        arguments = None
 
-        elif self.try_accept('this'):
-            arguments = None
+        if self.would_accept('('):
+            arguments = self.parse_arguments()
+            return tree.ExplicitConstructorInvocation(arguments=arguments)
 
-            if self.would_accept('('):
-                arguments = self.parse_arguments()
-                return tree.ExplicitConstructorInvocation(arguments=arguments)
+        return tree.This()
 
-            return tree.This()
-        elif self.would_accept('super', '::'):
-            self.accept('super')
+    @parse_debug
+    def parse_super_primary(self):
+        token = self.tokens.look()
+        self.accept('super')
+
+        if self.would_accept('::'):
             return token
-        elif self.try_accept('super'):
-            super_suffix = self.parse_super_suffix()
-            return super_suffix
 
-        elif self.try_accept('new'):
-            return self.parse_creator()
+        super_suffix = self.parse_super_suffix()
+        return super_suffix
 
-        elif token.value == '<':
-            type_arguments = self.parse_nonwildcard_type_arguments()
+    @parse_debug
+    def parse_new_primary(self):
+        self.accept('new')
+        return self.parse_creator()
 
-            if self.try_accept('this'):
-                arguments = self.parse_arguments()
-                return tree.ExplicitConstructorInvocation(type_arguments=type_arguments,
-                                                          arguments=arguments)
-            else:
-                invocation = self.parse_explicit_generic_invocation_suffix()
-                invocation.type_arguments = type_arguments
+    @parse_debug
+    def parse_generic_invocation_primary(self):
+        type_arguments = self.parse_nonwildcard_type_arguments()
 
-                return invocation
+        if self.try_accept('this'):
+            arguments = self.parse_arguments()
+            return tree.ExplicitConstructorInvocation(type_arguments=type_arguments,
+                                                      arguments=arguments)
+        else:
+            invocation = self.parse_explicit_generic_invocation_suffix()
+            invocation.type_arguments = type_arguments
 
-        elif isinstance(token, Identifier):
-            qualified_identifier = [self.parse_identifier()]
+            return invocation
 
-            while self.would_accept('.', Identifier):
-                self.accept('.')
-                identifier = self.parse_identifier()
-                qualified_identifier.append(identifier)
+    @parse_debug
+    def parse_identifier_primary(self):
+        qualified_identifier = [self.parse_identifier()]
 
-            identifier_suffix = self.parse_identifier_suffix()
+        while self.would_accept('.', Identifier):
+            self.accept('.')
+            identifier = self.parse_identifier()
+            qualified_identifier.append(identifier)
 
-            if isinstance(identifier_suffix, (tree.MemberReference, tree.MethodInvocation)):
-                # Take the last identifer as the member and leave the rest for the qualifier
-                identifier_suffix.member = qualified_identifier.pop()
+        identifier_suffix = self.parse_identifier_suffix()
 
-            elif isinstance(identifier_suffix, tree.ClassReference):
-                identifier_suffix.type = tree.ReferenceType(name=qualified_identifier.pop())
+        if isinstance(identifier_suffix, (tree.MemberReference, tree.MethodInvocation)):
+            # Take the last identifer as the member and leave the rest for the qualifier
+            identifier_suffix.member = qualified_identifier.pop()
 
-            identifier_suffix.qualifier = '.'.join(qualified_identifier)
+        elif isinstance(identifier_suffix, tree.ClassReference):
+            identifier_suffix.type = tree.ReferenceType(name=qualified_identifier.pop())
 
-            return identifier_suffix
+        identifier_suffix.qualifier = '.'.join(qualified_identifier)
 
-        elif isinstance(token, BasicType):
-            base_type = self.parse_basic_type()
-            base_type.dimensions = self.parse_array_dimension()
-            self.accept('.', 'class')
+        return identifier_suffix
 
-            return tree.ClassReference(type=base_type)
+    @parse_debug
+    def parse_basic_type_class_reference(self):
+        base_type = self.parse_basic_type()
+        base_type.dimensions = self.parse_array_dimension()
+        self.accept('.', 'class')
 
-        elif self.try_accept('void'):
-            self.accept('.', 'class')
-            return tree.VoidClassReference()
+        return tree.ClassReference(type=base_type)
 
-        self.illegal("Expected expression")
+    @parse_debug
+    def parse_void_class_reference(self):
+        self.accept('void', '.', 'class')
+        return tree.VoidClassReference()
 
     @parse_debug
     def parse_literal(self):
@@ -2454,7 +3003,7 @@ class Parser(object):
             return self.parse_constant_declarators_rest()
 
 
-def parse(tokens, debug=False):
-    parser = Parser(tokens)
+def parse(tokens, debug=False, outline=False, positions='span'):
+    parser = Parser(tokens, outline=outline, positions=positions)
     parser.set_debug(debug)
     return parser.parse()
@@ -0,0 +1,96 @@
+import random
+import unittest
+
+from .. import parse, parser, tree
+
+
+def reference_build(parts, start_level=0):
+    """ The recursive builder that splits parts at the loosest binding
+    operators, kept to check the iterative one against
+
+    """
+
+    if len(parts) == 1:
+        return parts[0]
+
+    operands = list()
+    operators = list()
+    i = 0
+
+    for level in range(start_level, len(parser.Parser.operator_precedence)):
+        for j in range(1, len(parts) - 1, 2):
+            if parts[j] in parser.Parser.operator_precedence[level]:
+                operands.append(reference_build(parts[i:j], level + 1))
+                operators.append(parts[j])
+                i = j + 1
+
+        if operands:
+            break
+
+    operands.append(reference_build(parts[i:], level + 1))
+
+    operation = operands[0]
+    for operator, operandr in zip(operators, operands[1:]):
+        operation = tree.BinaryOperation(operandl=operation)
+        operation.operator = operator
+        operation.operandr = operandr
+
+    return operation
+
+
+class BinaryOperationTest(unittest.TestCase):
+
+    def test_precedence(self):
+        expression = parse.parse_expression('a + b * c - d')
+
+        self.assertEqual(expression.operator, '-')
+        self.assertEqual(expression.operandl.operator, '+')
+        self.assertEqual(expression.operandl.operandr.operator, '*')
+        self.assertEqual(expression.operandr.member, 'd')
+
+    def test_left_associative(self):
+        expression = parse.parse_expression('a - b - c')
+
+        self.assertEqual(expression.operandl.operator, '-')
+        self.assertEqual(expression.operandl.operandl.member, 'a')
+        self.assertEqual(expression.operandr.member, 'c')
+
+    def test_instanceof(self):
+        expression = parse.parse_expression('a instanceof B == c || d')
+
+        self.assertEqual(expression.operator, '||')
+        self.assertEqual(expression.operandl.operator, '==')
+        self.assertEqual(expression.operandl.operandl.operator, 'instanceof')
+        self.assertEqual(expression.operandl.operandl.operandr.name, 'B')
+
+    def test_matches_recursive_builder(self):
+        rng = random.Random(0)
+        operators = sorted(parser.Parser.operator_levels)
+
+        for _ in range(500):
+            parts = ['a0']
+            for i in range(1, rng.randint(1, 15)):
+                parts.extend((rng.choice(operators), 'a%d' % i))
+
+            self.assertEqual(
+                repr(parser.Parser([]).build_binary_operation(parts)),
+                repr(reference_build(parts)), parts)
+
+    def test_long_chain(self):
+        length = 20000
+        expression = parse.parse_expression(
+            ' + '.join('a%d' % i for i in range(length)))
+
+        depth = 0
+        while isinstance(expression, tree.BinaryOperation):
+            self.assertEqual(expression.operandr.member,
+                             'a%d' % (length - 1 - depth))
+            expression = expression.operandl
+            depth += 1
+
+        self.assertEqual(depth, length - 1)
+        self.assertEqual(expression.member, 'a0')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,143 @@
+import unittest
+
+from .. import parse, tree
+from ..parser import JavaSyntaxError
+
+
+SOURCE = """/** Package */
+package org.javalang.test;
+
+import java.util.List;
+
+/** Outer */
+public class Outer {
+    int a = 1, b;
+
+    static { a = 2; }
+
+    Outer() { new Runnable() { public void run() {} }; }
+
+    // before the method
+    void method() {
+        class Local { }
+    }
+
+    enum Kind {
+        A, B { void b() {} };
+
+        int weight;
+    }
+
+    interface Named { String name(); }
+
+    @interface Marker { int value() default 1; }
+    // at the end of the body
+}
+
+class Second { }
+"""
+
+
+def describe(event, node):
+    return (event, type(node).__name__, getattr(node, 'name', None))
+
+
+def reference(node):
+    """ The events of the declarations of a fully parsed tree """
+
+    if isinstance(node, tree.CompilationUnit):
+        members = node.types
+    elif isinstance(node, tree.EnumDeclaration):
+        members = node.body.constants + node.body.declarations
+    elif isinstance(node, tree.TypeDeclaration):
+        members = node.body
+    else:
+        members = []
+
+    events = [('enter', node)]
+    for member in members:
+        if isinstance(member, tree.Declaration):
+            events.extend(reference(member))
+    events.append(('exit', node))
+    return events
+
+
+class IterEventsTest(unittest.TestCase):
+
+    def test_events(self):
+        events = [describe(event, node)
+                  for event, node in parse.iter_events(SOURCE)]
+
+        self.assertEqual(events[:4], [
+            ('enter', 'CompilationUnit', None),
+            ('enter', 'ClassDeclaration', 'Outer'),
+            ('enter', 'FieldDeclaration', None),
+            ('exit', 'FieldDeclaration', None)])
+        self.assertEqual(
+            [describe(event, node)
+             for event, node in reference(parse.parse(SOURCE))], events)
+
+        # Local and anonymous classes are part of their member
+        self.assertNotIn(('enter', 'ClassDeclaration', 'Local'), events)
+
+    def test_nodes(self):
+        nodes = dict((describe(event, node), node)
+                     for event, node in parse.iter_events(SOURCE))
+
+        unit = nodes['enter', 'CompilationUnit', None]
+        self.assertEqual(unit.package.name, 'org.javalang.test')
+        self.assertEqual(unit.imports[0].path, 'java.util.List')
+        self.assertEqual(unit.types, [])
+
+        # Type declarations come without their members
+        outer = nodes['exit', 'ClassDeclaration', 'Outer']
+        self.assertEqual(outer.body, [])
+        self.assertEqual(outer.documentation, '/** Outer */')
+
+        method = nodes['exit', 'MethodDeclaration', 'method']
+        self.assertIsInstance(method.body[0], tree.ClassDeclaration)
+
+    def test_positions_and_comments(self):
+        # Type declarations are complete once their body is parsed
+        def exits(events):
+            return [(type(node).__name__, node.position.start,
+                     node.position.end, node.source_span,
+                     [comment.value for comment in node.comments])
+                    for event, node in events if event == 'exit'
+                    and not isinstance(node, tree.EnumDeclaration)]
+
+        events = exits(parse.iter_events(SOURCE))
+        self.assertEqual(events, exits(reference(parse.parse(SOURCE))))
+
+        outer, unit = events[-3], events[-1]
+        self.assertEqual(outer[4], ['/** Outer */',
+                                    '// at the end of the body\n'])
+        self.assertEqual(unit[4], ['/** Package */'])
+
+    def test_skip_bodies(self):
+        events = list(parse.iter_events(SOURCE, skip_bodies=True))
+        self.assertEqual(
+            [describe(event, node) for event, node in events],
+            [describe(event, node)
+             for event, node in parse.iter_events(SOURCE)])
+
+        method = [node for _, node in events
+                  if getattr(node, 'name', None) == 'method'][0]
+        self.assertNotIn('body', method.__dict__)
+        self.assertIsInstance(method.body[0], tree.ClassDeclaration)
+
+    def test_syntax_error(self):
+        events = parse.iter_events('class A { int a; int b }')
+        self.assertEqual([describe(*next(events)) for _ in range(4)], [
+            ('enter', 'CompilationUnit', None),
+            ('enter', 'ClassDeclaration', 'A'),
+            ('enter', 'FieldDeclaration', None),
+            ('exit', 'FieldDeclaration', None)])
+        self.assertRaises(JavaSyntaxError, next, events)
+
+        events = parse.iter_events('package a')
+        self.assertRaises(JavaSyntaxError, list, events)
+
+
+if __name__ == "__main__":
+    unittest.main()
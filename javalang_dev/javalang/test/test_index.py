@@ -0,0 +1,235 @@
+import pickle
+import unittest
+
+from .. import ast, parse, tree
+
+
+SOURCE = """package org.javalang.test;
+
+class Outer {
+    int a, b;
+    static final int C = 1;
+
+    Outer() { }
+
+    void first() {
+        class Local {
+            void inner() { first(); }
+        }
+    }
+
+    int second(int x) { return x + a; }
+}
+
+interface Named {
+    int D = 2;
+
+    String name();
+}
+"""
+
+
+def walked(node, pattern):
+    # Node.filter walks the whole tree, which the index must agree with
+    return [(list(map(id, path)), id(found))
+            for path, found in ast.Node.filter(node, pattern)]
+
+
+def described(unit):
+    # Sets, such as modifiers, may come back from pickle in another order
+    return [(type(node).__name__,
+             [sorted(value) if isinstance(value, set) else value
+              for value in node.children
+              if not isinstance(value, (ast.Node, list))])
+            for _, node in unit]
+
+
+def indexed(unit, pattern):
+    return [(list(map(id, path)), id(found))
+            for path, found in unit.filter(pattern)]
+
+
+class NodeIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.unit = parse.parse(SOURCE)
+
+    def test_filter_matches_walk(self):
+        for pattern in (tree.Node, tree.MethodDeclaration, tree.Declaration,
+                        tree.FieldDeclaration, tree.MemberReference,
+                        tree.Statement, tree.WhileStatement):
+            self.assertEqual(indexed(self.unit, pattern),
+                             walked(self.unit, pattern), pattern)
+
+        outer = self.unit.types[0]
+        self.assertEqual(indexed(self.unit, outer), walked(self.unit, outer))
+
+    def test_subclasses(self):
+        fields = self.unit.index.nodes(tree.FieldDeclaration)
+
+        self.assertEqual([type(field) for field in fields],
+                         [tree.FieldDeclaration, tree.FieldDeclaration,
+                          tree.ConstantDeclaration])
+
+    def test_parent(self):
+        index = self.unit.index
+        inner = [m for m in index.nodes(tree.MethodDeclaration)
+                 if m.name == 'inner'][0]
+        local = index.parent(inner)
+
+        self.assertIsInstance(local, tree.ClassDeclaration)
+        self.assertEqual(local.name, 'Local')
+        self.assertIsNone(index.parent(self.unit))
+
+    def test_reindex(self):
+        index = self.unit.index
+        self.assertIs(self.unit.index, index)
+
+        self.unit.types[0].body.append(tree.MethodDeclaration(name='third'))
+        self.unit.reindex()
+
+        self.assertEqual(
+            [m.name for _, m in self.unit.filter(tree.MethodDeclaration)],
+            ['first', 'inner', 'second', 'third', 'name'])
+
+    def test_pickle_leaves_out_index(self):
+        self.unit.index
+        unit = pickle.loads(pickle.dumps(self.unit))
+
+        self.assertNotIn('_index', unit.__dict__)
+        self.assertEqual(described(unit), described(self.unit))
+
+
+class DeclarationsTest(unittest.TestCase):
+
+    def test_members(self):
+        outer = parse.parse(SOURCE).types[0]
+
+        self.assertEqual([len(f.declarators) for f in outer.fields], [2, 1])
+        self.assertEqual([m.name for m in outer.methods], ['first', 'second'])
+        self.assertEqual(len(outer.constructors), 1)
+
+    def test_body_changes(self):
+        outer = parse.parse(SOURCE).types[0]
+        methods = outer.methods
+        methods.append(None)
+
+        # The returned lists are copies
+        self.assertEqual(len(outer.methods), 2)
+
+        outer.body.append(tree.MethodDeclaration(name='third'))
+        self.assertEqual([m.name for m in outer.methods],
+                         ['first', 'second', 'third'])
+
+        outer.body = []
+        self.assertEqual(outer.methods, [])
+
+
+SYMBOLS_SOURCE = """package org.javalang.test;
+
+/** Outer */
+class Outer {
+    int a, b;
+
+    // Builds an outer
+    Outer(java.util.List<String>[] items, int... counts) { }
+
+    /** First */
+    <T> T first(T value, Map.Entry<T, T> entry) {
+        class Local { }
+        return value;
+    }
+
+    enum Kind { A, B }
+
+    @interface Marker { int value(); }
+}
+"""
+
+
+class SymbolIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.unit = parse.parse(SYMBOLS_SOURCE)
+
+    def test_names(self):
+        self.assertEqual(list(self.unit.symbols), [
+            'org.javalang.test.Outer',
+            'org.javalang.test.Outer.a',
+            'org.javalang.test.Outer.b',
+            'org.javalang.test.Outer.Outer(java.util.List[],int...)',
+            'org.javalang.test.Outer.first(T,Map.Entry)',
+            'org.javalang.test.Outer.Kind',
+            'org.javalang.test.Outer.Kind.A',
+            'org.javalang.test.Outer.Kind.B',
+            'org.javalang.test.Outer.Marker',
+            'org.javalang.test.Outer.Marker.value()'])
+
+    def test_lookup(self):
+        symbols = self.unit.symbols
+        outer = self.unit.types[0]
+        first = outer.methods[0]
+
+        self.assertIs(symbols.get('org.javalang.test.Outer.first(T,Map.Entry)'),
+                      first)
+        self.assertIs(symbols.get('org.javalang.test.Outer.b'), outer.fields[0])
+        self.assertIsNone(symbols.get('org.javalang.test.Outer.Local'))
+
+        self.assertEqual(symbols.name(outer), 'org.javalang.test.Outer')
+        self.assertEqual(symbols.name(outer.fields[0]),
+                         'org.javalang.test.Outer.a')
+        self.assertIsNone(symbols.name(first.body[0]))
+
+        start, end = symbols.span('org.javalang.test.Outer.Kind')
+        self.assertEqual(SYMBOLS_SOURCE[start:end], 'enum Kind { A, B }')
+
+    def test_documented_by(self):
+        symbols = self.unit.symbols
+        for comment, name in (('/** Outer */', 'org.javalang.test.Outer'),
+                              ('// Builds an outer',
+                               'org.javalang.test.Outer.Outer('
+                               'java.util.List[],int...)'),
+                              ('/** First */',
+                               'org.javalang.test.Outer.first(T,Map.Entry)')):
+            offset = SYMBOLS_SOURCE.index(comment)
+            self.assertEqual(symbols.documented_by(offset), name)
+
+        self.assertIsNone(symbols.documented_by(0))
+
+    def test_documented_by_after_unicode_escapes(self):
+        source = SYMBOLS_SOURCE.replace('class Outer', 'cl\\u0061ss Outer')
+        symbols = parse.parse(source).symbols
+
+        offset = source.index('/** First */')
+        self.assertEqual(symbols.documented_by(offset),
+                         'org.javalang.test.Outer.first(T,Map.Entry)')
+
+    def test_outline(self):
+        unit = parse.parse(SYMBOLS_SOURCE, outline=True)
+        self.assertEqual(list(unit.symbols), list(self.unit.symbols))
+
+        # Bodies are left deferred
+        self.assertTrue(ast.is_deferred(unit.types[0].methods[0], 'body'))
+
+    def test_pickle_keeps_symbols(self):
+        self.unit.symbols
+        unit = pickle.loads(pickle.dumps(self.unit))
+
+        self.assertIn('_symbols', unit.__dict__)
+        self.assertEqual(list(unit.symbols), list(self.unit.symbols))
+        self.assertEqual(unit.symbols.name(unit.types[0].fields[0]),
+                         'org.javalang.test.Outer.a')
+
+    def test_reindex(self):
+        symbols = self.unit.symbols
+        self.unit.types[0].body.append(
+            tree.FieldDeclaration(declarators=[tree.VariableDeclarator(name='c')]))
+        self.assertNotIn('org.javalang.test.Outer.c', self.unit.symbols)
+
+        self.unit.reindex()
+        self.assertIsNot(self.unit.symbols, symbols)
+        self.assertIn('org.javalang.test.Outer.c', self.unit.symbols)
+
+
+if __name__ == "__main__":
+    unittest.main()
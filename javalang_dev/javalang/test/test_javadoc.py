@@ -1,6 +1,22 @@
+import random
 import unittest
 
-from .. import javadoc
+from .. import javadoc, tree
+
+
+DOCUMENTATION = """/**
+     * Returns the value at the given index.
+     *
+     * <p>Checks the bounds first.
+     *
+     * @param index the index of the value
+     *        to return
+     * @param strict whether to check bounds
+     * @return the value at index
+     * @throws IndexOutOfBoundsException if index is out of range
+     * @author someone
+     * @deprecated
+     */"""
 
 
 class TestJavadoc(unittest.TestCase):
@@ -10,5 +26,56 @@ class TestJavadoc(unittest.TestCase):
         javadoc.parse('/**\n *\n */')
         javadoc.parse('/**\n *\n *\n */')
 
+    def test_parse(self):
+        doc = javadoc.parse(DOCUMENTATION)
+
+        self.assertEqual(doc.description,
+                         'Returns the value at the given index.\n\n'
+                         '<p>Checks the bounds first.')
+        self.assertEqual(doc.params, [
+            ('index', 'the index of the value to return'),
+            ('strict', 'whether to check bounds')])
+        self.assertEqual(doc.return_doc, 'the value at index')
+        self.assertEqual(doc.throws, {
+            'IndexOutOfBoundsException': 'if index is out of range'})
+        self.assertEqual(doc.authors, ['someone'])
+        self.assertTrue(doc.deprecated)
+
+    def test_parse_matches_multipass(self):
+        pieces = (' ', '  ', '\t', '\n', '\n', '*', ' * ', '**', '@', '\n@',
+                  '@param', '@return', '@throws', '@deprecated', 'x',
+                  'foo bar', '\n *\n', '\n   ', '\n * @param a b', '\r\n',
+                  u'\u3000')
+        rng = random.Random(0)
+
+        for _ in range(5000):
+            raw = '/**%s*/' % ''.join(rng.choice(pieces)
+                                      for _ in range(rng.randint(0, 14)))
+            self.assertEqual(javadoc.parse(raw).__dict__,
+                             javadoc._parse_multipass(raw).__dict__, repr(raw))
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            javadoc.parse('/* not javadoc */')
+
+
+class TestDocProperty(unittest.TestCase):
+    def test_doc(self):
+        method = tree.MethodDeclaration(documentation=DOCUMENTATION)
+
+        self.assertEqual(method.doc.return_doc, 'the value at index')
+        self.assertIs(method.doc, method.doc)
+
+    def test_no_documentation(self):
+        self.assertIsNone(tree.FieldDeclaration().doc)
+
+    def test_documentation_changed(self):
+        method = tree.MethodDeclaration(documentation=DOCUMENTATION)
+        first = method.doc
+
+        method.documentation = '/** Other. */'
+        self.assertIsNot(method.doc, first)
+        self.assertEqual(method.doc.description, 'Other.')
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,255 @@
+import unittest
+
+from .. import parse, parser, tree
+from ..tokenizer import tokenize
+
+
+def make_parser(source):
+    return parser.Parser(tokenize(source))
+
+
+def parse_statement(source):
+    return make_parser(source).parse_block_statement()
+
+
+class LookaheadPredicateTest(unittest.TestCase):
+
+    def test_local_variable_declaration(self):
+        for source in ('Foo x;', 'a.b.C x;', 'List<String> x;',
+                       'Map<String, List<int[]>> x;', 'Foo[][] x;',
+                       'List<? extends Foo> x;', 'Outer<A>.Inner<B> x;'):
+            self.assertTrue(
+                make_parser(source).is_local_variable_declaration(), source)
+
+        for source in ('foo(x);', 'x = 1;', 'a.b.c();', 'x++;', 'a < b;',
+                       'a[i] = 1;', 'Foo. x;'):
+            self.assertFalse(
+                make_parser(source).is_local_variable_declaration(), source)
+
+    def test_lambda_expression(self):
+        for source in ('() -> x', '(a) -> a', '(a, b) -> a',
+                       '(int a, List<String> b) -> { }',
+                       '(@A(x) final int a) -> a'):
+            self.assertTrue(make_parser(source).is_lambda_expression(), source)
+
+        for source in ('(a)', '(a + b) * c', '(f(x) -> x)', '(a'):
+            self.assertFalse(make_parser(source).is_lambda_expression(), source)
+
+    def test_cast(self):
+        for source in ('(int) x', '(Foo) (x)', '(List<String>) x',
+                       '(int[]) o', '(a.B) -y', '(Foo) new Foo()',
+                       '(char) 1'):
+            self.assertTrue(make_parser(source).is_cast(), source)
+
+        for source in ('(a + b) * c', '(x);', '(x).foo()', '(a) ? b : c',
+                       '(f(x)) + 1', '(x)'):
+            self.assertFalse(make_parser(source).is_cast(), source)
+
+    def test_lookahead_limit(self):
+        source = '(' * 10 + 'x' + ')' * 10 + ' -> x'
+        p = make_parser(source)
+        p.lookahead_limit = 5
+        # Gives up and leaves the decision to the speculative parse
+        self.assertTrue(p.is_lambda_expression())
+
+
+class LookaheadParseTest(unittest.TestCase):
+
+    def test_statements(self):
+        statement = parse_statement('Map<String, List<Integer>> m = null;')
+        self.assertIsInstance(statement, tree.LocalVariableDeclaration)
+        self.assertEqual(statement.type.name, 'Map')
+
+        statement = parse_statement('a < b;')
+        self.assertIsInstance(statement, tree.StatementExpression)
+
+        statement = parse_statement('foo.bar(x);')
+        self.assertIsInstance(statement, tree.StatementExpression)
+        self.assertIsInstance(statement.expression, tree.MethodInvocation)
+
+        statement = parse_statement('final Foo x = y;')
+        self.assertIsInstance(statement, tree.LocalVariableDeclaration)
+        self.assertEqual(statement.modifiers, set(['final']))
+
+    def test_expressions(self):
+        expression = parse.parse_expression('(int) x')
+        self.assertIsInstance(expression, tree.Cast)
+        self.assertEqual(expression.type.name, 'int')
+
+        expression = parse.parse_expression('(a + b) * c')
+        self.assertIsInstance(expression, tree.BinaryOperation)
+        self.assertEqual(expression.operator, '*')
+
+        expression = parse.parse_expression('(a, b) -> a')
+        self.assertIsInstance(expression, tree.LambdaExpression)
+        self.assertEqual(len(expression.parameters), 2)
+
+        expression = parse.parse_expression('(a) -> a')
+        self.assertIsInstance(expression, tree.LambdaExpression)
+
+        expression = parse.parse_expression('(String) ((Object) x)')
+        self.assertIsInstance(expression, tree.Cast)
+        self.assertIsInstance(expression.expression, tree.Cast)
+
+    def test_for_control(self):
+        unit = parse.parse("""
+            class T {
+                void m() {
+                    for (Map.Entry<K, V> e : map.entrySet()) { }
+                    for (i = 0; i < n; i++) { }
+                }
+            }
+            """)
+        loops = [node for _, node in unit.filter(tree.ForStatement)]
+        self.assertIsInstance(loops[0].control, tree.EnhancedForControl)
+        self.assertIsInstance(loops[1].control, tree.ForControl)
+
+    def test_no_failed_speculation(self):
+        source = """
+            class T {
+                void m() {
+                    List<String> names = new ArrayList<>();
+                    names.add((String) value);
+                    int total = (a + b) * c;
+                    Runnable r = () -> run();
+                    for (String name : names) { use(name); }
+                    counter.increment();
+                }
+            }
+            """
+        raised = []
+        original = parser.JavaSyntaxError.__init__
+
+        def record(self, *args, **kwargs):
+            raised.append(args)
+            original(self, *args, **kwargs)
+
+        parser.JavaSyntaxError.__init__ = record
+        try:
+            parse.parse(source)
+        finally:
+            parser.JavaSyntaxError.__init__ = original
+
+        self.assertEqual(raised, [])
+
+
+class SpeculationTest(unittest.TestCase):
+
+    def test_failures_use_sentinel(self):
+        p = make_parser('(x) + 1')
+        p.speculation_depth = 1
+
+        with self.assertRaises(parser.SpeculationFailure) as context:
+            p.accept('(', ')')
+        self.assertIs(context.exception, parser.SPECULATION_FAILURE)
+
+    def test_speculate_rewinds(self):
+        p = make_parser('(a) < b;')
+
+        self.assertIsNone(p.speculate(p.parse_cast))
+        self.assertEqual(p.tokens.look().value, '(')
+        self.assertEqual(p.speculation_depth, 0)
+        self.assertIsNone(parser.SPECULATION_FAILURE.__traceback__)
+
+    def test_escaping_error_has_diagnostics(self):
+        # The declaration is tried first and fails, then the statement fails
+        # outside of any speculation and reports the offending token
+        with self.assertRaises(parser.JavaSyntaxError) as context:
+            parse.parse('class T { void m() { x = (a) + ; } }')
+
+        self.assertNotIsInstance(context.exception, parser.SpeculationFailure)
+        self.assertEqual(context.exception.description, 'Expected expression')
+        self.assertEqual(context.exception.at.value, ';')
+
+    def test_ambiguous_parse_builds_no_errors(self):
+        raised = []
+        original = parser.JavaSyntaxError.__init__
+
+        def record(self, *args, **kwargs):
+            raised.append(args)
+            original(self, *args, **kwargs)
+
+        parser.JavaSyntaxError.__init__ = record
+        try:
+            # Looks like a cast followed by type arguments until the end
+            expression = parse.parse_expression('(a) < b')
+        finally:
+            parser.JavaSyntaxError.__init__ = original
+
+        self.assertIsInstance(expression, tree.BinaryOperation)
+        self.assertEqual(raised, [])
+
+
+class DispatchTest(unittest.TestCase):
+
+    def test_productions_exist(self):
+        for productions in (parser.Parser.statement_productions,
+                            parser.Parser.primary_productions,
+                            parser.Parser.member_productions):
+            for name in productions.values():
+                if name is not None:
+                    self.assertTrue(callable(getattr(parser.Parser, name)), name)
+
+    def test_dispatch_by_value_and_class(self):
+        p = make_parser('')
+        productions = dict(parser.Parser.primary_productions)
+        integer, this, plus = tokenize('1 this +')
+
+        self.assertEqual(p.dispatch(productions, integer), p.parse_literal)
+        self.assertEqual(productions[type(integer)], 'parse_literal')
+        self.assertEqual(p.dispatch(productions, this), p.parse_this_primary)
+        self.assertIsNone(p.dispatch(productions, plus))
+        self.assertIsNone(productions[type(plus)])
+
+    def test_statements(self):
+        for source, statement_type in (
+                ('{ }', tree.BlockStatement), (';', tree.Statement),
+                ('if (a) b(); else c();', tree.IfStatement),
+                ('assert a : b;', tree.AssertStatement),
+                ('switch (a) { }', tree.SwitchStatement),
+                ('while (a) ;', tree.WhileStatement),
+                ('do ; while (a);', tree.DoStatement),
+                ('for (;;) ;', tree.ForStatement),
+                ('break a;', tree.BreakStatement),
+                ('continue;', tree.ContinueStatement),
+                ('return;', tree.ReturnStatement),
+                ('throw a;', tree.ThrowStatement),
+                ('synchronized (a) { }', tree.SynchronizedStatement),
+                ('try { } finally { }', tree.TryStatement),
+                ('a: b();', tree.StatementExpression),
+                ('a.b();', tree.StatementExpression)):
+            statement = parse_statement(source)
+            self.assertIs(type(statement), statement_type, source)
+
+        self.assertEqual(parse_statement('a: b();').label, 'a')
+
+    def test_primaries(self):
+        for source, primary_type in (
+                ('1', tree.Literal), ('(a)', tree.MemberReference),
+                ('this', tree.This), ('super.a', tree.SuperMemberReference),
+                ('new A()', tree.ClassCreator),
+                ('<T>a()', tree.MethodInvocation),
+                ('a.b', tree.MemberReference), ('int.class', tree.ClassReference),
+                ('void.class', tree.VoidClassReference)):
+            primary = make_parser(source).parse_primary()
+            self.assertIs(type(primary), primary_type, source)
+
+        with self.assertRaises(parser.JavaSyntaxError):
+            make_parser('+').parse_primary()
+
+    def test_members(self):
+        for source, member_type in (
+                ('void a() { }', tree.MethodDeclaration),
+                ('<T> T a() { }', tree.MethodDeclaration),
+                ('class A { }', tree.ClassDeclaration),
+                ('enum A { }', tree.EnumDeclaration),
+                ('interface A { }', tree.InterfaceDeclaration),
+                ('@interface A { }', tree.AnnotationDeclaration),
+                ('A() { }', tree.ConstructorDeclaration),
+                ('int a;', tree.FieldDeclaration)):
+            member = make_parser(source).parse_member_declaration()
+            self.assertIs(type(member), member_type, source)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+import pickle
+import unittest
+
+from .. import ast, parse, parser, tree
+
+
+SOURCE = """
+package org.javalang.test;
+
+public class Outline {
+    static int counter;
+
+    static {
+        counter = 1;
+    }
+
+    public Outline(int start) {
+        counter = start;
+    }
+
+    public <T> T identity(T value) {
+        Runnable r = () -> { counter++; };
+        return (T) value;
+    }
+
+    void nested() {
+        class Local {
+            int get() { return counter; }
+        }
+    }
+
+    interface Callback {
+        default void call() { counter += 1; }
+        void abstractCall();
+    }
+}
+"""
+
+
+def walk_positions(node):
+    return [(type(n).__name__, n.position.start, n.position.end)
+            for _, n in node]
+
+
+class OutlineTest(unittest.TestCase):
+
+    def test_bodies_are_deferred(self):
+        unit = parse.parse(SOURCE, outline=True)
+        clazz = unit.types[0]
+
+        deferred = [decl for decl in clazz.body
+                    if isinstance(decl, (tree.MethodDeclaration,
+                                         tree.ConstructorDeclaration))]
+        self.assertEqual(len(deferred), 3)
+        for decl in deferred:
+            self.assertTrue(ast.is_deferred(decl, 'body'))
+
+        static_block = clazz.body[1]
+        self.assertIsInstance(static_block, tree.StaticBlock)
+        self.assertTrue(ast.is_deferred(static_block, 'statements'))
+
+    def test_deferred_bodies_parse_on_access(self):
+        method = parse.parse(SOURCE, outline=True).types[0].methods[0]
+
+        statements = method.body
+
+        self.assertFalse(ast.is_deferred(method, 'body'))
+        self.assertIsInstance(statements[0], tree.LocalVariableDeclaration)
+        self.assertIsInstance(statements[1], tree.ReturnStatement)
+        self.assertIs(method.body, statements)
+
+    def test_same_tree_as_full_parse(self):
+        full = parse.parse(SOURCE)
+        outline = parse.parse(SOURCE, outline=True)
+
+        self.assertEqual(repr(outline), repr(full))
+        self.assertEqual(walk_positions(outline), walk_positions(full))
+
+    def test_abstract_methods_have_no_body(self):
+        callback = parse.parse(SOURCE, outline=True).types[0].body[-1]
+        abstract_call = callback.body[1]
+
+        self.assertFalse(ast.is_deferred(abstract_call, 'body'))
+        self.assertIsNone(abstract_call.body)
+
+    def test_syntax_error_raised_on_access(self):
+        source = "class A { void f() { int x = ; } void g() {} }"
+        clazz = parse.parse(source, outline=True).types[0]
+
+        self.assertEqual(clazz.methods[1].body, [])
+        with self.assertRaises(parser.JavaSyntaxError):
+            clazz.methods[0].body
+
+    def test_unbalanced_body(self):
+        with self.assertRaises(parser.JavaSyntaxError):
+            parse.parse("class A { void f() { ", outline=True)
+
+    def test_pickle_loads_deferred_bodies(self):
+        unit = parse.parse(SOURCE, outline=True)
+        copy = pickle.loads(pickle.dumps(unit))
+
+        self.assertEqual(repr(copy), repr(parse.parse(SOURCE)))
+
+
+if __name__ == "__main__":
+    unittest.main()
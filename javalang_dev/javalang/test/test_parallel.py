@@ -0,0 +1,112 @@
+import concurrent.futures
+import unittest
+
+from .. import ast, parallel, parse
+from ..parser import JavaSyntaxError
+from ..tokenizer import tokenize
+
+
+SOURCE = """package org.javalang.test;
+
+import java.util.List;
+
+/** Split */
+public class Split extends Base {
+    // constant
+    private static final int A = 1;
+    int[] b = {1, 2, 3};
+
+    static { A2 = 2; }
+
+    Split(int a) { this.a = a; }
+
+    /** Method */
+    <T> List<T> method(T value) {
+        if (value == null) { return null; } // after the statement
+        return java.util.Collections.singletonList(value);
+    }
+
+    class Inner { int c; }
+
+    enum Kind { A, B; }
+
+    @Deprecated
+    void last() { super.run(); }
+    // at the end of the body
+}
+
+interface Other { void run(); }
+"""
+
+
+def describe(node):
+    if isinstance(node, ast.Node):
+        return (type(node).__name__, node.position.start, node.position.end,
+                node.source_span,
+                [(c.value, c.position) for c in node.comments],
+                [(name, describe(getattr(node, name))) for name in node.attrs])
+    if isinstance(node, (list, tuple)):
+        return [describe(child) for child in node]
+    if isinstance(node, (set, frozenset)):
+        return sorted(node)
+    return repr(node)
+
+
+class ParallelParseTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.executor = concurrent.futures.ProcessPoolExecutor(2)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.executor.shutdown()
+
+    def parse(self, source, **kwargs):
+        tokens = list(tokenize(source, trivia=True))
+        return parallel.parse_tokens(tokens, self.executor, chunk_tokens=10,
+                                     **kwargs)
+
+    def test_split_members(self):
+        tokens = list(tokenize(SOURCE, trivia=True))
+        (start, end, chunks), = parallel.split_class_bodies(tokens, 10)
+
+        self.assertEqual((tokens[start].value, tokens[end].value), ('{', '}'))
+        self.assertEqual(chunks[0][0], start + 1)
+        self.assertEqual(chunks[-1][1], end)
+        for (_, last), (first, _) in zip(chunks, chunks[1:]):
+            self.assertEqual(last, first)
+            self.assertIn(tokens[first - 1].value, (';', '}'))
+
+    def test_same_as_sequential(self):
+        self.assertEqual(describe(self.parse(SOURCE)),
+                         describe(parse.parse(SOURCE)))
+
+    def test_unicode_escapes(self):
+        source = (SOURCE.replace('int[] b', '\\u0069nt[] b')
+                  .replace('void last', 'void l\\u0061st'))
+        self.assertEqual(describe(self.parse(source)),
+                         describe(parse.parse(source)))
+
+    def test_outline(self):
+        unit = self.parse(SOURCE, outline=True)
+        self.assertEqual(describe(unit), describe(parse.parse(SOURCE)))
+
+    def test_syntax_error(self):
+        source = SOURCE.replace('class Inner { int c; }', 'class Inner { int c }')
+        with self.assertRaises(JavaSyntaxError) as sequential:
+            parse.parse(source)
+        with self.assertRaises(JavaSyntaxError) as parallel_error:
+            self.parse(source)
+
+        self.assertEqual(parallel_error.exception.at.position,
+                         sequential.exception.at.position)
+
+    def test_workers(self):
+        # Too small to be split
+        unit = parse.parse(SOURCE, workers=2)
+        self.assertEqual(describe(unit), describe(parse.parse(SOURCE)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,169 @@
+import unittest
+
+from .. import parse, parser, tokenizer, tree, util
+
+
+SOURCE = """package org.javalang.test;
+
+class Positions {
+    private int counter = 1;
+
+    int next(final int step) {
+        counter = (int) (counter + step);
+        return counter;
+    }
+}
+"""
+
+
+def positioned_nodes(unit):
+    return [node for _, node in unit if 'position' in node.__dict__]
+
+
+class PositionLevelTest(unittest.TestCase):
+
+    def test_none(self):
+        unit = parse.parse(SOURCE, positions='none')
+
+        self.assertEqual(positioned_nodes(unit), [])
+
+        # Reading a position still works and yields an empty one
+        method = list(unit.filter(tree.MethodDeclaration))[0][1]
+        self.assertIsNone(method.position.start)
+        self.assertIsNone(method.position.end)
+
+    def test_start(self):
+        unit = parse.parse(SOURCE, positions='start')
+        method = list(unit.filter(tree.MethodDeclaration))[0][1]
+
+        self.assertEqual(method.position.start, (6, 5))
+        self.assertIsNone(method.position.end)
+        self.assertIsNone(method.position.start_offset)
+
+    def test_span(self):
+        unit = parse.parse(SOURCE, positions='span')
+        method = list(unit.filter(tree.MethodDeclaration))[0][1]
+
+        self.assertEqual(method.position.start, (6, 5))
+        self.assertEqual(method.position.end, (10, 1))
+        self.assertEqual(
+            SOURCE[method.position.start_offset:method.position.end_offset],
+            SOURCE[SOURCE.index('int next'):SOURCE.rindex('}', 0, -2) + 1])
+
+        cast = list(unit.filter(tree.Cast))[0][1]
+        self.assertEqual(
+            SOURCE[cast.position.start_offset:cast.position.end_offset],
+            '(int) (counter + step)')
+
+        package = unit.package
+        self.assertEqual(
+            SOURCE[package.position.start_offset:package.position.end_offset],
+            'package org.javalang.test;')
+
+    def test_span_is_default(self):
+        default = parse.parse(SOURCE)
+        span = parse.parse(SOURCE, positions='span')
+
+        self.assertEqual(
+            [(n.position.start, n.position.end, n.position.start_offset,
+              n.position.end_offset) for n in positioned_nodes(default)],
+            [(n.position.start, n.position.end, n.position.start_offset,
+              n.position.end_offset) for n in positioned_nodes(span)])
+
+    def test_outline_keeps_level(self):
+        unit = parse.parse(SOURCE, outline=True, positions='none')
+        method = list(unit.filter(tree.MethodDeclaration))[0][1]
+
+        for _, node in tree.BlockStatement(statements=method.body):
+            self.assertNotIn('position', node.__dict__)
+
+    def test_invalid_level(self):
+        with self.assertRaises(ValueError):
+            parser.Parser([], positions='lines')
+
+
+class TokenOffsetTest(unittest.TestCase):
+
+    def test_offsets(self):
+        code = 'int  x =\n  10;'
+        for token in tokenizer.tokenize(code):
+            self.assertEqual(
+                code[token.offset:token.offset + len(token.value)],
+                token.value)
+
+    def test_end_offsets(self):
+        code = 'int  x =\n  10;'
+        for token in tokenizer.tokenize(code):
+            self.assertEqual(code[token.offset:token.end_offset], token.value)
+
+        self.assertIsNone(tokenizer.EndOfInput(None).end_offset)
+
+    def test_source_offsets(self):
+        code = 'char c = \'\\u0041\';\n\\uu0069nt x;'
+        tokens = list(tokenizer.tokenize(code))
+
+        self.assertEqual([code[t.source_offset:t.source_end_offset]
+                          for t in tokens],
+                         ['char', 'c', '=', "'\\u0041'", ';', '\\uu0069nt',
+                          'x', ';'])
+        self.assertEqual(tokens[3].value, "'A'")
+        self.assertEqual(tokens[5].value, 'int')
+
+    def test_lazy_positions(self):
+        token = next(tokenizer.tokenize('\n\n  int x;'))
+
+        self.assertIsNone(token._position)
+        self.assertEqual(token.position, (3, 3))
+        self.assertEqual(tokenizer.JavaToken('x', (7, 2)).position, (7, 2))
+
+    def test_positions_after_comments(self):
+        code = '// one\nint /* two\n three */ x;'
+        positions = [(t.value, tuple(t.position))
+                     for t in tokenizer.tokenize(code)]
+
+        self.assertEqual(positions, [
+            ('// one\n', (1, 1)), ('int', (2, 1)),
+            ('/* two\n three */', (2, 5)), ('x', (3, 11)), (';', (3, 12))])
+
+    def test_comments_at_end(self):
+        tokens = list(tokenizer.tokenize('int x; // end'))
+        self.assertEqual(tokens[-1].value, '// end')
+
+        with self.assertRaises(tokenizer.LexerError):
+            list(tokenizer.tokenize('int x; /* end'))
+
+    def test_source_span(self):
+        unit = parse.parse(SOURCE)
+        cast = list(unit.filter(tree.Cast))[0][1]
+
+        self.assertEqual(SOURCE[slice(*cast.source_span)],
+                         '(int) (counter + step)')
+        self.assertIsNone(tree.Cast().source_span)
+
+        unit = parse.parse(SOURCE, positions='start')
+        cast = list(unit.filter(tree.Cast))[0][1]
+        self.assertIsNone(cast.source_span)
+
+    def test_source_span_after_unicode_escapes(self):
+        source = SOURCE.replace('private int', 'private \\u0069nt')
+        unit = parse.parse(source)
+        field = list(unit.filter(tree.FieldDeclaration))[0][1]
+        cast = list(unit.filter(tree.Cast))[0][1]
+
+        self.assertEqual(source[slice(*field.source_span)],
+                         'private \\u0069nt counter = 1;')
+        self.assertEqual(source[slice(*cast.source_span)],
+                         '(int) (counter + step)')
+
+    def test_previous(self):
+        tokens = util.LookAheadListIterator([1, 2, 3])
+        tokens.set_default(None)
+
+        self.assertIsNone(tokens.previous())
+        next(tokens)
+        tokens.look(1)
+        self.assertEqual(tokens.previous(), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
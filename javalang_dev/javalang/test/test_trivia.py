@@ -0,0 +1,124 @@
+import unittest
+
+from .. import parse, parser, tokenizer, tree
+
+
+SOURCE = """/** Package */
+package org.javalang.test; // after the package
+// before the import
+import java.util.List;
+
+/* before the class */ @Deprecated
+class Commented {
+    // before the field
+    int a = 1; // after the field
+
+    /** Method */
+    void method() {
+        /* before the statement */ a = a
+            // inside the expression
+            + 1;
+        // before the brace
+    }
+}
+// at the end
+"""
+
+
+def values(comments):
+    return [comment.value for comment in comments]
+
+
+class TokenizerTriviaTest(unittest.TestCase):
+
+    def test_comments_attached_to_next_token(self):
+        code = '// one\nint /* two */ /* three */ x; // four'
+        lexer = tokenizer.JavaTokenizer(code, trivia=True)
+        tokens = list(lexer.tokenize())
+
+        self.assertEqual([token.value for token in tokens], ['int', 'x', ';'])
+        self.assertEqual(values(tokens[0].comments), ['// one\n'])
+        self.assertEqual(values(tokens[1].comments),
+                         ['/* two */', '/* three */'])
+        self.assertEqual(tokens[2].comments, ())
+
+        # Comments after the last token are only kept by the tokenizer
+        self.assertEqual(values(lexer.comments),
+                         ['// one\n', '/* two */', '/* three */', '// four'])
+        self.assertEqual(lexer.comments[1].position, (2, 5))
+
+    def test_javadoc_after_comments(self):
+        code = '/** Doc */ // note\nclass A {}'
+        tokens = list(tokenizer.tokenize(code, trivia=True))
+
+        self.assertEqual(tokens[0].javadoc, '/** Doc */')
+        self.assertEqual(values(tokens[0].comments), ['/** Doc */', '// note\n'])
+
+    def test_default_yields_comments(self):
+        tokens = list(tokenizer.tokenize('int x; // end'))
+        self.assertIsInstance(tokens[-1], tokenizer.Comment)
+
+
+class NodeCommentsTest(unittest.TestCase):
+
+    def commented(self, unit):
+        return [(type(node).__name__, values(node.comments))
+                for _, node in unit if node.comments]
+
+    def test_outermost_node_at_token(self):
+        unit = parse.parse(SOURCE)
+
+        self.assertEqual(self.commented(unit), [
+            ('CompilationUnit', ['/** Package */']),
+            ('Import', ['// after the package\n', '// before the import\n']),
+            ('ClassDeclaration', ['/* before the class */']),
+            ('FieldDeclaration', ['// before the field\n']),
+            ('MethodDeclaration', ['// after the field\n', '/** Method */',
+                                   '// before the brace\n']),
+            ('StatementExpression', ['/* before the statement */']),
+            ('BinaryOperation', ['// inside the expression\n'])])
+
+        self.assertEqual(unit.package.documentation, '/** Package */')
+
+    def test_speculation(self):
+        # Parsed as a cast first, which fails after the comment
+        expression = parse.parse_expression('(a /* one */ + b) /* two */ - c')
+
+        self.assertEqual(self.commented(expression), [
+            ('BinaryOperation', ['/* two */']),
+            ('BinaryOperation', ['/* one */'])])
+
+    def test_deferred_bodies(self):
+        unit = parse.parse(SOURCE, outline=True)
+        method = unit.types[0].methods[0]
+        self.assertEqual(values(method.comments),
+                         ['// after the field\n', '/** Method */'])
+
+        # Comments in a body go to its nodes when it is parsed, and those
+        # left over to the node around it
+        method.body
+        self.assertEqual(self.commented(unit), self.commented(parse.parse(SOURCE)))
+
+    def test_same_tokens_parsed_again(self):
+        tokens = list(tokenizer.tokenize(SOURCE, trivia=True))
+        unit = parser.Parser(tokens).parse()
+        expected = self.commented(unit)
+
+        # Each parser has its own owners for the comments of the tokens
+        again = parser.Parser(tokens).parse()
+        self.assertEqual(self.commented(unit), expected)
+        self.assertEqual(self.commented(again), expected)
+
+        outline = parser.Parser(tokens, outline=True).parse()
+        outline.types[0].methods[0].body
+        self.assertEqual(self.commented(outline), expected)
+        self.assertEqual(self.commented(unit), expected)
+
+    def test_without_positions(self):
+        unit = parse.parse(SOURCE, positions='none')
+        self.assertEqual(self.commented(unit), [])
+        self.assertEqual(tree.Literal().comments, ())
+
+
+if __name__ == "__main__":
+    unittest.main()
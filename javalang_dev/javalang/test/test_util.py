@@ -1,6 +1,7 @@
 import unittest
 
-from ..util import LookAheadIterator
+from .. import parser, tokenizer, util
+from ..util import LookAheadIterator, LookAheadListIterator
 
 
 class TestLookAheadIterator(unittest.TestCase):
@@ -64,6 +65,97 @@ class TestLookAheadIterator(unittest.TestCase):
             self.assertEqual(next(i), 13)
         self.assertEqual(next(i), 14)
 
+    def test_streaming(self):
+        pulled = []
+
+        def values():
+            for value in range(0, 100):
+                pulled.append(value)
+                yield value
+
+        i = LookAheadIterator(values())
+
+        self.assertEqual(i.look(2), 2)
+        self.assertEqual(pulled, [0, 1, 2])
+
+        for value in range(0, 50):
+            self.assertEqual(next(i), value)
+
+        # Only the previous value and the lookahead are kept
+        self.assertEqual(list(i.buffer), [49])
+        self.assertEqual(i.previous(), 49)
+
+        with i:
+            for value in range(50, 60):
+                self.assertEqual(next(i), value)
+            with i:
+                self.assertEqual(next(i), 60)
+            # Everything since the outermost marker is kept
+            self.assertEqual(list(i.buffer), list(range(49, 61)))
+
+        self.assertEqual(list(i.buffer), [60])
+
+        i.push_marker()
+        next(i)
+        i.pop_marker(True)
+        self.assertEqual(i.previous(), 60)
+        self.assertEqual(next(i), 61)
+
+    def test_end(self):
+        i = LookAheadIterator(range(0, 3))
+        i.set_default(-1)
+
+        self.assertEqual(i.previous(), -1)
+        self.assertEqual(i.look(5), -1)
+        self.assertEqual(i.look(2), 2)
+        self.assertEqual([next(i) for _ in range(0, 3)], [0, 1, 2])
+        self.assertRaises(StopIteration, next, i)
+
+
+class TestLookAheadListIterator(unittest.TestCase):
+    def test_nested_markers(self):
+        i = LookAheadListIterator(range(0, 10))
+
+        i.push_marker()
+        next(i)
+        with i:
+            next(i)
+        next(i)
+        i.pop_marker(True)
+
+        # Committing the inner marker leaves the outer one where it was
+        self.assertEqual(next(i), 0)
+
+
+class TestParserTokenSource(unittest.TestCase):
+    def test_stream_matches_list(self):
+        source = """
+            class T {
+                int m(int a) {
+                    Runnable r = () -> run();
+                    int b = (int) (a + 1);
+                    for (String s : names) { use(s); }
+                    return a < b ? a : b;
+                }
+            }
+            """
+
+        streamed = parser.Parser(tokenizer.tokenize(source))
+        self.assertIsInstance(streamed.tokens, util.LookAheadIterator)
+
+        listed = parser.Parser(list(tokenizer.tokenize(source)))
+        self.assertIsInstance(listed.tokens, util.LookAheadListIterator)
+
+        def positions(unit):
+            return [(type(node).__name__, node.position.start,
+                     node.position.end, node.position.end_offset)
+                    for _, node in unit]
+
+        streamed_unit = streamed.parse()
+        listed_unit = listed.parse()
+        self.assertEqual(repr(streamed_unit), repr(listed_unit))
+        self.assertEqual(positions(streamed_unit), positions(listed_unit))
+
 
 if __name__=="__main__":
     unittest.main()
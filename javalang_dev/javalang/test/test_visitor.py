@@ -0,0 +1,160 @@
+import unittest
+
+from .. import ast, parse, tree
+
+
+SOURCE = """package org.javalang.test;
+
+class Visited {
+    int a = 1;
+
+    void first() { a = a + 1; }
+
+    int second(int x) {
+        if (x > 0) { return x; }
+        return 0;
+    }
+}
+"""
+
+
+class Recorder(ast.NodeVisitor):
+
+    def __init__(self):
+        self.names = []
+
+    def generic_visit(self, node):
+        self.names.append(type(node).__name__)
+
+
+class MethodNames(ast.NodeVisitor):
+
+    def __init__(self):
+        self.methods = []
+        self.declarations = 0
+
+    def visit_MethodDeclaration(self, node):
+        self.methods.append(node.name)
+        self.prune()
+
+    def visit_Declaration(self, node):
+        self.declarations += 1
+
+
+class NodeVisitorTest(unittest.TestCase):
+
+    def test_preorder(self):
+        unit = parse.parse(SOURCE)
+        recorder = Recorder()
+        recorder.visit(unit)
+
+        self.assertEqual(recorder.names,
+                         [type(node).__name__ for _, node in unit])
+
+    def test_dispatch_and_prune(self):
+        unit = parse.parse(SOURCE)
+        visitor = MethodNames()
+        visitor.visit(unit)
+
+        self.assertEqual(visitor.methods, ['first', 'second'])
+        # The package, class and field declarations, but not the parameter
+        # of the pruned method
+        self.assertEqual(visitor.declarations, 3)
+
+        self.assertIs(MethodNames.dispatch(tree.ClassDeclaration),
+                      MethodNames.__dict__['visit_Declaration'])
+        self.assertIs(MethodNames.dispatch(tree.Literal),
+                      ast.NodeVisitor.__dict__['generic_visit'])
+
+        # Each visitor class has a table of its own
+        self.assertIn(tree.ClassDeclaration, MethodNames.__dict__['_dispatch'])
+        self.assertNotIn('_dispatch', ast.NodeVisitor.__dict__)
+
+    def test_pruning_keeps_bodies_deferred(self):
+        unit = parse.parse(SOURCE, outline=True)
+        MethodNames().visit(unit)
+
+        for method in unit.types[0].methods:
+            self.assertTrue(ast.is_deferred(method, 'body'))
+
+    def test_deep_tree(self):
+        length = 20000
+        expression = parse.parse_expression(
+            ' + '.join('a%d' % i for i in range(length)))
+        recorder = Recorder()
+        recorder.visit(expression)
+
+        self.assertEqual(recorder.names.count('MemberReference'), length)
+
+
+class Renamer(ast.NodeTransformer):
+
+    def visit_MemberReference(self, node):
+        node.member = node.member.upper()
+        return node
+
+
+class Simplifier(ast.NodeTransformer):
+
+    def visit_FieldDeclaration(self, node):
+        return None
+
+    def visit_IfStatement(self, node):
+        # Replaced by its own then statements
+        return node.then_statement.statements
+
+    def visit_Literal(self, node):
+        return tree.MemberReference(member='zero')
+
+    def visit_ReturnStatement(self, node):
+        self.prune()
+        return node
+
+
+class NodeTransformerTest(unittest.TestCase):
+
+    def test_modify_in_place(self):
+        unit = parse.parse(SOURCE)
+        self.assertIs(Renamer().visit(unit), unit)
+
+        self.assertEqual(
+            sorted(set(node.member for _, node in
+                       unit.filter(tree.MemberReference))),
+            ['A', 'X'])
+
+    def test_replace_and_remove(self):
+        unit = parse.parse(SOURCE)
+        body = unit.types[0].body
+        Simplifier().visit(unit)
+
+        self.assertIs(unit.types[0].body, body)
+        self.assertEqual([type(decl) for decl in body],
+                         [tree.MethodDeclaration, tree.MethodDeclaration])
+
+        first, second = body
+        self.assertEqual(first.body[0].expression.value.operandr.member,
+                         'zero')
+        self.assertEqual([type(s) for s in second.body],
+                         [tree.ReturnStatement, tree.ReturnStatement])
+
+        # The return statements were pruned, so the literal stays
+        self.assertIsInstance(second.body[1].expression, tree.Literal)
+
+    def test_replace_root(self):
+        expression = parse.parse_expression('1')
+        self.assertIsInstance(Simplifier().visit(expression),
+                              tree.MemberReference)
+
+    def test_deep_tree(self):
+        length = 20000
+        expression = parse.parse_expression(
+            ' + '.join('a%d' % i for i in range(length)))
+        Renamer().visit(expression)
+
+        while isinstance(expression, tree.BinaryOperation):
+            expression = expression.operandl
+        self.assertEqual(expression.member, 'A0')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,3 +1,4 @@
+import bisect
 import re
 import unicodedata
 from collections import namedtuple
@@ -10,12 +11,114 @@ class LexerError(Exception):
 
 Position = namedtuple('Position', ['line', 'column'])
 
+class LineIndex(object):
+    """ Maps character offsets of a source to line/column Positions. The
+    line starts are only searched for the first time a position is asked for.
+    The offsets are those of data, where unicode escapes have been decoded;
+    escapes gives where they were, to map the offsets back to the source
+
+    """
+
+    def __init__(self, data, escapes=None):
+        self.data = data
+        self.starts = None
+
+        # The offsets in data of the characters decoded from unicode
+        # escapes, and for each how many characters longer the source is
+        # than data up to and including it, or None without escapes
+        self.escapes = escapes
+
+    def line_starts(self):
+        """ Returns the offsets at which each line starts """
+
+        if self.starts is None:
+            self.starts = [0]
+            self.starts.extend(m.end() for m in re.finditer('\n', self.data))
+        return self.starts
+
+    def position(self, offset):
+        starts = self.line_starts()
+        line = bisect.bisect_right(starts, offset)
+        return Position(line, offset - starts[line - 1] + 1)
+
+    def source_offset(self, offset):
+        """ Returns the offset in the source, before unicode escapes were
+        decoded, of the given offset in data. An offset just after a decoded
+        escape maps to just after the escape, so the end of a span maps to
+        the end of its source text
+
+        """
+
+        if not self.escapes:
+            return offset
+
+        decoded, extra = self.escapes
+        i = bisect.bisect_left(decoded, offset)
+        return offset + extra[i - 1] if i else offset
+
 class JavaToken(object):
-    def __init__(self, value, position=None, javadoc=None):
+    # Comments read since the previous significant token, when the tokenizer
+    # attaches comments as trivia
+    comments = ()
+
+    def __init__(self, value, position=None, javadoc=None, offset=None,
+                 lines=None):
         self.value = value
         self.position = position
         self.javadoc = javadoc
 
+        # Character offset of the token in the source, after unicode escapes
+        # have been decoded. Without an explicit position, the line and
+        # column are worked out from it through lines when first read
+        self.offset = offset
+        self.lines = lines
+
+    @property
+    def position(self):
+        if self._position is None and self.lines is not None:
+            self._position = self.lines.position(self.offset)
+        return self._position
+
+    @position.setter
+    def position(self, position):
+        self._position = position
+
+    @property
+    def end_offset(self):
+        if self.offset is None:
+            return None
+        return self.offset + len(self.value)
+
+    # Offsets of the token in the source given to the tokenizer, where
+    # unicode escapes are still escaped. Unlike offset, they can be used to
+    # slice the source. Worked out through lines unless set explicitly
+    _source_offset = None
+    _source_end_offset = None
+
+    @property
+    def source_offset(self):
+        if self._source_offset is not None:
+            return self._source_offset
+        if self.lines is None:
+            return self.offset
+        return self.lines.source_offset(self.offset)
+
+    @source_offset.setter
+    def source_offset(self, offset):
+        self._source_offset = offset
+
+    @property
+    def source_end_offset(self):
+        if self._source_end_offset is not None:
+            return self._source_end_offset
+        if self.lines is None:
+            return self.end_offset
+        return self.lines.source_offset(self.offset + len(self.value))
+
+    @source_end_offset.setter
+    def source_end_offset(self, offset):
+        self._source_end_offset = offset
+
     def __repr__(self):
         if self.position:
             return '%s "%s" line %d, position %d' % (
@@ -152,14 +255,16 @@ class JavaTokenizer(object):
 
     IDENT_PART_CATEGORIES = set(['Lu', 'Ll', 'Lt', 'Lm', 'Lo', 'Mc', 'Mn', 'Nd', 'Nl', 'Pc', 'Sc'])
 
-    def __init__(self, data, ignore_errors=False):
+    def __init__(self, data, ignore_errors=False, trivia=False):
         self.data = data
         self.ignore_errors = ignore_errors
         self.errors = []
 
-        # Rows and columns both start at 1
-        self.current_line = 1
-        self.start_of_line = -1
+        # With trivia, Comment tokens are not yielded but attached to the
+        # next significant token as its comments, and all of them are kept
+        # in order in comments, including those after the last token
+        self.trivia = trivia
+        self.comments = []
 
         self.operators = [set() for i in range(0, Operator.MAX_LEN)]
 
@@ -182,15 +287,7 @@ class JavaTokenizer(object):
             self.i = self.length
             return
 
-        i = match.start()
-
-        start_of_line = self.data.rfind('\n', self.i, i)
-
-        if start_of_line != -1:
-            self.start_of_line = start_of_line
-            self.current_line += self.data.count('\n', self.i, i)
-
-        self.i = i
+        self.i = match.start()
 
     def read_string(self):
         delim = self.data[self.i]
@@ -251,32 +348,21 @@ class JavaTokenizer(object):
     def read_comment(self):
         if self.data[self.i + 1] == '/':
             terminator = '\n'
-            is_multiline = False
         else:
             terminator = '*/'
-            is_multiline = True
 
         i = self.data.find(terminator, self.i + 2)
 
         if i == -1:
-            self.i = self.length
-            return
-
-        i += len(terminator)
-
-        comment = self.data[self.i:i]
-        start_of_line = self.data.rfind('\n', self.i, i)
-
-        if start_of_line != -1:
-        #     self.start_of_line = self.current_line
-            if is_multiline:
-                self.current_line += self.data.count('\n', self.i, i)
-            else:
-                self.current_line += 1
-
-        self.j = self.i + len(comment)
+            # A line comment may end the file, a block comment may not
+            if terminator == '*/':
+                self.error('Unterminated comment',
+                           self.data[self.i:self.i + 2])
+            self.j = self.length
+        else:
+            self.j = i + len(terminator)
 
-        return comment
+        return self.data[self.i:self.j]
 
     def read_decimal_float_or_integer(self):
         orig_i = self.i
@@ -436,6 +522,12 @@ class JavaTokenizer(object):
         new_data = list()
         data = self.decode_data()
 
+        # Where the escapes were, as kept by LineIndex.escapes
+        decoded = list()
+        extra = list()
+        decoded_length = 0
+        escape_start = 0
+
         i = 0
         j = 0
         length = len(data)
@@ -462,6 +554,8 @@ class JavaTokenizer(object):
                 if c == 'u':
                     state = MARKER_FOUND
                     new_data.append(data[i:j - 1])
+                    decoded_length += j - 1 - i
+                    escape_start = j - 1
                 else:
                     state = NONE
 
@@ -477,6 +571,10 @@ class JavaTokenizer(object):
                     new_data.append(six.unichr(escape_code))
 
                     i = j + 4
+                    decoded.append(decoded_length)
+                    width = i - escape_start - 1
+                    extra.append(extra[-1] + width if extra else width)
+                    decoded_length += 1
                     j = i
 
                     state = NONE
@@ -489,6 +587,7 @@ class JavaTokenizer(object):
 
         self.data = ''.join(new_data)
         self.length = len(self.data)
+        self.escapes = (decoded, extra) if decoded else None
 
     def tokenize(self):
         self.reset()
@@ -496,6 +595,9 @@ class JavaTokenizer(object):
         # Convert unicode escapes
         self.pre_tokenize()
 
+        lines = LineIndex(self.data, self.escapes)
+        pending = []
+
         while self.i < self.length:
             token_type = None
 
@@ -553,8 +655,20 @@ class JavaTokenizer(object):
                 self.i = self.i + 1
                 continue
 
-            position = Position(self.current_line, self.i - self.start_of_line)
-            token = token_type(self.data[self.i:self.j], position, self.javadoc)
+            token = token_type(self.data[self.i:self.j], None, self.javadoc,
+                               self.i, lines)
+
+            if self.trivia:
+                if token_type is Comment:
+                    self.comments.append(token)
+                    pending.append(token)
+                    self.i = self.j
+                    continue
+
+                if pending:
+                    token.comments = pending
+                    pending = []
+
             yield token
 
             if self.javadoc:
@@ -568,7 +682,7 @@ class JavaTokenizer(object):
         line_end = self.data.find('\n', self.i)
         line = self.data[line_start:line_end].strip()
 
-        line_number = self.current_line
+        line_number = self.data.count('\n', 0, self.i) + 1
 
         if not char:
             char = self.data[self.j]
@@ -580,8 +694,8 @@ class JavaTokenizer(object):
         if not self.ignore_errors:
             raise error
 
-def tokenize(code, ignore_errors=False):
-    tokenizer = JavaTokenizer(code, ignore_errors)
+def tokenize(code, ignore_errors=False, trivia=False):
+    tokenizer = JavaTokenizer(code, ignore_errors, trivia)
     return tokenizer.tokenize()
 
 def reformat_tokens(tokens):
@@ -1,34 +1,113 @@
 
-from .ast import Node
+from . import javadoc
+from .ast import Node, NodeIndex, DeferredAttribute
 
 # ------------------------------------------------------------------------------
 
 class CompilationUnit(Node):
     attrs = ("package", "imports", "types")
 
+    @property
+    def index(self):
+        """ The ast.NodeIndex of the unit, built on first access so that
+        filter only visits the matching nodes. Call reindex after changing
+        the tree.
+
+        """
+
+        index = self.__dict__.get('_index')
+        if index is None:
+            index = self.__dict__['_index'] = NodeIndex(self)
+        return index
+
+    @property
+    def symbols(self):
+        """ The SymbolIndex of the declarations of the unit, built on first
+        access. Unlike index, it is pickled with the unit. Call reindex after
+        changing the tree.
+
+        """
+
+        symbols = self.__dict__.get('_symbols')
+        if symbols is None:
+            symbols = self.__dict__['_symbols'] = SymbolIndex(self)
+        return symbols
+
+    def reindex(self):
+        self.__dict__.pop('_index', None)
+        self.__dict__.pop('_symbols', None)
+
+    def filter(self, pattern):
+        return self.index.filter(pattern)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop('_index', None)
+        return state
+
 class Import(Node):
     attrs = ("path", "static", "wildcard")
 
 class Documented(Node):
     attrs = ("documentation",)
 
+    @property
+    def doc(self):
+        """ The documentation parsed into a javadoc.DocBlock, or None if there
+        is none. It is parsed on first access and cached for as long as the
+        documentation stays the same.
+
+        """
+
+        cached = self.__dict__.get('_doc')
+        if cached is not None and cached[0] is self.documentation:
+            return cached[1]
+
+        doc = None
+        if self.documentation is not None:
+            doc = javadoc.parse(self.documentation)
+
+        self.__dict__['_doc'] = (self.documentation, doc)
+        return doc
+
 class Declaration(Node):
     attrs = ("modifiers", "annotations")
 
 class TypeDeclaration(Declaration, Documented):
     attrs = ("name", "body")
 
+    def declarations(self, declaration_type):
+        """ Returns the declarations in the body that are instances of
+        declaration_type. Each type is only looked up once for as long as the
+        body stays the same list with the same length.
+
+        """
+
+        body = self.body
+        if not isinstance(body, list):
+            return [decl for decl in body if isinstance(decl, declaration_type)]
+
+        cached = self.__dict__.get('_declarations')
+        if cached is None or cached[0] is not body or cached[1] != len(body):
+            cached = self.__dict__['_declarations'] = (body, len(body), {})
+
+        found = cached[2].get(declaration_type)
+        if found is None:
+            found = cached[2][declaration_type] = [
+                decl for decl in body if isinstance(decl, declaration_type)]
+        return list(found)
+
     @property
     def fields(self):
-        return [decl for decl in self.body if isinstance(decl, FieldDeclaration)]
+        return self.declarations(FieldDeclaration)
 
     @property
     def methods(self):
-        return [decl for decl in self.body if isinstance(decl, MethodDeclaration)]
+        return self.declarations(MethodDeclaration)
 
     @property
     def constructors(self):
-        return [decl for decl in self.body if isinstance(decl, ConstructorDeclaration)]
+        return self.declarations(ConstructorDeclaration)
 
 class PackageDeclaration(Declaration, Documented):
     attrs = ("name",)
@@ -83,12 +162,16 @@ class Member(Documented):
 class MethodDeclaration(Member, Declaration):
     attrs = ("type_parameters", "return_type", "name", "parameters", "throws", "body")
 
+    body = DeferredAttribute("body")
+
 class FieldDeclaration(Member, Declaration):
     attrs = ("type", "declarators")
 
 class ConstructorDeclaration(Declaration, Documented):
     attrs = ("type_parameters", "name", "parameters", "throws", "body")
 
+    body = DeferredAttribute("body")
+
 # ------------------------------------------------------------------------------
 
 class ConstantDeclaration(FieldDeclaration):
@@ -159,6 +242,8 @@ class BlockStatement(Statement):
 class StaticBlock(Statement):
     attrs = ("statements",)
 
+    statements = DeferredAttribute("statements")
+
 class StatementExpression(Statement):
     attrs = ("expression",)
 
@@ -272,3 +357,121 @@ class EnumConstantDeclaration(Declaration, Documented):
 
 class AnnotationMethod(Declaration):
     attrs = ("name", "return_type", "dimensions", "default")
+
+# ------------------------------------------------------------------------------
+
+class SymbolIndex(object):
+    """ Index of the declarations of a compilation unit by fully qualified
+    name: the package, the enclosing types and the name of the declaration,
+    followed for methods and constructors by the erased types of their
+    parameters, as in org.example.Outer.Inner.method(int,String[]). Each name
+    of a field declaration is a symbol of the whole declaration. Local and
+    anonymous classes, which have no such name, are left out, and method
+    bodies are not visited. It is a snapshot of the tree as it was when the
+    index was built.
+
+    """
+
+    def __init__(self, unit):
+        # Declarations by name, in source order
+        self.declarations = {}
+
+        # Names of the declarations by the source offset of each comment
+        # before them
+        self.documented = {}
+
+        # Names by the id of the declarations, rebuilt on first use
+        self.names = None
+
+        prefix = unit.package.name + '.' if unit.package else ''
+        stack = [(prefix, declaration)
+                 for declaration in reversed(unit.types)]
+
+        while stack:
+            prefix, declaration = stack.pop()
+            names = self.declaration_names(declaration)
+            for name in names:
+                self.declarations.setdefault(prefix + name, declaration)
+
+            start = declaration.position.start
+            for comment in declaration.comments:
+                if start is not None and comment.position < start:
+                    self.documented[comment.source_offset] = prefix + names[0]
+
+            if isinstance(declaration, TypeDeclaration):
+                body = declaration.body
+                if isinstance(body, EnumBody):
+                    body = body.constants + body.declarations
+
+                prefix += declaration.name + '.'
+                for member in reversed(body or ()):
+                    if isinstance(member, Declaration):
+                        stack.append((prefix, member))
+
+    def declaration_names(self, declaration):
+        if isinstance(declaration, FieldDeclaration):
+            return [declarator.name for declarator in declaration.declarators]
+        elif isinstance(declaration, (MethodDeclaration,
+                                      ConstructorDeclaration)):
+            parameters = ','.join(self.parameter_type(parameter)
+                                  for parameter in declaration.parameters)
+            return ['%s(%s)' % (declaration.name, parameters)]
+        elif isinstance(declaration, AnnotationMethod):
+            return ['%s()' % (declaration.name,)]
+        return [declaration.name]
+
+    def parameter_type(self, parameter):
+        java_type = parameter.type
+        names = [java_type.name]
+        sub_type = getattr(java_type, 'sub_type', None)
+        while sub_type is not None:
+            names.append(sub_type.name)
+            sub_type = sub_type.sub_type
+
+        # The dimensions of a qualified type are those of its first part
+        name = '.'.join(names) + '[]' * len(java_type.dimensions or ())
+        if parameter.varargs:
+            name += '...'
+        return name
+
+    def __contains__(self, name):
+        return name in self.declarations
+
+    def __iter__(self):
+        return iter(self.declarations)
+
+    def __len__(self):
+        return len(self.declarations)
+
+    def get(self, name):
+        """ Returns the declaration named name, or None """
+
+        return self.declarations.get(name)
+
+    def span(self, name):
+        """ Returns the source_span of the declaration named name, or None """
+
+        declaration = self.declarations.get(name)
+        return declaration.source_span if declaration is not None else None
+
+    def name(self, declaration):
+        """ Returns the first name of declaration, or None if it has none """
+
+        if self.names is None:
+            self.names = {}
+            for name, node in self.declarations.items():
+                self.names.setdefault(id(node), name)
+        return self.names.get(id(declaration))
+
+    def documented_by(self, offset):
+        """ Returns the name of the declaration that the comment at offset is
+        before, or None
+
+        """
+
+        return self.documented.get(offset)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['names'] = None
+        return state
@@ -1,9 +1,30 @@
 
 
+import collections
+
+
 class LookAheadIterator(object):
+    """ Lookahead iterator over a stream of values that supports backtracking
+    to markers.
+
+    Values are only pulled from the underlying iterable as far as they are
+    looked at. Values before the outermost active marker are released, apart
+    from the last one advanced past, so the memory held is bounded by the
+    lookahead and backtracking depth rather than the length of the stream.
+
+    """
+
     def __init__(self, iterable):
         self.iterable = iter(iterable)
-        self.look_ahead = list()
+
+        # Values from the outermost active marker (or the last value advanced
+        # past if there is none) up to the furthest value looked at. offset
+        # is the index in the stream of buffer[0], position the index of the
+        # next value.
+        self.buffer = collections.deque()
+        self.offset = 0
+        self.position = 0
+
         self.markers = list()
         self.default = None
         self.value = None
@@ -18,13 +39,18 @@ class LookAheadIterator(object):
         return self.__next__()
 
     def __next__(self):
-        if self.look_ahead:
-            self.value = self.look_ahead.pop(0)
+        i = self.position - self.offset
+
+        if i < len(self.buffer):
+            self.value = self.buffer[i]
         else:
             self.value = next(self.iterable)
+            self.buffer.append(self.value)
+
+        self.position += 1
 
-        if self.markers:
-            self.markers[-1].append(self.value)
+        if not self.markers:
+            self.release()
 
         return self.value
 
@@ -32,26 +58,43 @@ class LookAheadIterator(object):
         """ Look ahead of the iterable by some number of values with advancing
         past them.
 
-        If the requested look ahead is past the end of the iterable then None is
-        returned.
+        If the requested look ahead is past the end of the iterable then the
+        default is returned.
 
         """
 
-        length = len(self.look_ahead)
+        i += self.position - self.offset
 
-        if length <= i:
+        while len(self.buffer) <= i:
             try:
-                self.look_ahead.extend([next(self.iterable)
-                    for _ in range(length, i + 1)])
+                self.buffer.append(next(self.iterable))
             except StopIteration:
                 return self.default
 
-        self.value = self.look_ahead[i]
+        self.value = self.buffer[i]
         return self.value
 
     def last(self):
         return self.value
 
+    def previous(self):
+        """ Returns the value most recently advanced past, or the default if
+        the iterator has not been advanced yet
+
+        """
+
+        if self.position == 0:
+            return self.default
+
+        return self.buffer[self.position - self.offset - 1]
+
+    def release(self):
+        """ Drops the values that can no longer be returned to """
+
+        while self.position - self.offset > 1:
+            self.buffer.popleft()
+            self.offset += 1
+
     def __enter__(self):
         self.push_marker()
         return self
@@ -65,7 +108,7 @@ class LookAheadIterator(object):
 
     def push_marker(self):
         """ Push a marker on to the marker stack """
-        self.markers.append(list())
+        self.markers.append(self.position)
 
     def pop_marker(self, reset):
         """ Pop a marker off of the marker stack. If reset is True then the
@@ -74,18 +117,13 @@ class LookAheadIterator(object):
 
         """
 
-        marker = self.markers.pop()
+        saved = self.markers.pop()
 
         if reset:
-            # Make the values available to be read again
-            marker.extend(self.look_ahead)
-            self.look_ahead = marker
-        elif self.markers:
-            # Otherwise, reassign the values to the top marker
-            self.markers[-1].extend(marker)
-        else:
-            # If there are not more markers in the stack then discard the values
-            pass
+            self.position = saved
+
+        if not self.markers:
+            self.release()
 
 class LookAheadListIterator(object):
     def __init__(self, iterable):
@@ -134,6 +172,17 @@ class LookAheadListIterator(object):
     def last(self):
         return self.value
 
+    def previous(self):
+        """ Returns the value most recently advanced past, or the default if
+        the iterator has not been advanced yet
+
+        """
+
+        if self.marker == 0:
+            return self.default
+
+        return self.list[self.marker - 1]
+
     def __enter__(self):
         self.push_marker()
         return self
@@ -160,6 +209,4 @@ class LookAheadListIterator(object):
 
         if reset:
             self.marker = saved
-        elif self.saved_markers:
-            self.saved_markers[-1] = saved
 
@@ -20,6 +20,11 @@ setup(
     license='MIT',
     packages=['comment_parser', 'comment_parser.parsers'],
     install_requires=['python-magic>=0.4'],
+    # Python tagging only needs asttokens where ast nodes lack end positions
+    extras_require={':python_version < "3.8"': ['asttokens']},
+    entry_points={
+        'console_scripts': ['comment_parser=comment_parser.comment_parser:main'],
+    },
     test_suite='nose.collector',
     tests_require=['nose'],
     zip_safe=False)